@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Depends, HTTPException, Security
+from fastapi import FastAPI, Depends, HTTPException, Request, Security
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 
 app = FastAPI(title="ShareFoods API",
              description="AI-Powered Food Logistics Optimization Platform",
@@ -14,15 +16,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Unread-Count", "ETag"],
 )
 
+from .services.query_budget import QueryBudgetMiddleware
+app.add_middleware(QueryBudgetMiddleware)
+
+# Outermost, so its latency covers the other middleware too
+from .services.metrics import MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "Welcome to ShareFoods API - Food Logistics Optimization Platform"}
 
 # Include routers
-from .routers import users, auth, listings, claims, tasks, admin, trades, websockets
+from .routers import users, auth, listings, claims, tasks, admin, trades, notifications, websockets
+
+from .services.metrics import metrics, METRICS_TOKEN
+from .services.outbox import outbox_dispatcher, OUTBOX_DISPATCHER_ENABLED
+from .services.passwords import password_hasher
+from .services.recommendations import recommendation_cache
+from .services.response_cache import listing_feed_cache
+from .models.database import pool_status
+
+# Prometheus scrape target
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return metrics.render_prometheus({
+        **pool_status(),
+        **password_hasher.stats(),
+        **outbox_dispatcher.stats(),
+        **websockets.manager.stats(),
+        "recommendation_cache_hit_rate": recommendation_cache.hit_rate,
+        **listing_feed_cache.stats(),
+    })
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -31,10 +62,32 @@ app.include_router(claims.router)
 app.include_router(tasks.router)
 app.include_router(admin.router)
 app.include_router(trades.router)
+app.include_router(notifications.router)
 
 # WebSocket endpoint
+app.websocket("/ws")(websockets.websocket_endpoint)
 app.websocket("/ws/{user_id}")(websockets.websocket_endpoint)
 
 # Add any missing database models
 from .models import database
-database.Base.metadata.create_all(bind=database.engine)
\ No newline at end of file
+from .models import storefronts  # noqa: F401 - User.storefront names it only as a string
+database.Base.metadata.create_all(bind=database.engine)
+
+from .services import rollups
+from .services.notifications import close_http_session
+from .services.expiry import expiry_scheduler, EXPIRY_SCHEDULER_ENABLED
+
+@app.on_event("startup")
+async def start_background_jobs():
+    if rollups.IMPACT_ROLLUP_MODE == "batch":
+        asyncio.create_task(rollups.run_compaction_loop())
+    await websockets.manager.start()
+    if OUTBOX_DISPATCHER_ENABLED:
+        asyncio.create_task(outbox_dispatcher.run())
+    if EXPIRY_SCHEDULER_ENABLED:
+        asyncio.create_task(expiry_scheduler.run())
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await websockets.manager.stop()
+    await close_http_session()
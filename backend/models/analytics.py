@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -17,7 +17,8 @@ class ImpactMetric(Base):
     id = Column(Integer, primary_key=True, index=True)
     metric_type = Column(Enum(MetricType))
     value = Column(Float)
-    metadata = Column(JSON, nullable=True)
+    # "metadata" is reserved on declarative classes; keep the column name
+    metric_metadata = Column("metadata", JSON, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     # Foreign Keys
@@ -28,6 +29,35 @@ class ImpactMetric(Base):
     user = relationship("User")
     listing = relationship("FoodListing")
 
+    __table_args__ = (
+        Index("ix_impact_metrics_timestamp", "timestamp"),
+    )
+
+class RollupGranularity(str, enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class ImpactMetricRollup(Base):
+    """Pre-aggregated ImpactMetric totals per bucket, metric type and user."""
+    __tablename__ = "impact_metric_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(Enum(RollupGranularity), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    metric_type = Column(Enum(MetricType), nullable=False)
+    # 0 for metrics without a user, so the unique key below never sees NULLs
+    user_id = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "metric_type", "user_id",
+            name="uq_impact_metric_rollups_bucket"
+        ),
+        Index("ix_impact_metric_rollups_range", "granularity", "bucket_start", "metric_type"),
+    )
+
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -9,6 +9,7 @@ class ClaimStatus(str, enum.Enum):
     APPROVED = "approved"
     REJECTED = "rejected"
     CANCELLED = "cancelled"
+    WAITLISTED = "waitlisted"  # queued until enough of the listing frees up
 
 class Claim(Base):
     __tablename__ = "claims"
@@ -16,6 +17,7 @@ class Claim(Base):
     id = Column(Integer, primary_key=True, index=True)
     status = Column(Enum(ClaimStatus), default=ClaimStatus.PENDING)
     notes = Column(String, nullable=True)
+    quantity = Column(Float, nullable=True)  # amount allocated (or wanted, while waitlisted)
     pickup_time = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -26,4 +28,16 @@ class Claim(Base):
     
     # Relationships
     listing = relationship("FoodListing", back_populates="claims")
-    claimer = relationship("User")
\ No newline at end of file
+    claimer = relationship("User")
+
+    __table_args__ = (
+        # Keyset pagination (all claims, per claimer, per listing)
+        Index("ix_claims_created_at_id", "created_at", "id"),
+        Index("ix_claims_claimer_created_at_id", "claimer_id", "created_at", "id"),
+        Index("ix_claims_listing_created_at_id", "listing_id", "created_at", "id"),
+        # Waitlist promotion order per listing
+        Index(
+            "ix_claims_waitlist", "listing_id", "created_at", "id",
+            postgresql_where=(status == ClaimStatus.WAITLISTED)
+        ),
+    )
\ No newline at end of file
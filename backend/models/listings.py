@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -18,6 +18,7 @@ class ListingStatus(str, enum.Enum):
     IN_TRANSIT = "in_transit"
     COMPLETED = "completed"
     CANCELLED = "cancelled"
+    EXPIRED = "expired"
 
 class FoodListing(Base):
     __tablename__ = "food_listings"
@@ -27,9 +28,14 @@ class FoodListing(Base):
     description = Column(String)
     category = Column(Enum(FoodCategory))
     quantity = Column(Float)
+    # Sum of live claims; claims are allocated against quantity - claimed_quantity
+    claimed_quantity = Column(Float, default=0.0, server_default="0", nullable=False)
     quantity_unit = Column(String)
     expiration_date = Column(DateTime)
     pickup_location = Column(String)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)
     pickup_instructions = Column(String)
     is_donation = Column(Boolean, default=True)
     status = Column(Enum(ListingStatus), default=ListingStatus.AVAILABLE)
@@ -41,4 +47,19 @@ class FoodListing(Base):
     
     # Relationships
     owner = relationship("User", back_populates="listings")
-    claims = relationship("Claim", back_populates="listing")
\ No newline at end of file
+    claims = relationship("Claim", back_populates="listing")
+
+    __table_args__ = (
+        # Prefix scans (geohash LIKE 'abc%') for radius search
+        Index("ix_food_listings_geohash", "geohash",
+              postgresql_ops={"geohash": "varchar_pattern_ops"}),
+        Index("ix_food_listings_lat_lon", "latitude", "longitude"),
+        # Keyset pagination
+        Index("ix_food_listings_created_at_id", "created_at", "id"),
+        # Hot working set: expired listings leave AVAILABLE, so these stay
+        # limited to live food for browsing and the expiry scheduler
+        Index("ix_food_listings_available_created_at_id", "created_at", "id",
+              postgresql_where=(status == ListingStatus.AVAILABLE)),
+        Index("ix_food_listings_available_expiration", "expiration_date",
+              postgresql_where=(status.in_([ListingStatus.AVAILABLE, ListingStatus.CLAIMED]))),
+    )
\ No newline at end of file
@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
 from datetime import datetime
 
-from .notifications import NotificationType
+class NotificationType(str, enum.Enum):
+    LISTING_CLAIMED = "listing_claimed"
+    TRADE_PROPOSED = "trade_proposed"
+    TRADE_ACCEPTED = "trade_accepted"
+    TRADE_COMPLETED = "trade_completed"
+    TASK_ASSIGNED = "task_assigned"
+    TASK_COMPLETED = "task_completed"
+    SYSTEM = "system"
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -17,5 +29,52 @@ class Notification(Base):
     recipient_id = Column(Integer, ForeignKey("users.id"))
     read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    
-    recipient = relationship("User", back_populates="notifications")
\ No newline at end of file
+
+    recipient = relationship("User", back_populates="notifications")
+
+    __table_args__ = (
+        Index("ix_notifications_recipient_created_at_id", "recipient_id", "created_at", "id"),
+        # Delta polling: everything after a client's last-seen id
+        Index("ix_notifications_recipient_id_id", "recipient_id", "id"),
+        # Unread counts and unread-only feeds touch only unread rows
+        Index(
+            "ix_notifications_unread", "recipient_id", "created_at",
+            postgresql_where=(read == False)
+        ),
+    )
+
+class NotificationOutbox(Base):
+    """
+    Notifications waiting to be delivered.
+
+    Rows are written in the same transaction as the change that triggers
+    them and picked up by the background OutboxDispatcher.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_id = Column(Integer, ForeignKey("users.id"))
+    method = Column(String, default="app")  # app, sms, email
+    type = Column(Enum(NotificationType), default=NotificationType.SYSTEM)
+    title = Column(String, nullable=True)
+    message = Column(String)
+    data = Column(JSON, nullable=True)
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING)
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime, default=datetime.utcnow)  # not retried before this
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Dispatcher polling only ever scans pending rows
+        Index(
+            "ix_notification_outbox_pending", "available_at", "id",
+            postgresql_where=(status == OutboxStatus.PENDING)
+        ),
+        # Rate-limited channels poll their own rows
+        Index(
+            "ix_notification_outbox_pending_method", "method", "available_at", "id",
+            postgresql_where=(status == OutboxStatus.PENDING)
+        ),
+    )
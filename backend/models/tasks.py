@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -38,4 +38,10 @@ class VolunteerTask(Base):
     
     # Relationships
     volunteer = relationship("User", back_populates="volunteer_tasks")
-    listing = relationship("FoodListing")
\ No newline at end of file
+    listing = relationship("FoodListing")
+
+    __table_args__ = (
+        # Keyset pagination (default and `upcoming` ordering)
+        Index("ix_volunteer_tasks_created_at_id", "created_at", "id"),
+        Index("ix_volunteer_tasks_scheduled_time_id", "scheduled_time", "id"),
+    )
\ No newline at end of file
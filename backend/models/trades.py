@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -36,6 +36,12 @@ class Trade(Base):
     initiator_listing = relationship("FoodListing", foreign_keys=[initiator_listing_id])
     responder_listing = relationship("FoodListing", foreign_keys=[responder_listing_id])
 
+    __table_args__ = (
+        # Keyset pagination per participant
+        Index("ix_trades_initiator_created_at_id", "initiator_id", "created_at", "id"),
+        Index("ix_trades_responder_created_at_id", "responder_id", "created_at", "id"),
+    )
+
 class TradeMessage(Base):
     __tablename__ = "trade_messages"
 
@@ -49,4 +55,8 @@ class TradeMessage(Base):
     
     # Relationships
     trade = relationship("Trade")
-    sender = relationship("User")
\ No newline at end of file
+    sender = relationship("User")
+
+    __table_args__ = (
+        Index("ix_trade_messages_trade_created_at_id", "trade_id", "created_at", "id"),
+    )
\ No newline at end of file
@@ -32,4 +32,5 @@ class User(Base):
     listings = relationship("FoodListing", back_populates="owner")
     volunteer_tasks = relationship("VolunteerTask", back_populates="volunteer")
     storefront = relationship("Storefront", back_populates="owner", uselist=False)
-    impact_metrics = relationship("ImpactMetric", back_populates="user")
\ No newline at end of file
+    impact_metrics = relationship("ImpactMetric", back_populates="user")
+    notifications = relationship("Notification", back_populates="recipient")
\ No newline at end of file
@@ -11,9 +11,10 @@ from ..schemas.admin import (
     SystemStats, UserStats, ContentModerationAction,
     FeatureFlag, AdminMetrics
 )
-from .auth import get_current_active_user, get_db
+from ..schemas.auth import TokenData
+from .auth import get_verified_principal, get_db, revoke_user, restore_user
 from ..services.analytics import AnalyticsService
-from ..services.notifications import send_notification
+from ..services.outbox import enqueue_notification
 
 router = APIRouter(
     prefix="/admin",
@@ -22,7 +23,9 @@ router = APIRouter(
 
 analytics = AnalyticsService()
 
-def check_admin_access(current_user: User = Depends(get_current_active_user)):
+def check_admin_access(current_user: TokenData = Depends(get_verified_principal)):
+    # Role and status are read back from the users table, so a suspension or
+    # demotion applies on every worker at once, whatever the token claims
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(
             status_code=403,
@@ -34,7 +37,7 @@ def check_admin_access(current_user: User = Depends(get_current_active_user)):
 async def get_admin_metrics(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Get comprehensive system metrics and statistics."""
@@ -47,7 +50,7 @@ async def get_admin_metrics(
 
 @router.get("/users/stats", response_model=UserStats)
 async def get_user_statistics(
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Get detailed user statistics and engagement metrics."""
@@ -58,7 +61,7 @@ async def moderate_user(
     user_id: int,
     action: str,
     reason: str,
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Moderate user accounts (suspend, warn, reinstate)."""
@@ -68,28 +71,34 @@ async def moderate_user(
 
     if action == "suspend":
         user.is_active = False
-        await send_notification(user.id, f"Your account has been suspended. Reason: {reason}")
+        enqueue_notification(db, user.id, f"Your account has been suspended. Reason: {reason}")
     elif action == "reinstate":
         user.is_active = True
-        await send_notification(user.id, "Your account has been reinstated")
+        enqueue_notification(db, user.id, "Your account has been reinstated")
     elif action == "warn":
-        await send_notification(user.id, f"Warning: {reason}")
+        enqueue_notification(db, user.id, f"Warning: {reason}")
 
     # Log moderation action
     log = ActivityLog(
-        user_id=current_user.id,
+        user_id=current_user.user_id,
         action=f"user_moderation_{action}",
         details={"target_user": user_id, "reason": reason}
     )
     db.add(log)
     db.commit()
 
+    # Drop cached principals only once the status change is durable
+    if action == "suspend":
+        revoke_user(user_id)
+    elif action == "reinstate":
+        restore_user(user_id)
+
     return {"status": "success", "message": f"User {action} completed"}
 
 @router.post("/content/moderate")
 async def moderate_content(
     action: ContentModerationAction,
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Moderate content (listings, reviews, comments)."""
@@ -100,14 +109,15 @@ async def moderate_content(
         
         if action.action == "remove":
             db.delete(listing)
-            await send_notification(
+            enqueue_notification(
+                db,
                 listing.owner_id,
                 f"Your listing has been removed. Reason: {action.reason}"
             )
     
     # Log moderation action
     log = ActivityLog(
-        user_id=current_user.id,
+        user_id=current_user.user_id,
         action=f"content_moderation_{action.action}",
         details={
             "content_type": action.content_type,
@@ -122,7 +132,7 @@ async def moderate_content(
 
 @router.get("/system/stats", response_model=SystemStats)
 async def get_system_statistics(
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Get system-wide statistics and performance metrics."""
@@ -132,7 +142,7 @@ async def get_system_statistics(
 async def update_feature_flag(
     feature_name: str,
     feature: FeatureFlag,
-    current_user: User = Depends(check_admin_access),
+    current_user: TokenData = Depends(check_admin_access),
     db: Session = Depends(get_db)
 ):
     """Update feature flag settings."""
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from typing import Optional
+from typing import Dict, Optional
+from decouple import config
 
-from ..models.database import SessionLocal
+from ..models.database import SessionLocal, AsyncSessionLocal
 from ..models.users import User
+from ..services.cache import TTLCache
+from ..services.passwords import password_hasher, pwd_context
 from ..schemas.auth import Token, TokenData
 from ..schemas.users import UserCreate, UserBase
 
@@ -18,9 +22,22 @@ SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Resolved users are cached per process for a short time; invalidate_cached_user
+# evicts them locally when a profile or account status changes.
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=10000, cast=int)
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=60, cast=float)
+
+def _forget_subject(subject: str, user: User):
+    if _user_subjects.get(user.id) == subject:
+        del _user_subjects[user.id]
+
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL, on_evict=_forget_subject)  # token subject -> detached User
+_user_subjects: Dict[int, str] = {}  # user id -> token subject, for users in _user_cache only
+# Users suspended by this process, rejected even when their token claims suffice
+_revoked_users = TTLCache(USER_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -29,6 +46,12 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Blocking helpers for scripts; request handlers use password_hasher instead
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -42,21 +65,142 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def decode_access_token(token: str) -> TokenData:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return TokenData(
+        username=payload["sub"],
+        user_id=payload.get("uid"),
+        user_type=payload.get("type")
+    )
+
+def invalidate_cached_user(user_id: int):
+    """Drop a user from the principal cache after their record changes."""
+    subject = _user_subjects.pop(user_id, None)
+    if subject is not None:
+        _user_cache.pop(subject)
+
+def revoke_user(user_id: int):
+    """Reject a user's existing tokens in this process, e.g. after suspension."""
+    _revoked_users.set(user_id, True)
+    invalidate_cached_user(user_id)
+
+def restore_user(user_id: int):
+    """Undo revoke_user, e.g. after an account is reinstated."""
+    _revoked_users.pop(user_id)
+    invalidate_cached_user(user_id)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    token_data = decode_access_token(token)
+    user = _user_cache.get(token_data.username)
+    if user is None:
+        user = db.query(User).filter(User.username == token_data.username).first()
+        if user is None:
+            raise credentials_exception
+        # Detach so the cached copy outlives this session; only columns are used
+        db.expunge(user)
+        _user_cache.set(token_data.username, user)
+        _user_subjects[user.id] = token_data.username
+    return user
+
+def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+async def authenticate_token(token: Optional[str]) -> User:
+    """
+    The active user a bearer token belongs to, for connections that can't use
+    the HTTP dependencies (e.g. websockets). Raises credentials_exception.
+    """
+    if not token:
+        raise credentials_exception
+    token_data = decode_access_token(token)
+    user = _user_cache.get(token_data.username)
+    if user is None:
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(
+                select(User).where(User.username == token_data.username)
+            )).scalars().first()
+            if user is None:
+                raise credentials_exception
+            db.expunge(user)
+        _user_cache.set(token_data.username, user)
+        _user_subjects[user.id] = token_data.username
+    if not user.is_active or user.id in _revoked_users:
+        raise credentials_exception
+    return user
+
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> TokenData:
+    """
+    Identity and role of the caller for authorization-only checks.
+
+    Tokens carrying uid/type claims are trusted without touching the
+    database; older tokens fall back to the cached user lookup.
+    """
+    token_data = decode_access_token(token)
+    if token_data.user_id is None or token_data.user_type is None:
+        user = get_current_active_user(get_current_user(token, db))
+        token_data.user_id, token_data.user_type = user.id, user.user_type
+    if token_data.user_id in _revoked_users:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return token_data
+
+def get_verified_principal(
+    principal: TokenData = Depends(get_current_principal), db: Session = Depends(get_db)
+) -> TokenData:
+    """
+    get_current_principal, re-checked against the users table.
+
+    For privileged routes: revoke_user only reaches the process that ran
+    it and token claims are as old as the token, so a suspension or role
+    change made anywhere must be read back from the database.
+    """
+    row = db.query(User.is_active, User.user_type).filter(User.id == principal.user_id).first()
+    if row is None:
+        raise credentials_exception
+    if not row.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    principal.user_type = row.user_type
+    return principal
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    user = result.scalars().first()
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes made with an older cost setting
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id, "type": user.user_type.value},
+        expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
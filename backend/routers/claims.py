@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
 from ..models.database import SessionLocal
 from ..models.claims import Claim, ClaimStatus
-from ..models.listings import FoodListing, ListingStatus
+from ..models.listings import FoodListing
 from ..models.users import User, UserType
 from ..schemas.claims import ClaimCreate, ClaimUpdate, ClaimResponse
-from .auth import get_current_active_user, get_db
+from ..schemas.listings import ListingSummary
+from .auth import get_current_active_user, get_async_db
 from ..services.ai_logistics import LogisticsOptimizer
+from ..services.pagination import PageParams, paginate, finish_page
+from ..services.query_budget import query_budget
+from ..services.serialization import RowSerializer, page_response
+from ..services.claim_allocation import (
+    allocate, release, mark_in_transit, promote_waitlist, listing_state, refresh_recommendations,
+    WAITLISTABLE_STATUSES
+)
+from .websockets import manager, listing_claims_topic
 
 router = APIRouter(
     prefix="/claims",
@@ -18,79 +29,133 @@ router = APIRouter(
 
 logistics = LogisticsOptimizer()
 
+claim_rows = RowSerializer(ClaimResponse, Claim, listing=(ListingSummary, Claim.listing))
+
 @router.post("/", response_model=ClaimResponse)
 async def create_claim(
     claim: ClaimCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Check if listing exists and is available
-    listing = db.query(FoodListing).filter(FoodListing.id == claim.listing_id).first()
+    # Check if listing exists and can still be claimed
+    listing = await db.get(FoodListing, claim.listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
-    if listing.status != ListingStatus.AVAILABLE:
+    if listing.status not in WAITLISTABLE_STATUSES:
         raise HTTPException(status_code=400, detail="Listing is not available")
+    if claim.quantity is not None and listing.quantity is not None and claim.quantity > listing.quantity:
+        raise HTTPException(status_code=400, detail="Quantity exceeds the listing")
+    
+    # Reserve atomically; whoever loses the race is waitlisted instead
+    amount = await allocate(db, listing.id, claim.quantity)
+    if amount is None and not claim.waitlist:
+        raise HTTPException(status_code=409, detail="Listing is no longer available")
     
-    # Create claim
     db_claim = Claim(
-        **claim.dict(),
+        **claim.dict(exclude={"waitlist", "quantity"}),
+        quantity=amount if amount is not None else claim.quantity,
         claimer_id=current_user.id,
-        status=ClaimStatus.PENDING
+        status=ClaimStatus.PENDING if amount is not None else ClaimStatus.WAITLISTED
     )
     db.add(db_claim)
+    state = await listing_state(db, listing.id) if amount is not None else None
     
-    # Update listing status
-    listing.status = ListingStatus.CLAIMED
-    
-    db.commit()
-    db.refresh(db_claim)
+    await db.commit()
+    db_claim = await _load_claim(db, db_claim.id)
+    refresh_recommendations(state)
+    await _publish_claim(db_claim)
     return db_claim
 
 @router.get("/", response_model=List[ClaimResponse])
+@query_budget(2)
 async def get_claims(
+    response: Response,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Return claims based on user type
-    if current_user.user_type == UserType.ADMIN:
-        return db.query(Claim).all()
-    elif current_user.user_type in [UserType.DONOR, UserType.TRADER]:
-        return db.query(Claim).join(FoodListing).filter(
-            FoodListing.owner_id == current_user.id
-        ).all()
-    else:
-        return db.query(Claim).filter(Claim.claimer_id == current_user.id).all()
+    # Return claims based on user type; listing summaries come from the same join
+    query = claim_rows.select()
+    if current_user.user_type in [UserType.DONOR, UserType.TRADER]:
+        query = query.where(FoodListing.owner_id == current_user.id)
+    elif current_user.user_type != UserType.ADMIN:
+        query = query.where(Claim.claimer_id == current_user.id)
+
+    query = paginate(query, page, Claim.created_at, Claim.id)
+    result = await db.execute(query)
+    return page_response(claim_rows.dicts(finish_page(result.all(), page, response)), response)
 
 @router.put("/{claim_id}", response_model=ClaimResponse)
 async def update_claim(
     claim_id: int,
     claim_update: ClaimUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_claim = db.query(Claim).filter(Claim.id == claim_id).first()
+    # Locked so two concurrent cancellations can't both release the claim's share
+    db_claim = (await db.execute(
+        select(Claim).where(Claim.id == claim_id).with_for_update()
+    )).scalar_one_or_none()
     if not db_claim:
         raise HTTPException(status_code=404, detail="Claim not found")
     
     # Check permissions
-    listing = db.query(FoodListing).filter(FoodListing.id == db_claim.listing_id).first()
+    listing = await db.get(FoodListing, db_claim.listing_id)
     if not (current_user.id == listing.owner_id or 
             current_user.id == db_claim.claimer_id or 
             current_user.user_type == UserType.ADMIN):
         raise HTTPException(status_code=403, detail="Not authorized to update this claim")
     
+    previous = db_claim.status
+    new_status = claim_update.status
+    if new_status is not None and new_status != previous and (
+        new_status == ClaimStatus.WAITLISTED
+        or previous in (ClaimStatus.REJECTED, ClaimStatus.CANCELLED)
+        # Only promote_waitlist takes a share for a waitlisted claim
+        or (previous == ClaimStatus.WAITLISTED and new_status != ClaimStatus.CANCELLED)
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot change a {previous.value} claim to {new_status.value}"
+        )
+    
     # Update claim
     for field, value in claim_update.dict(exclude_unset=True).items():
         setattr(db_claim, field, value)
     
     # Update listing status based on claim status
-    if claim_update.status == ClaimStatus.APPROVED:
-        listing.status = ListingStatus.IN_TRANSIT
-    elif claim_update.status == ClaimStatus.REJECTED:
-        listing.status = ListingStatus.AVAILABLE
-    elif claim_update.status == ClaimStatus.CANCELLED:
-        listing.status = ListingStatus.AVAILABLE
+    promoted = []
+    state = None
+    if new_status in (ClaimStatus.REJECTED, ClaimStatus.CANCELLED) and previous in (
+        ClaimStatus.PENDING, ClaimStatus.APPROVED
+    ):
+        await release(db, listing.id, db_claim.quantity)
+        promoted = await promote_waitlist(db, listing.id)
+        state = await listing_state(db, listing.id)
+    elif new_status == ClaimStatus.APPROVED and previous == ClaimStatus.PENDING:
+        await mark_in_transit(db, listing.id)
+        state = await listing_state(db, listing.id)
     
-    db.commit()
-    db.refresh(db_claim)
-    return db_claim
\ No newline at end of file
+    await db.commit()
+    db_claim = await _load_claim(db, db_claim.id)
+    refresh_recommendations(state)
+    for claim in [db_claim, *promoted]:
+        await _publish_claim(claim)
+    return db_claim
+
+async def _load_claim(db: AsyncSession, claim_id: int) -> Claim:
+    """Reload a claim with its listing in one query, as of the last commit."""
+    result = await db.execute(
+        select(Claim).where(Claim.id == claim_id).options(
+            joinedload(Claim.listing).raiseload("*"), raiseload("*")
+        ).execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+async def _publish_claim(claim: Claim):
+    await manager.publish(listing_claims_topic(claim.listing_id), {
+        "type": "claim",
+        "listing_id": claim.listing_id,
+        "claim_id": claim.id,
+        "status": claim.status.value
+    })
\ No newline at end of file
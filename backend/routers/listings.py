@@ -1,14 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import or_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+import numpy as np
 
 from ..models.database import SessionLocal
 from ..models.listings import FoodListing, FoodCategory, ListingStatus
+from ..models.claims import Claim
 from ..models.users import User, UserType
-from ..schemas.listings import ListingCreate, ListingUpdate, ListingResponse
-from .auth import get_current_active_user, get_db
+from ..schemas.listings import ListingCreate, ListingUpdate, ListingResponse, ListingImportResult
+from .auth import get_current_active_user, get_async_db
 from ..services.ai_logistics import LogisticsOptimizer
+from ..services import geo
+from ..services.pagination import PageParams, paginate, finish_page, NEXT_CURSOR_HEADER
+from ..services.response_cache import listing_feed_cache, cache_key
+from ..services.serialization import FastJSONResponse, RowSerializer, dumps
+from ..services.query_budget import query_budget
+from ..services.listing_import import (
+    import_listings, iter_csv, iter_ndjson, iter_records, LISTING_BATCH_MAX
+)
+from .websockets import manager, category_topic, region_topic
+from ..services.recommendations import (
+    recommendation_cache, user_cell, RECOMMENDATION_DEPTH, RECOMMENDATION_RADIUS_KM
+)
 
 router = APIRouter(
     prefix="/listings",
@@ -17,97 +33,166 @@ router = APIRouter(
 
 logistics = LogisticsOptimizer()
 
+RECOMMENDATIONS_PER_REQUEST = 10
+
+listing_rows = RowSerializer(ListingResponse, FoodListing)
+
 @router.post("/", response_model=ListingResponse)
 async def create_listing(
     listing: ListingCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.user_type not in [UserType.DONOR, UserType.TRADER]:
-        raise HTTPException(
-            status_code=403,
-            detail="Only donors and traders can create listings"
-        )
+    _ensure_can_list(current_user)
     
-    db_listing = FoodListing(**listing.dict(), owner_id=current_user.id)
+    location = await run_in_threadpool(geo.location_fields, listing.pickup_location)
+    db_listing = FoodListing(**listing.dict(), **location, owner_id=current_user.id)
     db.add(db_listing)
-    db.commit()
-    db.refresh(db_listing)
+    await db.commit()
+    await db.refresh(db_listing)
+    await _publish_new_listing(db_listing)
     return db_listing
 
+@router.post("/batch", response_model=ListingImportResult)
+async def create_listings_batch(
+    listings: List[Any] = Body(...),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create up to LISTING_BATCH_MAX listings; invalid rows are reported, not fatal."""
+    _ensure_can_list(current_user)
+    if len(listings) > LISTING_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {LISTING_BATCH_MAX} listings per batch; use /listings/import"
+        )
+    return await import_listings(
+        db, current_user.id, iter_records(listings), on_commit=_publish_new_listings
+    )
+
+@router.post("/import", response_model=ListingImportResult)
+async def import_listings_file(
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(csv|ndjson)$", description="Defaults from Content-Type"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream a CSV (with header row) or NDJSON file of listings in the request body.
+
+    The body is parsed as it arrives and committed in chunks, so uploads of
+    any size use bounded memory. Rows that fail validation are reported by
+    line number and don't stop the import.
+    """
+    _ensure_can_list(current_user)
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    rows = (iter_csv if format == "csv" else iter_ndjson)(request.stream())
+    return await import_listings(db, current_user.id, rows, on_commit=_publish_new_listings)
+
 @router.get("/", response_model=List[ListingResponse])
+@query_budget(1)
 async def get_listings(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
     category: Optional[FoodCategory] = None,
     status: Optional[ListingStatus] = None,
     is_donation: Optional[bool] = None,
     location: Optional[str] = None,
-    db: Session = Depends(get_db)
+    near: Optional[str] = Query(None, description="Search origin as 'lat,lon'"),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(FoodListing)
-    
-    if category:
-        query = query.filter(FoodListing.category == category)
-    if status:
-        query = query.filter(FoodListing.status == status)
-    if is_donation is not None:
-        query = query.filter(FoodListing.is_donation == is_donation)
-    if location:
-        query = query.filter(FoodListing.pickup_location.ilike(f"%{location}%"))
-        
-    return query.offset(skip).limit(limit).all()
+    """
+    Public listing feed.
+
+    Responses are cached per filter combination until the next listing
+    write, so repeat loads skip the database and serialization; clients
+    revalidate with If-None-Match or If-Modified-Since and get 304s.
+    """
+    origin = None
+    if near:
+        origin = geo.parse_lat_lon(near)
+        if not origin:
+            raise HTTPException(status_code=400, detail="near must be 'lat,lon'")
+        # ~10m; nearby origins share a cache entry
+        origin = (round(origin[0], 4), round(origin[1], 4))
+    elif location:
+        location = " ".join(location.split()).lower()
+
+    key = cache_key(
+        cursor=page.cursor, limit=page.limit, category=category, status=status, is_donation=is_donation,
+        near=f"{origin[0]},{origin[1]}" if origin else None, location=location,
+        radius_km=radius_km if near or location else None
+    )
+    cached, generation = await listing_feed_cache.lookup(key)
+    if cached is None:
+        listings = await _query_listings(db, page, response, category, status, is_donation, location, origin, radius_km)
+        cached = await listing_feed_cache.store(
+            generation, key, dumps(listings), response.headers.get(NEXT_CURSOR_HEADER)
+        )
+    return cached.respond(request)
 
 @router.get("/recommendations", response_model=List[ListingResponse])
+@query_budget(4)
 async def get_recommendations(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get AI-powered listing recommendations based on user profile and history."""
-    available_listings = db.query(FoodListing).filter(
-        FoodListing.status == ListingStatus.AVAILABLE
-    ).all()
+    top_ids = recommendation_cache.get(current_user.id, RECOMMENDATIONS_PER_REQUEST)
+    if top_ids is None:
+        cell = await run_in_threadpool(user_cell, current_user.location)
+        ranked_ids = await _rank_listings(db, current_user)
+        recommendation_cache.put(current_user.id, cell, ranked_ids)
+        top_ids = ranked_ids[:RECOMMENDATIONS_PER_REQUEST]
     
-    if not available_listings:
+    if not top_ids:
         return []
     
-    # Use AI service to match listings with recipients
-    recommended_listings = logistics.match_recipients(
-        {"location": current_user.location, "user_type": current_user.user_type},
-        [listing.__dict__ for listing in available_listings]
-    )
-    
-    return recommended_listings
+    result = await db.execute(listing_rows.select().where(
+        FoodListing.id.in_(top_ids),
+        FoodListing.status == ListingStatus.AVAILABLE
+    ))
+    by_id = {row.id: row for row in result}
+    return FastJSONResponse([listing_rows.dict(by_id[listing_id]) for listing_id in top_ids if listing_id in by_id])
 
 @router.put("/{listing_id}", response_model=ListingResponse)
 async def update_listing(
     listing_id: int,
     listing_update: ListingUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_listing = db.query(FoodListing).filter(FoodListing.id == listing_id).first()
+    db_listing = await db.get(FoodListing, listing_id)
     if not db_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
         
     if db_listing.owner_id != current_user.id and current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to update this listing")
     
-    for field, value in listing_update.dict(exclude_unset=True).items():
+    update_data = listing_update.dict(exclude_unset=True)
+    if update_data.get("pickup_location"):
+        update_data.update(
+            await run_in_threadpool(geo.location_fields, update_data["pickup_location"])
+        )
+
+    for field, value in update_data.items():
         setattr(db_listing, field, value)
     
-    db.commit()
-    db.refresh(db_listing)
+    await db.commit()
+    await db.refresh(db_listing)
     return db_listing
 
 @router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_listing(
     listing_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if listing exists
-    listing = db.query(FoodListing).filter(FoodListing.id == listing_id).first()
+    listing = await db.get(FoodListing, listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
@@ -116,14 +201,149 @@ async def delete_listing(
         raise HTTPException(status_code=403, detail="Not authorized to delete this listing")
     
     # Delete the listing
-    db.delete(listing)
-    db.commit()
-    db_listing = db.query(FoodListing).filter(FoodListing.id == listing_id).first()
-    if not db_listing:
-        raise HTTPException(status_code=404, detail="Listing not found")
-        
-    if db_listing.owner_id != current_user.id and current_user.user_type != UserType.ADMIN:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this listing")
+    await db.delete(listing)
+    await db.commit()
+
+def _ensure_can_list(user: User):
+    if user.user_type not in [UserType.DONOR, UserType.TRADER]:
+        raise HTTPException(
+            status_code=403,
+            detail="Only donors and traders can create listings"
+        )
+
+async def _publish_new_listing(listing: FoodListing):
+    """Announce a listing to its category and region subscribers."""
+    event = {
+        "type": "new_listing",
+        "listing_id": listing.id,
+        "title": listing.title,
+        "category": listing.category.value,
+        "latitude": listing.latitude,
+        "longitude": listing.longitude
+    }
+    await manager.publish(category_topic(listing.category), event)
+    if listing.geohash:
+        await manager.publish(region_topic(listing.geohash), event)
+
+async def _publish_new_listings(listings: List[Dict]):
+    """Announce an imported chunk with one message per category and region topic."""
+    by_topic: Dict[str, List[Dict]] = {}
+    for listing in listings:
+        event = {
+            "listing_id": listing["id"],
+            "title": listing["title"],
+            "category": listing["category"].value,
+            "latitude": listing["latitude"],
+            "longitude": listing["longitude"]
+        }
+        by_topic.setdefault(category_topic(listing["category"]), []).append(event)
+        if listing["geohash"]:
+            by_topic.setdefault(region_topic(listing["geohash"]), []).append(event)
+    for topic, events in by_topic.items():
+        await manager.publish(topic, {"type": "new_listings", "listings": events})
+
+async def _query_listings(
+    db: AsyncSession,
+    page: PageParams,
+    response: Response,
+    category: Optional[FoodCategory],
+    status: Optional[ListingStatus],
+    is_donation: Optional[bool],
+    location: Optional[str],
+    origin,
+    radius_km: float
+) -> List[Dict]:
+    """One page of the feed as ListingResponse dicts."""
+    if location and not origin:
+        origin = await run_in_threadpool(geo.geocode, location)
+
+    query = listing_rows.select()
+    
+    if category:
+        query = query.where(FoodListing.category == category)
+    if status:
+        query = query.where(FoodListing.status == status)
+    if is_donation is not None:
+        query = query.where(FoodListing.is_donation == is_donation)
+    if origin:
+        return await _search_near(db, query, page, response, origin, radius_km)
+    if location:
+        # Address couldn't be geocoded; fall back to a text match
+        query = query.where(FoodListing.pickup_location.ilike(f"%{location}%"))
+
+    query = paginate(query, page, FoodListing.created_at, FoodListing.id)
+    result = await db.execute(query)
+    return listing_rows.dicts(finish_page(result.all(), page, response))
+
+async def _search_near(
+    db: AsyncSession, query, page: PageParams, response: Response, origin, radius_km: float
+) -> List[Dict]:
+    """One page of listings within radius_km of origin, nearest first.
+
+    Candidates come from an indexed geohash prefix scan narrowed by a
+    lat/lon bounding box; the database computes distances for those only,
+    and orders and pages by (distance, id) so just one page is returned.
+    """
+    lat, lon = origin
+    min_lat, max_lat, min_lon, max_lon = geo.bounding_box(lat, lon, radius_km)
+    cells = geo.covering_cells(lat, lon, radius_km)
+    distance = geo.haversine_km_sql(lat, lon, FoodListing.latitude, FoodListing.longitude)
+    query = query.add_columns(distance.label("distance_km")).where(
+        or_(*[FoodListing.geohash.like(f"{cell}%") for cell in cells]),
+        FoodListing.latitude.between(min_lat, max_lat),
+        FoodListing.longitude.between(min_lon, max_lon),
+        distance <= radius_km
+    )
+    query = paginate(query, page, distance, FoodListing.id, descending=False)
+    result = await db.execute(query)
+
+    results = []
+    for row in finish_page(result.all(), page, response, sort_attr="distance_km"):
+        listing = listing_rows.dict(row)
+        listing["distance_km"] = round(row.distance_km, 3)
+        results.append(listing)
+    return results
+
+async def _rank_listings(db: AsyncSession, user: User) -> List[int]:
+    """Score available listings near the user and return the best ids, best first."""
+    # Only the columns the scorer needs; full rows are loaded for the winners
+    query = select(
+        FoodListing.id, FoodListing.latitude, FoodListing.longitude,
+        FoodListing.category, FoodListing.expiration_date
+    ).where(
+        FoodListing.status == ListingStatus.AVAILABLE
+    )
+    origin = await run_in_threadpool(geo.geocode, user.location) if user.location else None
+    if origin:
+        cells = geo.covering_cells(origin[0], origin[1], RECOMMENDATION_RADIUS_KM)
+        query = query.where(or_(*[FoodListing.geohash.like(f"{cell}%") for cell in cells]))
+    candidates = (await db.execute(query)).all()
+    
+    if not candidates:
+        return []
+    
+    ids, latitudes, longitudes, categories, expiration_dates = zip(*candidates)
+    affinity = await _category_affinity(db, user.id)
+    top = logistics.recommend_listings(
+        user.location,
+        np.array(latitudes, dtype=float),
+        np.array(longitudes, dtype=float),
+        expiration_dates,
+        np.array([affinity.get(c, 0.0) for c in categories]) if affinity else None,
+        k=RECOMMENDATION_DEPTH
+    )
+    return [ids[i] for i in top]
+
+async def _category_affinity(db: AsyncSession, user_id: int) -> dict:
+    """Share of the user's past claims per food category."""
+    result = await db.execute(
+        select(FoodListing.category, func.count(Claim.id)).join(
+            Claim, Claim.listing_id == FoodListing.id
+        ).where(
+            Claim.claimer_id == user_id
+        ).group_by(FoodListing.category)
+    )
+    counts = result.all()
     
-    db.delete(db_listing)
-    db.commit()
\ No newline at end of file
+    total = sum(count for _, count in counts)
+    return {category: count / total for category, count in counts} if total else {}
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
 
 from ..models.database import SessionLocal
 from ..models.notifications import Notification, NotificationType
 from ..models.users import User, UserType
 from ..schemas.notifications import NotificationCreate, NotificationResponse
-from .auth import get_current_active_user, get_db
+from .auth import get_current_active_user, get_async_db
+from ..services.pagination import PageParams, paginate, finish_page
+from ..services.notifications import unread_counter
+from ..services.query_budget import query_budget
+
+UNREAD_COUNT_HEADER = "X-Unread-Count"
 
 router = APIRouter(
     prefix="/notifications",
@@ -15,56 +21,112 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[NotificationResponse])
+@query_budget(3)
 async def get_notifications(
+    response: Response,
+    page: PageParams = Depends(),
+    since_id: Optional[int] = Query(None, description="Only notifications newer than this id, oldest first"),
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get notifications for the current user, newest first.
+
+    Pollers pass the highest id they have seen as since_id and get only
+    what arrived after it; an empty list means nothing changed. The unread
+    count is returned in the X-Unread-Count header either way.
+    """
+    query = select(Notification).where(Notification.recipient_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.read == False)
+    response.headers[UNREAD_COUNT_HEADER] = str(await unread_counter.get(db, current_user.id))
+
+    if since_id is not None:
+        result = await db.execute(
+            query.where(Notification.id > since_id).order_by(Notification.id).limit(page.limit)
+        )
+        return result.scalars().all()
+
+    query = paginate(query, page, Notification.created_at, Notification.id)
+    result = await db.execute(query)
+    return finish_page(result.scalars().all(), page, response)
+
+@router.get("/unread-count")
+async def get_unread_count(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all notifications for the current user"""
-    notifications = db.query(Notification).filter(
-        Notification.recipient_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
-    return notifications
+    """Number of unread notifications for the current user"""
+    return {"unread": await unread_counter.get(db, current_user.id)}
+
+@router.post("/read")
+async def mark_notifications_read(
+    up_to_id: Optional[int] = Query(None, description="Only mark notifications with id <= up_to_id"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mark all (or all up to an id) of the current user's notifications as read in one update"""
+    query = update(Notification).where(
+        Notification.recipient_id == current_user.id,
+        Notification.read == False
+    )
+    if up_to_id is not None:
+        query = query.where(Notification.id <= up_to_id)
+    result = await db.execute(query.values(read=True).execution_options(synchronize_session=False))
+    await db.commit()
+
+    if up_to_id is None:
+        unread_counter.set(current_user.id, 0)
+    else:
+        unread_counter.adjust(current_user.id, -result.rowcount)
+    return {"updated": result.rowcount}
 
 @router.post("/{notification_id}/read", response_model=NotificationResponse)
 async def mark_notification_read(
     notification_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a notification as read"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.recipient_id == current_user.id
-    ).first()
-    
+    notification = await _get_own_notification(db, notification_id, current_user.id)
     if not notification:
         raise HTTPException(
             status_code=404,
             detail="Notification not found or not authorized to access"
         )
         
-    notification.read = True
-    db.commit()
-    db.refresh(notification)
+    if not notification.read:
+        notification.read = True
+        await db.commit()
+        await db.refresh(notification)
+        unread_counter.adjust(current_user.id, -1)
     return notification
 
 @router.delete("/{notification_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_notification(
     notification_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a notification"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.recipient_id == current_user.id
-    ).first()
-    
+    notification = await _get_own_notification(db, notification_id, current_user.id)
     if not notification:
         raise HTTPException(
             status_code=404,
             detail="Notification not found or not authorized to access"
         )
         
-    db.delete(notification)
-    db.commit()
\ No newline at end of file
+    was_unread = not notification.read
+    await db.delete(notification)
+    await db.commit()
+    if was_unread:
+        unread_counter.adjust(current_user.id, -1)
+
+async def _get_own_notification(db: AsyncSession, notification_id: int, user_id: int):
+    """Fetch a notification only if it belongs to the given user"""
+    result = await db.execute(select(Notification).where(
+        Notification.id == notification_id,
+        Notification.recipient_id == user_id
+    ))
+    return result.scalars().first()
\ No newline at end of file
@@ -1,5 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
 
@@ -8,9 +11,14 @@ from ..models.tasks import VolunteerTask, TaskStatus, TaskType
 from ..models.users import User, UserType
 from ..models.listings import FoodListing
 from ..schemas.tasks import TaskCreate, TaskUpdate, TaskResponse
-from .auth import get_current_active_user, get_db
+from ..schemas.listings import ListingSummary
+from .auth import get_current_active_user, get_async_db
 from ..services.ai_logistics import LogisticsOptimizer
-from ..services.notifications import send_notification
+from ..models.notifications import NotificationType
+from ..services.outbox import enqueue_notification
+from ..services.pagination import PageParams, paginate, finish_page
+from ..services.query_budget import query_budget
+from ..services.serialization import FastJSONResponse, RowSerializer, page_response
 
 router = APIRouter(
     prefix="/tasks",
@@ -19,11 +27,14 @@ router = APIRouter(
 
 logistics = LogisticsOptimizer()
 
+# Task lists select their listing summaries through a join, whatever the page size
+task_rows = RowSerializer(TaskResponse, VolunteerTask, listing=(ListingSummary, VolunteerTask.listing))
+
 @router.post("/", response_model=TaskResponse)
 async def create_task(
     task: TaskCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type not in [UserType.ADMIN, UserType.DONOR]:
         raise HTTPException(
@@ -32,54 +43,61 @@ async def create_task(
         )
     
     # Verify listing exists
-    listing = db.query(FoodListing).filter(FoodListing.id == task.listing_id).first()
+    listing = await db.get(FoodListing, task.listing_id)
     if not listing:
         raise HTTPException(status_code=404, detail="Listing not found")
     
     db_task = VolunteerTask(**task.dict())
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
     
     # Try to find and notify suitable volunteers
     await notify_available_volunteers(db_task, db)
     
-    return db_task
+    await db.commit()
+    return await _load_task(db, db_task.id)
 
 @router.get("/", response_model=List[TaskResponse])
+@query_budget(2)
 async def get_tasks(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    page: PageParams = Depends(),
     status: Optional[TaskStatus] = None,
     task_type: Optional[TaskType] = None,
     upcoming: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    query = db.query(VolunteerTask)
+    query = task_rows.select()
     
     # Filter based on user type
     if current_user.user_type == UserType.VOLUNTEER:
-        query = query.filter(
+        query = query.where(
             (VolunteerTask.volunteer_id == current_user.id) |
             (VolunteerTask.status == TaskStatus.PENDING)
         )
     
     if status:
-        query = query.filter(VolunteerTask.status == status)
+        query = query.where(VolunteerTask.status == status)
     if task_type:
-        query = query.filter(VolunteerTask.task_type == task_type)
+        query = query.where(VolunteerTask.task_type == task_type)
     if upcoming:
-        query = query.filter(
-            VolunteerTask.scheduled_time > datetime.utcnow()
-        ).order_by(VolunteerTask.scheduled_time)
+        query = query.where(VolunteerTask.scheduled_time > datetime.utcnow())
+        query = paginate(
+            query, page, VolunteerTask.scheduled_time, VolunteerTask.id, descending=False
+        )
+        result = await db.execute(query)
+        rows = finish_page(result.all(), page, response, sort_attr="scheduled_time")
+        return page_response(task_rows.dicts(rows), response)
     
-    return query.offset(skip).limit(limit).all()
+    query = paginate(query, page, VolunteerTask.created_at, VolunteerTask.id)
+    result = await db.execute(query)
+    return page_response(task_rows.dicts(finish_page(result.all(), page, response)), response)
 
 @router.get("/available", response_model=List[TaskResponse])
+@query_budget(2)
 async def get_available_tasks(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != UserType.VOLUNTEER:
         raise HTTPException(
@@ -88,15 +106,15 @@ async def get_available_tasks(
         )
     
     # Get pending tasks near the volunteer's location
-    tasks = db.query(VolunteerTask).filter(
+    result = await db.execute(task_rows.select().where(
         VolunteerTask.status == TaskStatus.PENDING,
         VolunteerTask.scheduled_time > datetime.utcnow()
-    ).all()
+    ))
+    tasks = task_rows.dicts(result)
     
-    # Use AI service to optimize task suggestions
-    return logistics.optimize_volunteer_tasks(
-        current_user.location,
-        [task.__dict__ for task in tasks]
+    # Use AI service to optimize task suggestions; geocoding addresses may block
+    return FastJSONResponse(
+        await run_in_threadpool(logistics.optimize_volunteer_tasks, current_user.location, tasks)
     )
 
 @router.put("/{task_id}", response_model=TaskResponse)
@@ -104,9 +122,9 @@ async def update_task(
     task_id: int,
     task_update: TaskUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_task = db.query(VolunteerTask).filter(VolunteerTask.id == task_id).first()
+    db_task = await db.get(VolunteerTask, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -125,10 +143,11 @@ async def update_task(
                 detail="Only admins can reassign tasks"
             )
         # Verify new volunteer exists
-        new_volunteer = db.query(User).filter(
+        result = await db.execute(select(User.id).where(
             User.id == task_update.volunteer_id,
             User.user_type == UserType.VOLUNTEER
-        ).first()
+        ))
+        new_volunteer = result.first()
         if not new_volunteer:
             raise HTTPException(
                 status_code=404,
@@ -138,15 +157,14 @@ async def update_task(
     for field, value in task_update.dict(exclude_unset=True).items():
         setattr(db_task, field, value)
     
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    await db.commit()
+    return await _load_task(db, db_task.id)
 
 @router.post("/{task_id}/volunteer", response_model=TaskResponse)
 async def volunteer_for_task(
     task_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.user_type != UserType.VOLUNTEER:
         raise HTTPException(
@@ -154,7 +172,7 @@ async def volunteer_for_task(
             detail="Only volunteers can accept tasks"
         )
     
-    db_task = db.query(VolunteerTask).filter(VolunteerTask.id == task_id).first()
+    db_task = await db.get(VolunteerTask, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -167,36 +185,47 @@ async def volunteer_for_task(
     db_task.volunteer_id = current_user.id
     db_task.status = TaskStatus.ASSIGNED
     
-    db.commit()
-    db.refresh(db_task)
-    
     # Notify task creator
-    listing = db.query(FoodListing).filter(FoodListing.id == db_task.listing_id).first()
+    listing = await db.get(FoodListing, db_task.listing_id)
     if listing:
-        await send_notification(
+        enqueue_notification(
+            db,
             listing.owner_id,
-            f"Volunteer {current_user.full_name} has accepted your task: {db_task.title}"
+            f"Volunteer {current_user.full_name} has accepted your task: {db_task.title}",
+            type=NotificationType.TASK_ASSIGNED
         )
     
-    return db_task
+    await db.commit()
+    return await _load_task(db, db_task.id)
+
+async def _load_task(db: AsyncSession, task_id: int) -> VolunteerTask:
+    """Reload a task with its listing in one query, as of the last commit."""
+    result = await db.execute(
+        select(VolunteerTask).where(VolunteerTask.id == task_id).options(
+            joinedload(VolunteerTask.listing).raiseload("*"), raiseload("*")
+        ).execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
 
-async def notify_available_volunteers(task: VolunteerTask, db: Session):
-    """Helper function to notify nearby volunteers about new tasks."""
+async def notify_available_volunteers(task: VolunteerTask, db: AsyncSession):
+    """Queue notifications for nearby volunteers; committed with the caller's transaction."""
     # Find volunteers near the task location
-    volunteers = db.query(User).filter(
+    result = await db.execute(select(User.id, User.location).where(
         User.user_type == UserType.VOLUNTEER,
         User.is_active == True
-    ).all()
+    ))
+    volunteers = result.all()
     
-    # Use AI service to find suitable volunteers based on location and availability
-    suitable_volunteers = logistics.match_volunteers(
-        task.__dict__,
-        [volunteer.__dict__ for volunteer in volunteers]
+    # Use AI service to find suitable volunteers based on location and availability;
+    # geocoding addresses may block, and the thread mustn't touch the session
+    suitable_volunteers = await run_in_threadpool(
+        logistics.match_volunteers, {"location": task.location}, volunteers
     )
     
     # Send notifications to suitable volunteers
     for volunteer in suitable_volunteers:
-        await send_notification(
-            volunteer['id'],
+        enqueue_notification(
+            db,
+            volunteer.id,
             f"New task available in your area: {task.title}"
         )
\ No newline at end of file
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, Response
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
 from typing import List, Optional
 from datetime import datetime
 
@@ -12,8 +12,12 @@ from ..schemas.trades import (
     TradeMessageCreate, TradeMessageResponse
 )
 from .auth import get_current_active_user, get_db
-from ..services.notifications import send_notification
-from ..services.blockchain import BlockchainLogger
+from ..models.notifications import NotificationType
+from ..services.outbox import enqueue_notification
+from ..services.ai_logistics import BlockchainLogger
+from ..services.pagination import PageParams, paginate, finish_page
+from ..services.query_budget import query_budget
+from .websockets import manager, trade_topic
 
 router = APIRouter(
     prefix="/trades",
@@ -22,6 +26,11 @@ router = APIRouter(
 
 blockchain = BlockchainLogger()
 
+_TRADE_NOTIFICATION_TYPES = {
+    TradeStatus.ACCEPTED: NotificationType.TRADE_ACCEPTED,
+    TradeStatus.COMPLETED: NotificationType.TRADE_COMPLETED,
+}
+
 @router.post("/", response_model=TradeResponse)
 async def create_trade(
     trade: TradeCreate,
@@ -29,12 +38,13 @@ async def create_trade(
     db: Session = Depends(get_db)
 ):
     # Verify listings exist and are available
-    initiator_listing = db.query(FoodListing).filter(
-        FoodListing.id == trade.initiator_listing_id
-    ).first()
-    responder_listing = db.query(FoodListing).filter(
-        FoodListing.id == trade.responder_listing_id
-    ).first()
+    listings = {
+        listing.id: listing for listing in db.query(FoodListing).filter(
+            FoodListing.id.in_([trade.initiator_listing_id, trade.responder_listing_id])
+        ).options(raiseload("*"))
+    }
+    initiator_listing = listings.get(trade.initiator_listing_id)
+    responder_listing = listings.get(trade.responder_listing_id)
     
     if not initiator_listing or not responder_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
@@ -61,32 +71,41 @@ async def create_trade(
     initiator_listing.status = ListingStatus.IN_TRANSIT
     responder_listing.status = ListingStatus.IN_TRANSIT
     
-    db.commit()
-    db.refresh(db_trade)
-    
     # Notify responder
-    await send_notification(
+    enqueue_notification(
+        db,
         trade.responder_id,
-        f"New trade proposal received for your listing: {responder_listing.title}"
+        f"New trade proposal received for your listing: {responder_listing.title}",
+        type=NotificationType.TRADE_PROPOSED
     )
     
-    return db_trade
+    db.commit()
+    return _load_trade(db, db_trade.id)
 
 @router.get("/", response_model=List[TradeResponse])
+@query_budget(4)
 async def get_trades(
+    response: Response,
+    page: PageParams = Depends(),
     status: Optional[TradeStatus] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    # Both listings of every trade on the page come in two extra queries
     query = db.query(Trade).filter(
         (Trade.initiator_id == current_user.id) |
         (Trade.responder_id == current_user.id)
+    ).options(
+        selectinload(Trade.initiator_listing).raiseload("*"),
+        selectinload(Trade.responder_listing).raiseload("*"),
+        raiseload("*")
     )
     
     if status:
         query = query.filter(Trade.status == status)
         
-    return query.all()
+    query = paginate(query, page, Trade.created_at, Trade.id)
+    return finish_page(query.all(), page, response)
 
 @router.put("/{trade_id}", response_model=TradeResponse)
 async def update_trade(
@@ -95,7 +114,7 @@ async def update_trade(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    db_trade = db.query(Trade).filter(Trade.id == trade_id).first()
+    db_trade = _load_trade(db, trade_id)
     if not db_trade:
         raise HTTPException(status_code=404, detail="Trade not found")
         
@@ -121,33 +140,36 @@ async def update_trade(
         
         # Update listing statuses
         if trade_update.status in [TradeStatus.REJECTED, TradeStatus.CANCELLED]:
-            initiator_listing = db.query(FoodListing).filter(
-                FoodListing.id == db_trade.initiator_listing_id
-            ).first()
-            responder_listing = db.query(FoodListing).filter(
-                FoodListing.id == db_trade.responder_listing_id
-            ).first()
-            
-            if initiator_listing:
-                initiator_listing.status = ListingStatus.AVAILABLE
-            if responder_listing:
-                responder_listing.status = ListingStatus.AVAILABLE
+            # Loaded with the trade, so no further lookups
+            if db_trade.initiator_listing:
+                db_trade.initiator_listing.status = ListingStatus.AVAILABLE
+            if db_trade.responder_listing:
+                db_trade.responder_listing.status = ListingStatus.AVAILABLE
     
     for field, value in trade_update.dict(exclude_unset=True).items():
         setattr(db_trade, field, value)
     
-    db.commit()
-    db.refresh(db_trade)
-    
-    # Send notifications
     if trade_update.status:
         notify_user_id = (db_trade.responder_id if current_user.id == db_trade.initiator_id 
                          else db_trade.initiator_id)
-        await send_notification(
+        enqueue_notification(
+            db,
             notify_user_id,
-            f"Trade #{trade_id} status updated to: {trade_update.status}"
+            f"Trade #{trade_id} status updated to: {trade_update.status}",
+            type=_TRADE_NOTIFICATION_TYPES.get(trade_update.status, NotificationType.SYSTEM)
         )
     
+    db.commit()
+    db_trade = _load_trade(db, trade_id)
+    
+    # Push the change to anyone watching the trade
+    if trade_update.status:
+        await manager.publish(trade_topic(trade_id), {
+            "type": "trade_status",
+            "trade_id": trade_id,
+            "status": db_trade.status.value
+        })
+    
     return db_trade
 
 @router.post("/{trade_id}/messages", response_model=TradeMessageResponse)
@@ -172,22 +194,36 @@ async def create_trade_message(
         message=message.message
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
     
     # Notify other participant
     notify_user_id = (trade.responder_id if current_user.id == trade.initiator_id 
                      else trade.initiator_id)
-    await send_notification(
+    enqueue_notification(
+        db,
         notify_user_id,
         f"New message in Trade #{trade_id}: {message.message[:50]}..."
     )
     
+    db.commit()
+    db.refresh(db_message)
+    
+    await manager.publish(trade_topic(trade_id), {
+        "type": "trade_message",
+        "trade_id": trade_id,
+        "message_id": db_message.id,
+        "sender_id": db_message.sender_id,
+        "message": db_message.message,
+        "created_at": db_message.created_at.isoformat()
+    })
+    
     return db_message
 
 @router.get("/{trade_id}/messages", response_model=List[TradeMessageResponse])
+@query_budget(3)
 async def get_trade_messages(
     trade_id: int,
+    response: Response,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -200,4 +236,17 @@ async def get_trade_messages(
             current_user.id == trade.responder_id):
         raise HTTPException(status_code=403, detail="Not authorized to view these messages")
     
-    return db.query(TradeMessage).filter(TradeMessage.trade_id == trade_id).all()
\ No newline at end of file
+    # Oldest first, so a thread reads top to bottom
+    query = paginate(
+        db.query(TradeMessage).filter(TradeMessage.trade_id == trade_id),
+        page, TradeMessage.created_at, TradeMessage.id, descending=False
+    )
+    return finish_page(query.all(), page, response)
+
+def _load_trade(db: Session, trade_id: int) -> Optional[Trade]:
+    """A trade with both listings in one query, refreshed from the database."""
+    return db.query(Trade).filter(Trade.id == trade_id).options(
+        joinedload(Trade.initiator_listing).raiseload("*"),
+        joinedload(Trade.responder_listing).raiseload("*"),
+        raiseload("*")
+    ).populate_existing().first()
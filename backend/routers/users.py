@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from ..models.database import SessionLocal
 from ..models.users import User, UserType
 from ..schemas.users import UserCreate, UserUpdate, UserResponse
-from .auth import get_current_active_user, get_db
+from .auth import get_current_active_user, get_db, get_async_db, invalidate_cached_user
+from ..services.recommendations import recommendation_cache
+from ..services.passwords import password_hasher
 
 router = APIRouter(
     prefix="/users",
@@ -13,11 +16,11 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     db_user = User(
         email=user.email,
         username=user.username,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=await password_hasher.hash(user.password),
         full_name=user.full_name,
         bio=user.bio,
         organization=user.organization,
@@ -26,8 +29,8 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         user_type=user.user_type
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/me", response_model=UserResponse)
@@ -42,14 +45,14 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
     return db_user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if user exists
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -57,28 +60,21 @@ def update_user(
     if current_user.id != user_id and current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
+    update_data = user_update.dict(exclude_unset=True)
+    
     # Update password if provided
-    if user_update.password:
-        user_update.hashed_password = get_password_hash(user_update.password)
-        delattr(user_update, 'password')
+    password = update_data.pop("password", None)
+    if password:
+        update_data["hashed_password"] = await password_hasher.hash(password)
     
     # Update user fields
-    for field, value in user_update.dict(exclude_unset=True).items():
+    for field, value in update_data.items():
         setattr(db_user, field, value)
     
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-    if current_user.id != user_id and current_user.user_type != UserType.ADMIN:
-        raise HTTPException(status_code=403, detail="Not authorized to update this user")
+    await db.commit()
+    await db.refresh(db_user)
     
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    for field, value in user_update.dict(exclude_unset=True).items():
-        setattr(db_user, field, value)
-    
-    db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    invalidate_cached_user(user_id)
+    if user_update.location is not None:
+        recommendation_cache.invalidate_user(user_id)
+    return db_user
@@ -1,108 +1,338 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from typing import Dict, Set
-from ..services.auth import get_current_user_ws
-from ..models.users import User
-
-from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from typing import Dict, List, Optional, Set, Union
+from decouple import config
 import json
 import asyncio
+import re
+
+from ..models.database import AsyncSessionLocal
+from ..models.listings import FoodCategory
+from ..models.trades import Trade
+from ..services.pubsub import (
+    Backplane, BROADCAST_CHANNEL, create_backplane, topic_channel, user_channel
+)
+from .auth import authenticate_token
+
+WS_SEND_QUEUE_SIZE = config('WS_SEND_QUEUE_SIZE', default=100, cast=int)
+WS_SEND_TIMEOUT = config('WS_SEND_TIMEOUT', default=10.0, cast=float)
+# "drop": discard the oldest queued frame for a full queue
+# "disconnect": close connections that can't keep up
+WS_SLOW_CONSUMER_POLICY = config('WS_SLOW_CONSUMER_POLICY', default='drop')
+
+WS_MAX_TOPICS = config('WS_MAX_TOPICS', default=50, cast=int)
+
+# Close code for connections dropped by the slow-consumer policy (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code for handshakes without a valid token (RFC 6455 "Policy Violation")
+UNAUTHORIZED_CLOSE_CODE = 1008
+
+REGION_PRECISION = 4  # geohash cell size for region topics (~20-40km)
+
+def trade_topic(trade_id: int) -> str:
+    return f"trade:{trade_id}"
+
+def listing_claims_topic(listing_id: int) -> str:
+    return f"listing:{listing_id}:claims"
+
+def category_topic(category: FoodCategory) -> str:
+    return f"listings:category:{category.value}"
+
+def region_topic(geohash: str) -> str:
+    return f"listings:region:{geohash[:REGION_PRECISION]}"
+
+_TRADE_TOPIC = re.compile(r"^trade:(\d+)$")
+_PUBLIC_TOPICS = [
+    re.compile(r"^listing:\d+:claims$"),
+    re.compile(r"^listings:category:(%s)$" % "|".join(c.value for c in FoodCategory)),
+    re.compile(r"^listings:region:[0-9b-hjkmnp-z]{%d}$" % REGION_PRECISION),
+]
+
+class Connection:
+    """
+    One accepted socket with its own bounded send queue.
+
+    A dedicated writer task drains the queue, so a slow client only ever
+    delays its own frames, never the sender or other recipients.
+    """
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.topics: Set[str] = set()
+        self.dropped = 0
+        self.closed = False
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
-        
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-    
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-    
-    async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
-    
-    async def broadcast(self, message: str, exclude_user: int = None):
-        for user_id, connection in self.active_connections.items():
-            if user_id != exclude_user:
-                await connection.send_text(message)
+    def __init__(
+        self,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT,
+        slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY,
+        backplane: Optional[Backplane] = None
+    ):
+        # Messages always go through the backplane, so they reach users
+        # connected to any worker, including this one
+        self.backplane = backplane or create_backplane()
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        # A user may be connected from several devices at once
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        # Local subscribers per topic, so delivery touches only interested sockets
+        self.topics: Dict[str, Set[Connection]] = {}
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        # Fire-and-forget cleanup; referenced here so it isn't garbage-collected mid-run
+        self._background: Set[asyncio.Task] = set()
 
-manager = ConnectionManager()
+    async def start(self):
+        if not self.backplane.started:
+            await self.backplane.start(self._deliver)
 
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(websocket, user_id)
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            if message["type"] == "chat":
-                await manager.broadcast(
-                    json.dumps({
-                        "type": "chat",
-                        "user_id": user_id,
-                        "content": message["content"]
-                    }),
-                    exclude_user=user_id
-                )
-            elif message["type"] == "notification":
-                await manager.send_personal_message(
-                    json.dumps({
-                        "type": "notification",
-                        "content": message["content"]
-                    }),
-                    user_id=message["recipient_id"]
-                )
-    except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        await manager.broadcast(
-            json.dumps({
-                "type": "system",
-                "content": f"User {user_id} left the chat"
-            })
-        )
-
-# Connection manager is already defined above
-    # Using the implementation defined above
-    
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def stop(self):
+        await self.backplane.stop()
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> Connection:
+        await self.start()
         await websocket.accept()
+        connection = Connection(websocket, user_id, self.queue_size)
+        connection.writer = asyncio.create_task(self._write(connection))
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
-        self.active_connections[user_id].add(websocket)
-    
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-    
-    async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_text(message)
-    
-    async def broadcast(self, message: str):
-        for connections in self.active_connections.values():
-            for connection in connections:
-                await connection.send_text(message)
+            await self.backplane.subscribe(user_channel(user_id))
+        self.active_connections[user_id].add(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        """Forget a connection and stop its writer. Safe to call more than once."""
+        connection.closed = True
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+                self._spawn(self._unsubscribe_user(connection.user_id))
+        if connection.writer and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    async def subscribe(self, connection: Connection, topic: str):
+        connection.topics.add(topic)
+        if topic not in self.topics:
+            self.topics[topic] = set()
+            await self.backplane.subscribe(topic_channel(topic))
+        self.topics[topic].add(connection)
+
+    def unsubscribe(self, connection: Connection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(connection)
+        if not subscribers:
+            del self.topics[topic]
+            self._spawn(self._unsubscribe_topic(topic))
+
+    async def publish(self, topic: str, message: Union[str, dict], exclude_user: int = None):
+        """Send a message to every subscriber of a topic, on any worker."""
+        await self.start()
+        self.backplane.publish(topic_channel(topic), encode_message(message), exclude_user)
+
+    def send(self, connection: Connection, message: Union[str, dict]):
+        """Reply on one local connection."""
+        self._enqueue(connection, encode_message(message))
+
+    async def send_personal_message(self, message: Union[str, dict], user_id: int):
+        await self.start()
+        self.backplane.publish(user_channel(user_id), encode_message(message))
+
+    async def broadcast(self, message: Union[str, dict], exclude_user: int = None):
+        await self.start()
+        self.backplane.publish(BROADCAST_CHANNEL, encode_message(message), exclude_user)
+
+    def _deliver(self, channel: str, items: List[list]):
+        """Queue a batch from the backplane for local sockets; never waits on a socket."""
+        if channel == BROADCAST_CHANNEL:
+            targets = [c for connections in self.active_connections.values() for c in connections]
+        elif channel.startswith("user:"):
+            targets = list(self.active_connections.get(int(channel[5:]), ()))
+        elif channel.startswith("topic:"):
+            targets = list(self.topics.get(channel[6:], ()))
+        else:
+            return
+        for frame, exclude_user in items:
+            for connection in targets:
+                if connection.user_id != exclude_user:
+                    self._enqueue(connection, frame)
+
+    async def _unsubscribe_user(self, user_id: int):
+        # The user may have reconnected before this ran
+        if user_id not in self.active_connections:
+            await self.backplane.unsubscribe(user_channel(user_id))
+
+    async def _unsubscribe_topic(self, topic: str):
+        if topic not in self.topics:
+            await self.backplane.unsubscribe(topic_channel(topic))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "websocket_users": len(self.active_connections),
+            "websocket_connections": sum(len(c) for c in self.active_connections.values()),
+            "websocket_topics": len(self.topics),
+            "websocket_dropped_messages": self.dropped_messages,
+            "websocket_slow_disconnects": self.slow_disconnects,
+            "websocket_published_messages": self.backplane.published,
+            "websocket_published_batches": self.backplane.batches,
+        }
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _enqueue(self, connection: Connection, frame: str):
+        if connection.closed:
+            return
+        try:
+            connection.queue.put_nowait(frame)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == "disconnect":
+            self.slow_disconnects += 1
+            self.disconnect(connection)
+            self._spawn(self._close(connection, SLOW_CONSUMER_CLOSE_CODE))
+            return
+
+        # Keep the freshest frames; a client this far behind wants current state
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(frame)
+        connection.dropped += 1
+        self.dropped_messages += 1
+
+    async def _write(self, connection: Connection):
+        try:
+            while True:
+                # Drain whatever has piled up in one go, under a single timeout
+                frames = [await connection.queue.get()]
+                while not connection.queue.empty():
+                    frames.append(connection.queue.get_nowait())
+                await asyncio.wait_for(self._send_all(connection, frames), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead or stalled socket; the receive loop will see the disconnect
+            self.disconnect(connection)
+            await self._close(connection)
+
+    async def _send_all(self, connection: Connection, frames):
+        for frame in frames:
+            await connection.websocket.send_text(frame)
+
+    async def _close(self, connection: Connection, code: int = 1000):
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+def encode_message(message: Union[str, dict]) -> str:
+    """Serialize a message once so the same frame is reused for every recipient."""
+    return message if isinstance(message, str) else json.dumps(message)
+
+async def can_subscribe(user_id: int, topic: str) -> bool:
+    """Trade threads are private to their two participants; listing topics are public."""
+    match = _TRADE_TOPIC.match(topic)
+    if match:
+        async with AsyncSessionLocal() as db:
+            trade = await db.get(Trade, int(match.group(1)))
+        return trade is not None and user_id in (trade.initiator_id, trade.responder_id)
+    return any(pattern.match(topic) for pattern in _PUBLIC_TOPICS)
 
 manager = ConnectionManager()
 
-@router.websocket("/ws")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    token: str = Query(...),
-    user: User = Depends(get_current_user_ws)
-):
-    await manager.connect(websocket, user.id)
+def _bearer_token(websocket: WebSocket) -> Optional[str]:
+    # Browsers can't set headers on a websocket handshake, so the token may come as ?token=
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return websocket.query_params.get("token")
+
+async def websocket_endpoint(websocket: WebSocket, user_id: Optional[int] = None):
+    """
+    The caller's identity comes from their access token, never from the URL.
+    `user_id` is accepted for older clients but must match the token.
+    """
+    try:
+        user = await authenticate_token(_bearer_token(websocket))
+    except HTTPException:
+        user = None
+    if user is None or (user_id is not None and user_id != user.id):
+        await websocket.close(code=UNAUTHORIZED_CLOSE_CODE)
+        return
+    user_id = user.id
+
+    connection = await manager.connect(websocket, user_id)
     try:
         while True:
-            # Wait for messages (heartbeat or client messages)
             data = await websocket.receive_text()
-            # Echo back to maintain connection
-            await websocket.send_text(f"Message text was: {data}")
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict) or "type" not in message:
+                manager.send(connection, {"type": "error", "detail": "Messages must be JSON objects with a type"})
+                continue
+            message_type = message["type"]
+            topic = message.get("topic")
+            if topic is not None and not isinstance(topic, str):
+                manager.send(connection, {"type": "error", "detail": "topic must be a string"})
+                continue
+
+            if message_type == "subscribe":
+                if len(connection.topics) >= WS_MAX_TOPICS:
+                    manager.send(connection, {"type": "error", "detail": "Too many subscriptions"})
+                elif topic is None or not await can_subscribe(user_id, topic):
+                    manager.send(connection, {"type": "error", "detail": f"Cannot subscribe to {topic}"})
+                else:
+                    await manager.subscribe(connection, topic)
+                    manager.send(connection, {"type": "subscribed", "topic": topic})
+            elif message_type == "unsubscribe":
+                if topic is not None:
+                    manager.unsubscribe(connection, topic)
+            elif message_type == "chat":
+                # Chat stays inside a trade thread the sender has joined
+                if not isinstance(message.get("content"), str):
+                    manager.send(connection, {"type": "error", "detail": "Chat messages need content"})
+                elif topic in connection.topics and _TRADE_TOPIC.match(topic):
+                    await manager.publish(
+                        topic,
+                        {
+                            "type": "chat",
+                            "topic": topic,
+                            "user_id": user_id,
+                            "content": message["content"]
+                        },
+                        exclude_user=user_id
+                    )
+                else:
+                    manager.send(connection, {"type": "error", "detail": "Join a trade topic to chat"})
+            else:
+                # Notifications come from the server (via the outbox), never from clients
+                manager.send(connection, {"type": "error", "detail": f"Unknown message type {message_type}"})
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user.id)
\ No newline at end of file
+        for topic in list(connection.topics):
+            if _TRADE_TOPIC.match(topic):
+                await manager.publish(
+                    topic,
+                    {
+                        "type": "system",
+                        "topic": topic,
+                        "content": f"User {user_id} left the chat"
+                    },
+                    exclude_user=user_id
+                )
+    finally:
+        manager.disconnect(connection)
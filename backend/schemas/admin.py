@@ -2,6 +2,21 @@ from pydantic import BaseModel
 from typing import Dict, List, Optional
 from datetime import datetime
 
+class RouteStats(BaseModel):
+    method: str
+    route: str
+    requests: int
+    average_ms: float
+    p95_ms: float
+    queries_per_request: float
+    db_ms_per_request: float
+
+class SlowQuerySample(BaseModel):
+    at: datetime
+    duration_ms: float
+    path: Optional[str] = None
+    statement: str
+
 class SystemStats(BaseModel):
     total_users: int
     active_users_24h: int
@@ -11,6 +26,8 @@ class SystemStats(BaseModel):
     total_deliveries: int
     system_health: Dict[str, str]
     performance_metrics: Dict[str, float]
+    routes: List[RouteStats] = []
+    slow_queries: List[SlowQuerySample] = []
 
 class UserStats(BaseModel):
     total_users: int
@@ -1,8 +1,12 @@
 from pydantic import BaseModel
+from ..models.users import UserType
 
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 class TokenData(BaseModel):
-    email: str | None = None
\ No newline at end of file
+    email: str | None = None
+    username: str | None = None
+    user_id: int | None = None
+    user_type: UserType | None = None
\ No newline at end of file
@@ -2,11 +2,19 @@ from pydantic import BaseModel, validator
 from typing import Optional
 from datetime import datetime
 from ..models.claims import ClaimStatus
+from .listings import ListingSummary
 
 class ClaimBase(BaseModel):
     listing_id: int
     notes: Optional[str] = None
     pickup_time: datetime
+    quantity: Optional[float] = None  # omit to claim everything left
+
+    @validator('quantity')
+    def ensure_positive_quantity(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('Quantity must be positive')
+        return v
 
     @validator('pickup_time')
     def ensure_future_time(cls, v):
@@ -15,7 +23,7 @@ class ClaimBase(BaseModel):
         return v
 
 class ClaimCreate(ClaimBase):
-    pass
+    waitlist: bool = True  # queue the claim if the listing is fully claimed
 
 class ClaimUpdate(BaseModel):
     notes: Optional[str] = None
@@ -34,6 +42,7 @@ class ClaimResponse(ClaimBase):
     claimer_id: int
     created_at: datetime
     updated_at: datetime
+    listing: Optional[ListingSummary] = None
 
     class Config:
         orm_mode = True
\ No newline at end of file
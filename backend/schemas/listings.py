@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from ..models.listings import FoodCategory, ListingStatus
 
@@ -42,8 +42,36 @@ class ListingResponse(ListingBase):
     id: int
     status: ListingStatus
     owner_id: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None  # only set for `near` searches
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class ListingSummary(BaseModel):
+    """Listing fields nested in claim, task and trade responses."""
+    id: int
+    title: str
+    category: FoodCategory
+    status: ListingStatus
+    quantity: Optional[float] = None
+    quantity_unit: Optional[str] = None
+    expiration_date: Optional[datetime] = None
+    pickup_location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    class Config:
+        orm_mode = True
+
+class ListingImportError(BaseModel):
+    row: int  # index in a batch, line number in a CSV/NDJSON import
+    errors: List[str]
+
+class ListingImportResult(BaseModel):
+    created: int
+    listing_ids: List[int]
+    errors: List[ListingImportError]
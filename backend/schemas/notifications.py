@@ -1,16 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
-from enum import Enum
-
-class NotificationType(str, Enum):
-    LISTING_CLAIMED = "listing_claimed"
-    TRADE_PROPOSED = "trade_proposed"
-    TRADE_ACCEPTED = "trade_accepted"
-    TRADE_COMPLETED = "trade_completed"
-    TASK_ASSIGNED = "task_assigned"
-    TASK_COMPLETED = "task_completed"
-    SYSTEM = "system"
+from ..models.notifications import NotificationType
 
 class NotificationBase(BaseModel):
     type: NotificationType
@@ -2,6 +2,7 @@ from pydantic import BaseModel, validator
 from typing import Optional
 from datetime import datetime
 from ..models.tasks import TaskStatus, TaskType
+from .listings import ListingSummary
 
 class TaskBase(BaseModel):
     task_type: TaskType
@@ -68,6 +69,7 @@ class TaskResponse(TaskBase):
     listing_id: int
     created_at: datetime
     updated_at: datetime
+    listing: Optional[ListingSummary] = None
 
     class Config:
         orm_mode = True
\ No newline at end of file
@@ -2,6 +2,7 @@ from pydantic import BaseModel, validator
 from typing import Optional, Dict, Any
 from datetime import datetime
 from ..models.trades import TradeStatus
+from .listings import ListingSummary
 
 class TradeBase(BaseModel):
     initiator_listing_id: int
@@ -26,6 +27,8 @@ class TradeResponse(TradeBase):
     completion_time: Optional[datetime]
     created_at: datetime
     updated_at: datetime
+    initiator_listing: Optional[ListingSummary] = None
+    responder_listing: Optional[ListingSummary] = None
 
     class Config:
         orm_mode = True
@@ -24,6 +24,7 @@ class UserUpdate(BaseModel):
     location: Optional[str] = None
     contact_number: Optional[str] = None
     is_active: Optional[bool] = None
+    password: Optional[str] = None
 
 class UserResponse(UserBase):
     id: int
@@ -1,52 +1,243 @@
-import tensorflow as tf
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+from decouple import config
+
+from . import geo, forecasting
+from .scoring import ScoringEngine
+from .routing import Stop, PICKUP, DELIVERY, ROUTE_SERVICE_MINUTES, solve_route, solve_regions
+
+# How long after its scheduled_time a stop may still be started on time
+ROUTE_WINDOW_MINUTES = config('ROUTE_WINDOW_MINUTES', default=60.0, cast=float)
+ROUTE_REGION_PRECISION = 4  # geohash cells (~20-40km) solved independently
 
 class LogisticsOptimizer:
     def __init__(self):
-        self.demand_model = None
         self.route_optimizer = None
+        self.scoring = ScoringEngine()
+
+    @property
+    def demand_model(self) -> Optional[forecasting.DemandModel]:
+        # Loaded on first use so importing this module stays cheap
+        return forecasting.get_demand_model()
         
     def predict_demand(self, location: str, food_type: str, time: datetime) -> float:
         """Predicts demand for specific food type at given location and time."""
-        # TODO: Implement demand prediction using TensorFlow
-        pass
+        return self.predict_demand_batch([(location, food_type, time)])[0]
+
+    def predict_demand_batch(self, queries: List[Tuple[str, str, datetime]]) -> List[float]:
+        """Predicts demand for many (location, food_type, time) queries at once.
+
+        Returns:
+            List[float]: Expected demand per hour for each query; 0.0 when no
+            model has been trained yet
+        """
+        model = self.demand_model
+        if model is None or not queries:
+            return [0.0] * len(queries)
+        cells = {location: forecasting.location_cell(location) for location in {q[0] for q in queries}}
+        return model.predict_batch(
+            [cells[location] for location, _, _ in queries],
+            [food_type for _, food_type, _ in queries],
+            [time for _, _, time in queries]
+        ).tolist()
+
+    def predict_region_demand(self, prefix: str, time: datetime) -> Dict[Tuple[str, str], float]:
+        """Predicts demand for every cell under a geohash prefix and every food type."""
+        model = self.demand_model
+        return model.predict_region(prefix, time) if model is not None else {}
         
-    def optimize_routes(self, pickups: List[Dict], deliveries: List[Dict]) -> List[Dict]:
-        """Optimizes delivery routes based on pickup and delivery locations."""
-        # TODO: Implement route optimization using Google Maps API
-        pass
+    def optimize_routes(
+        self,
+        pickups: List[Dict],
+        deliveries: List[Dict],
+        start: Optional[Tuple[float, float]] = None,
+        capacity: Optional[float] = None
+    ) -> List[Dict]:
+        """Orders pickup and delivery tasks into a single route.
+
+        A delivery sharing a listing_id with a pickup is always visited after
+        it. Each stop may start from its scheduled_time until
+        ROUTE_WINDOW_MINUTES later and takes its estimated_duration.
+
+        Returns:
+            List[Dict]: {"task", "arrival_time", "late"} per stop in visiting
+            order; stops that can't be located or don't fit the vehicle come
+            last with no arrival_time
+        """
+        stops, located, unlocated, origin = _route_stops(pickups, deliveries)
+        plan = solve_route(stops, start, capacity)
+        return _route_result(plan, stops, located, unlocated, origin)
+
+    def optimize_regional_routes(
+        self,
+        pickups: List[Dict],
+        deliveries: List[Dict],
+        capacity: Optional[float] = None,
+        processes: Optional[int] = None
+    ) -> Dict[str, List[Dict]]:
+        """Splits tasks into geohash regions and routes each region in parallel.
+
+        Deliveries stay in the region of their pickup.
+
+        Returns:
+            Dict[str, List[Dict]]: Route per region cell, as from optimize_routes
+        """
+        regions: Dict[str, Tuple[List, List]] = {}
+        cell_by_listing = {}
+        for pickup in pickups:
+            coords = _locate(pickup)
+            cell = geo.encode_geohash(*coords, precision=ROUTE_REGION_PRECISION) if coords else ""
+            cell_by_listing[_field(pickup, "listing_id")] = cell
+            regions.setdefault(cell, ([], []))[0].append(pickup)
+        for delivery in deliveries:
+            cell = cell_by_listing.get(_field(delivery, "listing_id"))
+            if cell is None:
+                coords = _locate(delivery)
+                cell = geo.encode_geohash(*coords, precision=ROUTE_REGION_PRECISION) if coords else ""
+            regions.setdefault(cell, ([], []))[1].append(delivery)
+
+        prepared = {cell: _route_stops(*tasks) for cell, tasks in regions.items()}
+        plans = solve_regions(
+            [{"stops": stops, "capacity": capacity} for stops, _, _, _ in prepared.values()],
+            processes
+        )
+        return {
+            cell: _route_result(plan, *parts)
+            for (cell, parts), plan in zip(prepared.items(), plans)
+        }
         
-    def match_recipients(self, listing: Dict, potential_recipients: List[Dict]) -> List[Dict]:
+    def match_recipients(self, listing: Dict, potential_recipients: List[Dict], k: int = 10) -> List[Dict]:
         """Matches food listings with potential recipients based on various factors."""
-        return sorted(potential_recipients, key=lambda x: 
-            self._calculate_recipient_score(listing, x))[:10]
+        if not potential_recipients:
+            return []
+        category = _field(listing, "category")
+        affinity = np.array([
+            np.nan if _field(r, "preferred_categories") is None
+            else float(category in _field(r, "preferred_categories"))
+            for r in potential_recipients
+        ])
+        scores = self.scoring.score(
+            distance_km=_distances(_locate(listing), potential_recipients),
+            category_affinity=affinity
+        )
+        return [potential_recipients[i] for i in self.scoring.top_k(scores, k)]
     
-    def match_volunteers(self, task: Dict, potential_volunteers: List[Dict]) -> List[Dict]:
+    def match_volunteers(self, task: Dict, potential_volunteers: List[Dict], k: int = 5) -> List[Dict]:
         """Matches tasks with suitable volunteers based on location and availability."""
-        return sorted(potential_volunteers, key=lambda x: 
-            self._calculate_volunteer_score(task, x))[:5]
+        if not potential_volunteers:
+            return []
+        scores = self.scoring.score(
+            distance_km=_distances(_locate(task), potential_volunteers)
+        )
+        return [potential_volunteers[i] for i in self.scoring.top_k(scores, k)]
     
-    def optimize_volunteer_tasks(self, volunteer_location: str, available_tasks: List[Dict]) -> List[Dict]:
+    def optimize_volunteer_tasks(self, volunteer_location: str, available_tasks: List[Dict], k: int = 10) -> List[Dict]:
         """Optimizes task suggestions for volunteers based on location and timing."""
-        return sorted(available_tasks, key=lambda x: 
-            self._calculate_task_score(volunteer_location, x))[:10]
-    
-    def _calculate_recipient_score(self, listing: Dict, recipient: Dict) -> float:
-        """Calculate matching score between listing and recipient."""
-        # TODO: Implement scoring logic
-        return 0.0
-    
-    def _calculate_volunteer_score(self, task: Dict, volunteer: Dict) -> float:
-        """Calculate matching score between task and volunteer."""
-        # TODO: Implement scoring logic
-        return 0.0
-    
-    def _calculate_task_score(self, volunteer_location: str, task: Dict) -> float:
-        """Calculate score for task suitability."""
-        # TODO: Implement scoring logic
-        return 0.0
+        if not available_tasks:
+            return []
+        now = datetime.utcnow()
+        scores = self.scoring.score(
+            distance_km=_distances(geo.geocode(volunteer_location), available_tasks),
+            hours_to_expiry=_hours_until([_field(t, "scheduled_time") for t in available_tasks], now),
+            priority=np.array([_field(t, "priority") or 1 for t in available_tasks], dtype=float)
+        )
+        return [available_tasks[i] for i in self.scoring.top_k(scores, k)]
+
+    def recommend_listings(
+        self,
+        user_location: str,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        expiration_dates: List[datetime],
+        category_affinity: np.ndarray,
+        k: int = 10
+    ) -> np.ndarray:
+        """Ranks candidate listings, given as column arrays, for a user.
+
+        Returns:
+            np.ndarray: Indices of the top-k candidates, best first
+        """
+        origin = geo.geocode(user_location)
+        if origin:
+            distances = geo.haversine_km_array(origin[0], origin[1], latitudes, longitudes)
+        else:
+            distances = np.full(len(latitudes), np.nan)
+        scores = self.scoring.score(
+            distance_km=distances,
+            hours_to_expiry=_hours_until(expiration_dates, datetime.utcnow()),
+            category_affinity=category_affinity
+        )
+        return self.scoring.top_k(scores, k)
+
+def _field(item, name: str, default=None):
+    """Read a field from either a mapping or an ORM object."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+def _locate(item) -> Optional[Tuple[float, float]]:
+    """Coordinates of a listing, task or user, geocoding its address if needed."""
+    lat, lon = _field(item, "latitude"), _field(item, "longitude")
+    if lat is not None and lon is not None:
+        return lat, lon
+    address = _field(item, "pickup_location") or _field(item, "location")
+    return geo.geocode(address) if address else None
+
+def _distances(origin: Optional[Tuple[float, float]], items: List) -> np.ndarray:
+    """Distance from origin to every item; NaN where either end is unknown."""
+    if not origin:
+        return np.full(len(items), np.nan)
+    coords = np.array([_locate(item) or (np.nan, np.nan) for item in items], dtype=float)
+    return geo.haversine_km_array(origin[0], origin[1], coords[:, 0], coords[:, 1])
+
+def _route_stops(pickups: List, deliveries: List):
+    """Solver stops for tasks, with the located tasks, unlocated tasks and time origin."""
+    tasks = [(PICKUP, t) for t in pickups] + [(DELIVERY, t) for t in deliveries]
+    times = [_field(t, "scheduled_time") for _, t in tasks if _field(t, "scheduled_time")]
+    origin = min(times) if times else datetime.utcnow()
+
+    stops, located, unlocated, pickup_by_listing = [], [], [], {}
+    for kind, task in tasks:
+        coords = _locate(task)
+        if not coords:
+            unlocated.append(task)
+            continue
+        scheduled = _field(task, "scheduled_time")
+        ready = (scheduled - origin).total_seconds() / 60.0 if scheduled else 0.0
+        listing_id = _field(task, "listing_id")
+        if kind == PICKUP and listing_id is not None:
+            pickup_by_listing[listing_id] = len(stops)
+        stops.append(Stop(
+            latitude=coords[0],
+            longitude=coords[1],
+            kind=kind,
+            load=_field(task, "load") or 1.0,
+            ready_minute=ready,
+            due_minute=ready + ROUTE_WINDOW_MINUTES if scheduled else float("inf"),
+            service_minutes=_field(task, "estimated_duration") or ROUTE_SERVICE_MINUTES,
+            pickup_index=pickup_by_listing.get(listing_id, -1) if kind == DELIVERY else -1
+        ))
+        located.append(task)
+    return stops, located, unlocated, origin
+
+def _route_result(plan, stops: List[Stop], located: List, unlocated: List, origin: datetime) -> List[Dict]:
+    route = [
+        {
+            "task": located[index],
+            "arrival_time": origin + timedelta(minutes=arrival),
+            "late": arrival > stops[index].due_minute
+        }
+        for index, arrival in zip(plan.order, plan.arrival_minutes)
+    ]
+    left_over = [located[index] for index in plan.unrouted] + unlocated
+    return route + [{"task": task, "arrival_time": None, "late": False} for task in left_over]
+
+def _hours_until(times: List[Optional[datetime]], now: datetime) -> np.ndarray:
+    """Hours from now until each timestamp; NaN where unknown."""
+    return np.array([
+        (t - now).total_seconds() / 3600.0 if t else np.nan for t in times
+    ], dtype=float)
 
 class BlockchainLogger:
     def __init__(self):
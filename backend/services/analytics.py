@@ -1,86 +1,93 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from decouple import config
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from ..models.analytics import ImpactMetric, MetricType
 from ..models.users import User, UserType
 from ..models.listings import FoodListing, ListingStatus
 from ..models.tasks import VolunteerTask, TaskStatus
+from ..models.database import pool_status, DB_MAX_OVERFLOW
+from .rollups import sum_impact_metrics
+from .passwords import password_hasher
+from .outbox import outbox_dispatcher
+from .metrics import metrics
+from .recommendations import recommendation_cache
+from .response_cache import listing_feed_cache
+
+# Thresholds past which the API is reported as degraded
+HEALTH_ERROR_RATE = config('HEALTH_ERROR_RATE', default=0.05, cast=float)
+HEALTH_P95_MS = config('HEALTH_P95_MS', default=1000, cast=float)
 
 class AnalyticsService:
     async def get_admin_metrics(self, db: Session, start_date: datetime, end_date: datetime) -> Dict:
         """Get comprehensive metrics for admin dashboard."""
+        # User aggregates feed both the user and system sections; query them once
+        user_totals = self._query_user_totals(db)
         return {
             "period_start": start_date,
             "period_end": end_date,
-            "user_metrics": await self.get_user_statistics(db),
-            "system_metrics": await self.get_system_statistics(db),
+            "user_metrics": await self.get_user_statistics(db, user_totals),
+            "system_metrics": await self.get_system_statistics(db, user_totals),
             "impact_metrics": await self.calculate_impact_metrics(db, start_date, end_date),
             "financial_metrics": await self.calculate_financial_metrics(db, start_date, end_date)
         }
 
-    async def get_user_statistics(self, db: Session) -> Dict:
+    async def get_user_statistics(self, db: Session, user_totals: Optional[Dict] = None) -> Dict:
         """Get detailed user statistics."""
-        total_users = db.query(func.count(User.id)).scalar()
-        
-        # Get user counts by type
-        user_types = {}
-        for user_type in UserType:
-            count = db.query(func.count(User.id)).filter(
-                User.user_type == user_type
-            ).scalar()
-            user_types[user_type.value] = count
-        
-        # Get new users in last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        new_users = db.query(func.count(User.id)).filter(
-            User.created_at >= thirty_days_ago
-        ).scalar()
-        
+        totals = user_totals or self._query_user_totals(db)
         return {
-            "total_users": total_users,
-            "user_types": user_types,
-            "new_users_30d": new_users,
+            "total_users": totals["total"],
+            "user_types": totals["user_types"],
+            "new_users_30d": totals["new_30d"],
             "active_users": {
-                "24h": self._get_active_users(db, hours=24),
-                "7d": self._get_active_users(db, days=7),
-                "30d": self._get_active_users(db, days=30)
+                "24h": totals["active_24h"],
+                "7d": totals["active_7d"],
+                "30d": totals["active_30d"]
             },
             "engagement_metrics": await self.calculate_engagement_metrics(db)
         }
 
-    async def get_system_statistics(self, db: Session) -> Dict:
+    async def get_system_statistics(self, db: Session, user_totals: Optional[Dict] = None) -> Dict:
         """Get system-wide statistics."""
+        totals = user_totals or self._query_user_totals(db)
+        completed_deliveries = db.query(func.count(VolunteerTask.id)).filter(
+            VolunteerTask.status == TaskStatus.COMPLETED
+        ).scalar_subquery()
+
+        # Listing counts, donated weight and deliveries in one round trip
+        total_listings, active_listings, total_donations, total_deliveries = db.query(
+            func.count(FoodListing.id),
+            func.count(FoodListing.id).filter(FoodListing.status == ListingStatus.AVAILABLE),
+            func.sum(FoodListing.quantity).filter(
+                FoodListing.is_donation == True,
+                FoodListing.status == ListingStatus.COMPLETED
+            ),
+            completed_deliveries
+        ).one()
+
         return {
-            "total_users": db.query(func.count(User.id)).scalar(),
-            "active_users_24h": self._get_active_users(db, hours=24),
-            "total_listings": db.query(func.count(FoodListing.id)).scalar(),
-            "active_listings": db.query(func.count(FoodListing.id)).filter(
-                FoodListing.status == ListingStatus.AVAILABLE
-            ).scalar(),
-            "total_donations": self._calculate_total_donations(db),
-            "total_deliveries": db.query(func.count(VolunteerTask.id)).filter(
-                VolunteerTask.status == TaskStatus.COMPLETED
-            ).scalar(),
-            "system_health": self._get_system_health(),
-            "performance_metrics": self._get_performance_metrics(db)
+            "total_users": totals["total"],
+            "active_users_24h": totals["active_24h"],
+            "total_listings": total_listings,
+            "active_listings": active_listings,
+            "total_donations": total_donations or 0,
+            "total_deliveries": total_deliveries or 0,
+            "system_health": self._get_system_health(db),
+            "performance_metrics": self._get_performance_metrics(db),
+            "routes": metrics.route_summaries(),
+            "slow_queries": [query._asdict() for query in reversed(metrics.slow_queries)]
         }
 
     async def calculate_impact_metrics(
         self, db: Session, start_date: datetime, end_date: datetime
     ) -> Dict[str, float]:
         """Calculate environmental and social impact metrics."""
-        metrics = {}
-        
-        for metric_type in MetricType:
-            value = db.query(func.sum(ImpactMetric.value)).filter(
-                ImpactMetric.metric_type == metric_type,
-                ImpactMetric.timestamp.between(start_date, end_date)
-            ).scalar() or 0
-            metrics[metric_type.value] = value
+        totals = sum_impact_metrics(db, start_date, end_date)
         
-        return metrics
+        return {metric_type.value: totals.get(metric_type) or 0 for metric_type in MetricType}
 
     async def calculate_financial_metrics(
         self, db: Session, start_date: datetime, end_date: datetime
@@ -102,40 +109,65 @@ class AnalyticsService:
             "response_rate": 0
         }
 
-    def _get_active_users(self, db: Session, days: int = None, hours: int = None) -> int:
-        """Get count of users active within the specified time period."""
-        if days:
-            threshold = datetime.utcnow() - timedelta(days=days)
-        elif hours:
-            threshold = datetime.utcnow() - timedelta(hours=hours)
-        else:
-            threshold = datetime.utcnow() - timedelta(days=1)
-
-        return db.query(func.count(User.id)).filter(
-            User.updated_at >= threshold
-        ).scalar()
-
-    def _calculate_total_donations(self, db: Session) -> float:
-        """Calculate total weight of donated food."""
-        return db.query(func.sum(FoodListing.quantity)).filter(
-            FoodListing.is_donation == True,
-            FoodListing.status == ListingStatus.COMPLETED
-        ).scalar() or 0
-
-    def _get_system_health(self) -> Dict[str, str]:
-        """Get system health indicators."""
-        # TODO: Implement system health checks
+    def _query_user_totals(self, db: Session) -> Dict:
+        """Count users overall, per type, new and active in a single query.
+
+        Every figure is a FILTERed aggregate over one scan of the users table.
+        """
+        now = datetime.utcnow()
+        user_types = list(UserType)
+        row = db.query(
+            func.count(User.id),
+            func.count(User.id).filter(User.created_at >= now - timedelta(days=30)),
+            func.count(User.id).filter(User.updated_at >= now - timedelta(hours=24)),
+            func.count(User.id).filter(User.updated_at >= now - timedelta(days=7)),
+            func.count(User.id).filter(User.updated_at >= now - timedelta(days=30)),
+            *[func.count(User.id).filter(User.user_type == user_type) for user_type in user_types]
+        ).one()
+
+        return {
+            "total": row[0],
+            "new_30d": row[1],
+            "active_24h": row[2],
+            "active_7d": row[3],
+            "active_30d": row[4],
+            "user_types": {
+                user_type.value: count for user_type, count in zip(user_types, row[5:])
+            }
+        }
+
+    def _get_system_health(self, db: Session) -> Dict[str, str]:
+        """Get system health indicators: healthy, degraded or unhealthy."""
+        try:
+            db.execute(text("SELECT 1"))
+            database = "healthy"
+        except SQLAlchemyError as e:
+            print(f"Database health check failed: {str(e)}")
+            database = "unhealthy"
+        pool = pool_status()
+        if database == "healthy" and "db_pool_size" in pool and (
+            pool["db_pool_checked_out"] >= pool["db_pool_size"] + DB_MAX_OVERFLOW
+        ):
+            database = "degraded"
+
+        summary = metrics.summary()
+        api_degraded = (
+            summary["error_rate"] >= HEALTH_ERROR_RATE or summary["p95_response_time"] >= HEALTH_P95_MS
+        )
         return {
-            "database": "healthy",
-            "cache": "healthy",
-            "queues": "healthy"
+            "database": database,
+            "api": "degraded" if api_degraded else "healthy",
+            "cache": "healthy",  # in-process, so up whenever the API is
+            "queues": "degraded" if outbox_dispatcher.dead else "healthy"
         }
 
     def _get_performance_metrics(self, db: Session) -> Dict[str, float]:
-        """Get system performance metrics."""
-        # TODO: Implement performance metric calculations
+        """Get system performance metrics; times are in milliseconds."""
         return {
-            "average_response_time": 0,
-            "database_latency": 0,
-            "cache_hit_rate": 0
+            **metrics.summary(),
+            "cache_hit_rate": recommendation_cache.hit_rate,
+            **listing_feed_cache.stats(),
+            **pool_status(),
+            **password_hasher.stats(),
+            **outbox_dispatcher.stats()
         }
\ No newline at end of file
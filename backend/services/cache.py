@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    `on_evict(key, value)` is called whenever an entry leaves the cache for
+    any reason (expiry, LRU eviction, pop or clear) so owners can keep
+    secondary indexes in step.
+    """
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self._evicted(key, value)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._data.pop(key, None)
+            self._data[key] = (expires_at, value)
+            evicted = []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+        if old is not None:
+            self._evicted(key, old[1])
+        for evicted_key, (_, evicted_value) in evicted:
+            self._evicted(evicted_key, evicted_value)
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """
+        Swap the value of a live entry, keeping its original expiry.
+
+        Returns:
+            bool: False, changing nothing, if the key is missing or expired
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                return False
+            self._data[key] = (item[0], value)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self._evicted(key, item[1])
+        return item[1]
+
+    def clear(self):
+        with self._lock:
+            items, self._data = list(self._data.items()), OrderedDict()
+        for key, (_, value) in items:
+            self._evicted(key, value)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evicted(self, key: Hashable, value: Any):
+        if self.on_evict:
+            self.on_evict(key, value)
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import List, Optional
+
+from decouple import config
+from sqlalchemy import case, literal, select, update
+
+from ..models.claims import Claim, ClaimStatus
+from ..models.listings import FoodListing, ListingStatus
+from .outbox import enqueue_notification
+from .recommendations import recommendation_cache
+
+# Waitlisted claims examined per promotion pass
+WAITLIST_PROMOTION_BATCH = config('WAITLIST_PROMOTION_BATCH', default=50, cast=int)
+
+# Listings a claim can still be waitlisted on, because a live claim may yet be released
+WAITLISTABLE_STATUSES = [ListingStatus.AVAILABLE, ListingStatus.CLAIMED, ListingStatus.IN_TRANSIT]
+
+def _status(value: ListingStatus):
+    return literal(value, FoodListing.status.type)
+
+async def allocate(db, listing_id: int, amount: Optional[float] = None) -> Optional[float]:
+    """
+    Reserve part of a listing with one conditional UPDATE.
+
+    Concurrent claimers serialise on the listing's row lock inside the
+    database and each either gets its amount or finds too little left, so
+    nobody over-allocates and nobody has to retry. The listing turns CLAIMED
+    once nothing is left.
+
+    Args:
+        amount: Quantity wanted; None takes everything still available
+
+    Returns:
+        Optional[float]: The amount reserved, or None if it isn't available
+    """
+    remaining = FoodListing.quantity - FoodListing.claimed_quantity
+    if amount is None:
+        # Lock the row first so the remainder can't shrink before the update
+        row = (await db.execute(
+            select(remaining).where(
+                FoodListing.id == listing_id,
+                FoodListing.status == ListingStatus.AVAILABLE
+            ).with_for_update()
+        )).first()
+        if row is None or not row[0] or row[0] <= 0:
+            return None
+        amount = row[0]
+
+    claimed = FoodListing.claimed_quantity + amount
+    result = await db.execute(
+        update(FoodListing).where(
+            FoodListing.id == listing_id,
+            FoodListing.status == ListingStatus.AVAILABLE,
+            remaining >= amount
+        ).values(
+            claimed_quantity=claimed,
+            status=case(
+                (claimed >= FoodListing.quantity, _status(ListingStatus.CLAIMED)),
+                else_=_status(ListingStatus.AVAILABLE)
+            ),
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+    return amount if result.rowcount == 1 else None
+
+async def release(db, listing_id: int, amount: Optional[float]):
+    """Return a claim's share to its listing, reopening it if it was fully claimed.
+
+    Claims without a recorded amount predate partial claims and held the whole listing.
+    """
+    claimed = FoodListing.claimed_quantity - amount if amount is not None else literal(0.0)
+    await db.execute(
+        update(FoodListing).where(
+            FoodListing.id == listing_id,
+            FoodListing.status.in_([ListingStatus.AVAILABLE, ListingStatus.CLAIMED, ListingStatus.IN_TRANSIT])
+        ).values(
+            claimed_quantity=case((claimed > 0, claimed), else_=0.0),
+            status=ListingStatus.AVAILABLE,
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+
+async def mark_in_transit(db, listing_id: int):
+    """A fully claimed listing moves on once a claim on it is approved."""
+    await db.execute(
+        update(FoodListing).where(
+            FoodListing.id == listing_id,
+            FoodListing.status == ListingStatus.CLAIMED
+        ).values(
+            status=ListingStatus.IN_TRANSIT, updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+
+async def promote_waitlist(db, listing_id: int) -> List[Claim]:
+    """
+    Allocate freed quantity to waitlisted claims, oldest first.
+
+    A claim that wants more than is left is skipped so smaller ones behind
+    it can still be served. Rows another transaction is already promoting
+    are skipped rather than waited on.
+
+    Returns:
+        List[Claim]: Claims moved to PENDING, with their claimers notified
+    """
+    waiting = (await db.execute(
+        select(Claim).where(
+            Claim.listing_id == listing_id,
+            Claim.status == ClaimStatus.WAITLISTED
+        ).order_by(Claim.created_at, Claim.id).limit(WAITLIST_PROMOTION_BATCH).with_for_update(skip_locked=True)
+    )).scalars().all()
+
+    promoted = []
+    for claim in waiting:
+        amount = await allocate(db, listing_id, claim.quantity)
+        if amount is None:
+            if claim.quantity is None:
+                # Nothing at all is left
+                break
+            continue
+        claim.status = ClaimStatus.PENDING
+        claim.quantity = amount
+        enqueue_notification(
+            db, claim.claimer_id,
+            f"Your waitlisted claim on listing #{listing_id} is now pending"
+        )
+        promoted.append(claim)
+    return promoted
+
+async def listing_state(db, listing_id: int):
+    """Status and location as this transaction left them, for cache upkeep after commit.
+
+    The conditional updates above bypass the session hooks that normally do this.
+    """
+    return (await db.execute(
+        select(FoodListing.id, FoodListing.status, FoodListing.latitude, FoodListing.longitude).where(
+            FoodListing.id == listing_id
+        )
+    )).first()
+
+def refresh_recommendations(state):
+    if state is None:
+        return
+    if state.status == ListingStatus.AVAILABLE:
+        recommendation_cache.listing_changed(state.latitude, state.longitude)
+    else:
+        recommendation_cache.listing_removed(state.id)
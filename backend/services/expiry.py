@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from decouple import config
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from ..models.claims import Claim, ClaimStatus
+from ..models.database import AsyncSessionLocal
+from ..models.listings import FoodListing, ListingStatus
+from ..models.tasks import VolunteerTask, TaskStatus
+from .outbox import enqueue_notification
+from .recommendations import recommendation_cache
+
+EXPIRY_SCHEDULER_ENABLED = config('EXPIRY_SCHEDULER_ENABLED', default=True, cast=bool)
+# Only listings expiring within this window are held in memory
+EXPIRY_HORIZON = config('EXPIRY_HORIZON', default=3600, cast=int)
+# How often the window is reloaded, which also picks up listings written by other workers
+EXPIRY_REFRESH_INTERVAL = config('EXPIRY_REFRESH_INTERVAL', default=300, cast=int)
+EXPIRY_BATCH_SIZE = config('EXPIRY_BATCH_SIZE', default=500, cast=int)
+# Listings another transaction had locked are retried after this many seconds
+EXPIRY_RETRY_DELAY = config('EXPIRY_RETRY_DELAY', default=5, cast=float)
+
+# Listings in these states still hold food that can go off
+EXPIRABLE_STATUSES = [ListingStatus.AVAILABLE, ListingStatus.CLAIMED]
+
+def _naive_utc(value: datetime) -> datetime:
+    """Expiration dates are stored as naive UTC; API input may carry an offset."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+async def expire_listings(db, listing_ids: List[int], now: datetime) -> List[int]:
+    """
+    Move due listings to EXPIRED and unwind what depended on them.
+
+    Pending and waitlisted claims are cancelled and open volunteer tasks
+    dropped, with the affected claimers and volunteers notified, all in one
+    transaction. Rows already handled (by another worker, or a status
+    change) are skipped.
+
+    Returns:
+        List[int]: Ids of the listings actually expired
+    """
+    result = await db.execute(
+        select(FoodListing.id).where(
+            FoodListing.id.in_(listing_ids),
+            FoodListing.status.in_(EXPIRABLE_STATUSES),
+            FoodListing.expiration_date <= now
+        ).with_for_update(skip_locked=True)
+    )
+    expired_ids = [row[0] for row in result.all()]
+    if not expired_ids:
+        return []
+
+    claims = (await db.execute(
+        select(Claim.id, Claim.claimer_id, Claim.listing_id).where(
+            Claim.listing_id.in_(expired_ids),
+            Claim.status.in_([ClaimStatus.PENDING, ClaimStatus.WAITLISTED])
+        )
+    )).all()
+    tasks = (await db.execute(
+        select(VolunteerTask.id, VolunteerTask.volunteer_id, VolunteerTask.title).where(
+            VolunteerTask.listing_id.in_(expired_ids),
+            VolunteerTask.status.in_([TaskStatus.PENDING, TaskStatus.ASSIGNED])
+        )
+    )).all()
+
+    await db.execute(
+        update(FoodListing).where(FoodListing.id.in_(expired_ids)).values(
+            status=ListingStatus.EXPIRED, updated_at=now
+        ).execution_options(synchronize_session=False)
+    )
+    if claims:
+        await db.execute(
+            update(Claim).where(Claim.id.in_([c.id for c in claims])).values(
+                status=ClaimStatus.CANCELLED, updated_at=now
+            ).execution_options(synchronize_session=False)
+        )
+    if tasks:
+        await db.execute(
+            update(VolunteerTask).where(VolunteerTask.id.in_([t.id for t in tasks])).values(
+                status=TaskStatus.CANCELLED, updated_at=now
+            ).execution_options(synchronize_session=False)
+        )
+
+    for claim in claims:
+        enqueue_notification(db, claim.claimer_id, f"Listing #{claim.listing_id} expired before pickup; your claim was cancelled")
+    for task in tasks:
+        if task.volunteer_id:
+            enqueue_notification(db, task.volunteer_id, f"Task cancelled because the food expired: {task.title}")
+    await db.commit()
+
+    # Bulk updates bypass the session hooks that normally patch this cache
+    for listing_id in expired_ids:
+        recommendation_cache.listing_removed(listing_id)
+    return expired_ids
+
+class ExpiryScheduler:
+    """
+    Expires listings as their expiration_date passes.
+
+    Listings due within EXPIRY_HORIZON sit in a min-heap keyed on
+    expiration; the loop sleeps until the earliest one is due and then
+    expires everything due in bulk batches, so each wake-up touches only
+    due rows. The window is reloaded every EXPIRY_REFRESH_INTERVAL, and
+    listings committed in this process are scheduled immediately.
+    """
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.expired = 0
+        self._heap: List[Tuple[datetime, int]] = []
+        # Current expiration per scheduled listing; heap entries that no
+        # longer match are stale and skipped when popped
+        self._scheduled: Dict[int, datetime] = {}
+        self._horizon_end = datetime.min
+        # Sync routers commit on threadpool threads, so scheduling is locked
+        # and wake-ups go through the loop
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def schedule(self, listing_id: int, expiration_date: Optional[datetime]):
+        if expiration_date is not None:
+            expiration_date = _naive_utc(expiration_date)
+        with self._lock:
+            if expiration_date is None or expiration_date > self._horizon_end:
+                # Outside the window; the next refresh will pick it up
+                self._scheduled.pop(listing_id, None)
+                return
+            if self._scheduled.get(listing_id) == expiration_date:
+                return
+            self._scheduled[listing_id] = expiration_date
+            heapq.heappush(self._heap, (expiration_date, listing_id))
+            earliest = self._heap[0][1] == listing_id
+        if earliest and self._loop:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def unschedule(self, listing_id: int):
+        with self._lock:
+            self._scheduled.pop(listing_id, None)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        next_refresh = datetime.min
+        while True:
+            try:
+                now = datetime.utcnow()
+                if now >= next_refresh:
+                    await self.refresh(now)
+                    next_refresh = now + timedelta(seconds=EXPIRY_REFRESH_INTERVAL)
+                await self.expire_due(now)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error expiring listings: {str(e)}")
+
+            self._wakeup.clear()
+            wake_at = next_refresh
+            with self._lock:
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+            timeout = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self, now: datetime):
+        """Reload every expirable listing due before the end of the next window."""
+        horizon_end = now + timedelta(seconds=EXPIRY_HORIZON + EXPIRY_REFRESH_INTERVAL)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(FoodListing.id, FoodListing.expiration_date).where(
+                    FoodListing.status.in_(EXPIRABLE_STATUSES),
+                    FoodListing.expiration_date <= horizon_end
+                )
+            )
+            rows = result.all()
+        with self._lock:
+            self._horizon_end = horizon_end
+            self._scheduled = {listing_id: expiration for listing_id, expiration in rows}
+            self._heap = [(expiration, listing_id) for listing_id, expiration in rows]
+            heapq.heapify(self._heap)
+
+    async def expire_due(self, now: datetime) -> int:
+        """Expire everything due by `now`, EXPIRY_BATCH_SIZE listings per transaction."""
+        total = 0
+        while True:
+            batch = self._pop_due(now)
+            if not batch:
+                return total
+            async with self.session_factory() as db:
+                expired_ids = await expire_listings(db, batch, now)
+                missed = set(batch).difference(expired_ids)
+                if missed:
+                    # Still due but skipped as locked, e.g. mid-claim; try again shortly
+                    result = await db.execute(select(FoodListing.id).where(
+                        FoodListing.id.in_(missed),
+                        FoodListing.status.in_(EXPIRABLE_STATUSES),
+                        FoodListing.expiration_date <= now
+                    ))
+                    self._retry([row[0] for row in result.all()], now + timedelta(seconds=EXPIRY_RETRY_DELAY))
+            self.expired += len(expired_ids)
+            total += len(expired_ids)
+
+    def _retry(self, listing_ids: List[int], at: datetime):
+        with self._lock:
+            for listing_id in listing_ids:
+                if listing_id not in self._scheduled:
+                    self._scheduled[listing_id] = at
+                    heapq.heappush(self._heap, (at, listing_id))
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        batch = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(batch) < EXPIRY_BATCH_SIZE:
+                expiration, listing_id = heapq.heappop(self._heap)
+                if self._scheduled.get(listing_id) == expiration:
+                    del self._scheduled[listing_id]
+                    batch.append(listing_id)
+        return batch
+
+expiry_scheduler = ExpiryScheduler()
+
+# Schedule listings as soon as they're committed in this process
+
+@event.listens_for(Session, "after_flush")
+def _collect_listing_expiries(session, flush_context):
+    changes = session.info.setdefault("listing_expiries", [])
+    for obj in session.deleted:
+        if isinstance(obj, FoodListing):
+            changes.append((obj.id, None))
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, FoodListing):
+            active = obj.status in (None, *EXPIRABLE_STATUSES)
+            changes.append((obj.id, obj.expiration_date if active else None))
+
+@event.listens_for(Session, "after_commit")
+def _schedule_listing_expiries(session):
+    for listing_id, expiration_date in session.info.pop("listing_expiries", []):
+        if expiration_date is None:
+            expiry_scheduler.unschedule(listing_id)
+        else:
+            expiry_scheduler.schedule(listing_id, expiration_date)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_listing_expiries(session):
+    session.info.pop("listing_expiries", None)
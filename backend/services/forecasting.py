@@ -0,0 +1,248 @@
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from decouple import config
+from sqlalchemy import exists, func, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.analytics import ImpactMetric, MetricType
+from ..models.claims import Claim, ClaimStatus
+from ..models.listings import FoodCategory, FoodListing
+from . import geo
+
+# "seasonal", or "package.module:Class" for a custom backend. Backends are
+# imported on first prediction, never at startup.
+FORECAST_BACKEND = config('FORECAST_BACKEND', default='seasonal')
+FORECAST_MODEL_PATH = config('FORECAST_MODEL_PATH', default='demand_model.npz')
+FORECAST_HISTORY_DAYS = config('FORECAST_HISTORY_DAYS', default=180, cast=int)
+# Observations a slot needs before its own history outweighs the pooled profile
+FORECAST_SMOOTHING = config('FORECAST_SMOOTHING', default=4.0, cast=float)
+FORECAST_CELL_PRECISION = 4  # ~20-40km cells, as for recommendations
+
+HOURS_PER_WEEK = 168
+CATEGORIES = list(FoodCategory)
+_CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
+
+def _category(value) -> Optional[FoodCategory]:
+    try:
+        return FoodCategory(value)
+    except ValueError:
+        return None
+
+def hour_of_week(time: datetime) -> int:
+    return time.weekday() * 24 + time.hour
+
+def location_cell(location: Optional[str]) -> Optional[str]:
+    """Forecast cell for an address or "lat,lon" string."""
+    coords = geo.geocode(location) if location else None
+    return geo.encode_geohash(*coords, precision=FORECAST_CELL_PRECISION) if coords else None
+
+class DemandModel(ABC):
+    """
+    Interface for demand forecasting backends.
+
+    A backend is loaded from FORECAST_MODEL_PATH with `load` and answers
+    batches of (cell, category, time) queries with expected demand per hour.
+    """
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "DemandModel":
+        ...
+
+    @abstractmethod
+    def predict_batch(
+        self, cells: Sequence[Optional[str]], categories: Sequence, times: Sequence[datetime]
+    ) -> np.ndarray:
+        ...
+
+    def predict(self, cell: Optional[str], category, time: datetime) -> float:
+        return float(self.predict_batch([cell], [category], [time])[0])
+
+    @abstractmethod
+    def predict_region(self, prefix: str, time: datetime) -> Dict[Tuple[str, FoodCategory], float]:
+        ...
+
+class SeasonalDemandModel(DemandModel):
+    """
+    Seasonal lookup table of mean demand per (cell, category, hour-of-week).
+
+    Sparse slots are shrunk towards the slot's cell/category level times the
+    category's weekly profile pooled over all cells, so quiet cells still get
+    a sensible shape. Prediction is a table lookup.
+    """
+    def __init__(self, cells: Sequence[str], table: np.ndarray, trained_at: Optional[datetime] = None):
+        self.cells = list(cells)
+        self.table = np.asarray(table, dtype=np.float32)
+        self.trained_at = trained_at
+        self._cell_index = {cell: i for i, cell in enumerate(self.cells)}
+        # Unknown cells get the average cell
+        if self.cells:
+            self._fallback = self.table.mean(axis=0)
+        else:
+            self._fallback = np.zeros((len(CATEGORIES), HOURS_PER_WEEK), dtype=np.float32)
+
+    @classmethod
+    def fit(
+        cls,
+        events: Iterable[Tuple[datetime, Optional[str], FoodCategory, float]],
+        weeks: float,
+        smoothing: float = FORECAST_SMOOTHING
+    ) -> "SeasonalDemandModel":
+        """
+        Build the table from demand events.
+
+        Args:
+            events: (timestamp, cell, category, amount) tuples; events without a cell are skipped
+            weeks: Length of the history the events cover, in weeks
+            smoothing: Pseudo-observations given to the pooled estimate per slot
+        """
+        cells, cell_ids, category_ids, hours, amounts = [], [], [], [], []
+        cell_index: Dict[str, int] = {}
+        for timestamp, cell, category, amount in events:
+            category = _category(category)
+            if not cell or category is None or timestamp is None:
+                continue
+            if cell not in cell_index:
+                cell_index[cell] = len(cells)
+                cells.append(cell)
+            cell_ids.append(cell_index[cell])
+            category_ids.append(_CATEGORY_INDEX[category])
+            hours.append(hour_of_week(timestamp))
+            amounts.append(amount or 0.0)
+
+        shape = (len(cells), len(CATEGORIES), HOURS_PER_WEEK)
+        totals, counts = np.zeros(shape), np.zeros(shape)
+        index = (np.array(cell_ids, dtype=int), np.array(category_ids, dtype=int), np.array(hours, dtype=int))
+        np.add.at(totals, index, np.array(amounts, dtype=float))
+        np.add.at(counts, index, 1.0)
+
+        weeks = max(weeks, 1.0)
+        raw = totals / weeks
+        level = raw.mean(axis=2, keepdims=True)
+        pooled = totals.sum(axis=0)
+        profile = pooled / np.maximum(pooled.mean(axis=1, keepdims=True), 1e-12)
+        profile[pooled.sum(axis=1) == 0] = 1.0
+        weight = counts / (counts + smoothing)
+        table = weight * raw + (1.0 - weight) * level * profile[None, :, :]
+        return cls(cells, table, datetime.utcnow())
+
+    @classmethod
+    def load(cls, path: str) -> "SeasonalDemandModel":
+        with np.load(path, allow_pickle=False) as data:
+            trained_at = datetime.fromisoformat(str(data["trained_at"])) if "trained_at" in data else None
+            return cls([str(cell) for cell in data["cells"]], data["table"], trained_at)
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            cells=np.array(self.cells, dtype=str),
+            table=self.table,
+            trained_at=np.array((self.trained_at or datetime.utcnow()).isoformat())
+        )
+
+    def predict_batch(
+        self, cells: Sequence[Optional[str]], categories: Sequence, times: Sequence[datetime]
+    ) -> np.ndarray:
+        category_ids = np.array([_CATEGORY_INDEX.get(_category(c), -1) for c in categories], dtype=int)
+        hours = np.array([hour_of_week(t) for t in times], dtype=int)
+        cell_ids = np.array([self._cell_index.get(cell, -1) for cell in cells], dtype=int)
+        known = (cell_ids >= 0) & (category_ids >= 0)
+        unknown_cell = (cell_ids < 0) & (category_ids >= 0)
+
+        result = np.zeros(len(hours), dtype=float)
+        result[known] = self.table[cell_ids[known], category_ids[known], hours[known]]
+        result[unknown_cell] = self._fallback[category_ids[unknown_cell], hours[unknown_cell]]
+        return result
+
+    def predict_region(self, prefix: str, time: datetime) -> Dict[Tuple[str, FoodCategory], float]:
+        """Demand for every known cell under a geohash prefix and every category at one hour."""
+        rows = [i for i, cell in enumerate(self.cells) if cell.startswith(prefix)]
+        values = self.table[rows, :, hour_of_week(time)]
+        return {
+            (self.cells[row], category): float(values[r, c])
+            for r, row in enumerate(rows)
+            for c, category in enumerate(CATEGORIES)
+        }
+
+def demand_events(db: Session, since: datetime):
+    """
+    Historical demand: food taken up per listing, with the listing's cell and category.
+
+    Each non-rejected claim, waitlisted ones included, counts the quantity it
+    asked for (the whole listing for claims that predate partial claims). Food
+    rescued outside claims (trades, storefronts) comes from FOOD_RESCUED
+    impact metrics on listings that were never claimed.
+    """
+    cell = func.substr(FoodListing.geohash, 1, FORECAST_CELL_PRECISION)
+    claimed = select(
+        Claim.created_at.label("timestamp"), cell.label("cell"),
+        FoodListing.category.label("category"),
+        func.coalesce(Claim.quantity, FoodListing.quantity).label("amount")
+    ).join(FoodListing, Claim.listing_id == FoodListing.id).where(
+        Claim.created_at >= since,
+        Claim.status.notin_([ClaimStatus.REJECTED, ClaimStatus.CANCELLED])
+    )
+    rescued = select(
+        ImpactMetric.timestamp.label("timestamp"), cell.label("cell"),
+        FoodListing.category.label("category"), ImpactMetric.value.label("amount")
+    ).join(FoodListing, ImpactMetric.listing_id == FoodListing.id).where(
+        ImpactMetric.timestamp >= since,
+        ImpactMetric.metric_type == MetricType.FOOD_RESCUED,
+        ~exists().where(Claim.listing_id == FoodListing.id)
+    )
+    for row in db.execute(union_all(claimed, rescued).execution_options(yield_per=10000)):
+        yield row.timestamp, row.cell, row.category, row.amount
+
+def train_demand_model(
+    db: Session, path: str = FORECAST_MODEL_PATH, history_days: int = FORECAST_HISTORY_DAYS
+) -> SeasonalDemandModel:
+    """Fit the seasonal model on recent history and write it to `path`."""
+    since = datetime.utcnow() - timedelta(days=history_days)
+    model = SeasonalDemandModel.fit(demand_events(db, since), weeks=history_days / 7.0)
+    model.save(path)
+    return model
+
+_model: Optional[DemandModel] = None
+_model_missing = False  # no trained model was found; not retried until reset_demand_model
+_model_lock = threading.Lock()
+
+def get_demand_model() -> Optional[DemandModel]:
+    """The configured backend, imported and loaded on first use; None if no model is trained."""
+    global _model, _model_missing
+    if _model is None and not _model_missing:
+        with _model_lock:
+            if _model is None and not _model_missing:
+                if FORECAST_BACKEND == "seasonal":
+                    backend = SeasonalDemandModel
+                else:
+                    module_name, _, class_name = FORECAST_BACKEND.partition(":")
+                    backend = getattr(importlib.import_module(module_name), class_name)
+                try:
+                    _model = backend.load(FORECAST_MODEL_PATH)
+                except FileNotFoundError:
+                    print(f"No demand model at {FORECAST_MODEL_PATH}; run the forecasting trainer")
+                    _model_missing = True
+    return _model
+
+def reset_demand_model():
+    """Drop the loaded model so the next prediction reloads it, e.g. after retraining."""
+    global _model, _model_missing
+    with _model_lock:
+        _model = None
+        _model_missing = False
+
+if __name__ == "__main__":
+    # Register every mapper, as importing the app would
+    from ..models import notifications, storefronts, tasks, trades, users  # noqa: F401
+    from ..models.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        model = train_demand_model(db)
+        print(f"Trained demand model on {len(model.cells)} cells -> {FORECAST_MODEL_PATH}")
+    finally:
+        db.close()
@@ -0,0 +1,193 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+from decouple import config
+from sqlalchemy import func
+
+from .cache import TTLCache
+
+GEOCODER_URL = config('GEOCODER_URL', default='')
+GEOCODER_TIMEOUT = config('GEOCODER_TIMEOUT', default=2.0, cast=float)
+GEOCODER_CACHE_SIZE = config('GEOCODER_CACHE_SIZE', default=4096, cast=int)
+GEOCODER_CACHE_TTL = config('GEOCODER_CACHE_TTL', default=86400, cast=float)
+# Failed lookups are retried after this long instead of sticking for the cache's lifetime
+GEOCODER_FAILURE_TTL = config('GEOCODER_FAILURE_TTL', default=30, cast=float)
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # ~5m cells, plenty for pickup locations
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+_LAT_LON_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+def parse_lat_lon(value: str) -> Optional[Tuple[float, float]]:
+    """Parse a "lat,lon" string, returning None if it is not a valid coordinate pair."""
+    match = _LAT_LON_RE.match(value or "")
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+_geocode_cache = TTLCache(GEOCODER_CACHE_SIZE, GEOCODER_CACHE_TTL)
+_NOT_CACHED = object()
+
+def geocode(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Resolve a free-form address to coordinates.
+
+    Literal "lat,lon" strings are used as-is; anything else is sent to the
+    Nominatim-compatible service configured by GEOCODER_URL. Answers are
+    cached for GEOCODER_CACHE_TTL, but a request that fails is only
+    remembered for GEOCODER_FAILURE_TTL so a geocoder outage doesn't leave
+    addresses unresolved once it's over.
+
+    Returns:
+        Tuple[float, float]: (latitude, longitude), or None if it can't be resolved
+    """
+    coords = parse_lat_lon(address)
+    if coords or not GEOCODER_URL or not address:
+        return coords
+
+    cached = _geocode_cache.get(address, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+
+    try:
+        response = requests.get(
+            GEOCODER_URL,
+            params={"q": address, "format": "json", "limit": 1},
+            timeout=GEOCODER_TIMEOUT
+        )
+        response.raise_for_status()
+        results = response.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error geocoding address: {str(e)}")
+        _geocode_cache.set(address, None, ttl=GEOCODER_FAILURE_TTL)
+        return None
+
+    coords = (float(results[0]["lat"]), float(results[0]["lon"])) if results else None
+    _geocode_cache.set(address, coords)
+    return coords
+
+def location_fields(address: str) -> Dict[str, Optional[object]]:
+    """Geocoded column values (latitude, longitude, geohash) for an address."""
+    coords = geocode(address)
+    if not coords:
+        return {"latitude": None, "longitude": None, "geohash": None}
+    lat, lon = coords
+    return {"latitude": lat, "longitude": lon, "geohash": encode_geohash(lat, lon)}
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def haversine_km_array(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine; arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_km_sql(lat: float, lon: float, lat_column, lon_column):
+    """Haversine distance from a point to coordinate columns, as a SQL expression."""
+    half_dlat = func.radians(lat_column - lat) / 2
+    half_dlon = func.radians(lon_column - lon) / 2
+    a = (func.sin(half_dlat) * func.sin(half_dlat) +
+         math.cos(math.radians(lat)) * func.cos(func.radians(lat_column)) *
+         func.sin(half_dlon) * func.sin(half_dlon))
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle around a point."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6:
+        dlon = 180.0
+    else:
+        dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (
+        max(-90.0, lat - dlat), min(90.0, lat + dlat),
+        max(-180.0, lon - dlon), min(180.0, lon + dlon)
+    )
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a base32 geohash."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+def decode_geohash(geohash: str) -> Tuple[float, float, float, float]:
+    """Decode a geohash to (lat, lon, lat_error, lon_error) of its cell centre."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _BASE32_INDEX[c]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (
+        (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2,
+        (lat_range[1] - lat_range[0]) / 2, (lon_range[1] - lon_range[0]) / 2
+    )
+
+def _cell_size_km(precision: int, lat: float) -> float:
+    """Smaller side, in kilometres, of a geohash cell at the given latitude."""
+    lat_bits = (5 * precision) // 2
+    lon_bits = 5 * precision - lat_bits
+    height = math.radians(180.0 / (1 << lat_bits)) * EARTH_RADIUS_KM
+    width = math.radians(360.0 / (1 << lon_bits)) * EARTH_RADIUS_KM * math.cos(math.radians(lat))
+    return min(height, width)
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover a circle around a point.
+
+    Picks the finest precision whose cells are at least radius_km wide and
+    returns the cell containing the point plus its eight neighbours, so a
+    prefix match on the indexed geohash column only touches nearby rows.
+    """
+    precision = 1
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        if _cell_size_km(p, lat) >= radius_km:
+            precision = p
+            break
+
+    center = encode_geohash(lat, lon, precision)
+    c_lat, c_lon, lat_err, lon_err = decode_geohash(center)
+    cells = set()
+    for dlat in (-2 * lat_err, 0.0, 2 * lat_err):
+        for dlon in (-2 * lon_err, 0.0, 2 * lon_err):
+            n_lat = c_lat + dlat
+            if not -90 <= n_lat <= 90:
+                continue
+            n_lon = (c_lon + dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(n_lat, n_lon, precision))
+    return sorted(cells)
@@ -0,0 +1,193 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from decouple import config
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from ..models.listings import FoodListing, ListingStatus
+from ..schemas.listings import ListingCreate
+from . import geo
+from .expiry import expiry_scheduler
+from .recommendations import recommendation_cache
+
+# Rows per INSERT and per transaction. asyncpg allows 32767 bind parameters
+# per statement, so keep this under ~1800 at the current column count.
+LISTING_IMPORT_CHUNK_SIZE = config('LISTING_IMPORT_CHUNK_SIZE', default=500, cast=int)
+LISTING_BATCH_MAX = config('LISTING_BATCH_MAX', default=1000, cast=int)
+# Addresses geocoded at once per chunk, and how long a chunk waits for them;
+# rows still unresolved at the deadline are saved without coordinates
+LISTING_IMPORT_GEOCODE_CONCURRENCY = config('LISTING_IMPORT_GEOCODE_CONCURRENCY', default=8, cast=int)
+LISTING_IMPORT_GEOCODE_TIMEOUT = config('LISTING_IMPORT_GEOCODE_TIMEOUT', default=10.0, cast=float)
+
+# What the expiry scheduler, caches and on_commit need about each new row
+_CREATED_COLUMNS = (
+    FoodListing.id, FoodListing.expiration_date, FoodListing.latitude, FoodListing.longitude,
+    FoodListing.geohash, FoodListing.title, FoodListing.category
+)
+
+Row = Tuple[int, object]  # (row number, parsed record or the error that prevented parsing)
+
+async def _lines(chunks: AsyncIterable[bytes]):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterable[Row]:
+    """One JSON object per line; rows are numbered by line."""
+    line_number = 0
+    async for line in _lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+async def iter_csv(chunks: AsyncIterable[bytes]) -> AsyncIterable[Row]:
+    """CSV with a header row; rows are numbered by the line they start on."""
+    header, record, start, line_number = None, [], 0, 0
+    async for line in _lines(chunks):
+        line_number += 1
+        if not record:
+            start = line_number
+        record.append(line)
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            # A quoted field continues on the next line
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        # Empty cells fall back to schema defaults
+        yield start, {name: value for name, value in zip(header, values) if value != ""}
+    if record:
+        yield start, ValueError("Unterminated quoted field")
+
+async def iter_records(records: Iterable[object]) -> AsyncIterable[Row]:
+    """Rows of an in-memory batch, numbered by their index."""
+    for index, record in enumerate(records):
+        yield index, record
+
+def _validate(record) -> Tuple[Optional[ListingCreate], List[str]]:
+    if isinstance(record, Exception):
+        return None, [str(record)]
+    if not isinstance(record, dict):
+        return None, ["Expected an object"]
+    try:
+        return ListingCreate(**record), []
+    except ValidationError as e:
+        return None, [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+
+async def _locate_all(addresses: Iterable[str]) -> Dict[str, Dict]:
+    slots = asyncio.Semaphore(LISTING_IMPORT_GEOCODE_CONCURRENCY)
+
+    async def locate(address: str) -> Dict:
+        async with slots:
+            return await run_in_threadpool(geo.location_fields, address)
+
+    tasks = {address: asyncio.ensure_future(locate(address)) for address in addresses}
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=LISTING_IMPORT_GEOCODE_TIMEOUT)
+    for task in pending:
+        # A lookup already running finishes in its thread and is cached for next time
+        task.cancel()
+    unresolved = {"latitude": None, "longitude": None, "geohash": None}
+    return {
+        address: unresolved if task in pending or task.exception() else task.result()
+        for address, task in tasks.items()
+    }
+
+async def import_listings(
+    db,
+    owner_id: int,
+    rows: AsyncIterable[Row],
+    chunk_size: int = LISTING_IMPORT_CHUNK_SIZE,
+    on_commit: Optional[Callable[[List[Dict]], Awaitable[None]]] = None
+) -> Dict:
+    """
+    Validate and insert listings in chunks.
+
+    Each chunk of valid rows is written with a single multi-row INSERT in its
+    own transaction, so a bad chunk never undoes the ones before it. Caches,
+    the expiry scheduler and `on_commit` see each committed chunk once rather
+    than every row.
+
+    Returns:
+        Dict: created count, new listing_ids and per-row errors, as in ListingImportResult
+    """
+    result = {"created": 0, "listing_ids": [], "errors": []}
+    chunk: List[Tuple[int, ListingCreate]] = []
+    async for row, record in rows:
+        listing, errors = _validate(record)
+        if errors:
+            result["errors"].append({"row": row, "errors": errors})
+            continue
+        chunk.append((row, listing))
+        if len(chunk) >= chunk_size:
+            await _insert_chunk(db, owner_id, chunk, result, on_commit)
+            chunk = []
+    if chunk:
+        await _insert_chunk(db, owner_id, chunk, result, on_commit)
+    return result
+
+async def _insert_chunk(db, owner_id: int, chunk, result: Dict, on_commit):
+    locations = await _locate_all({listing.pickup_location for _, listing in chunk})
+    now = datetime.utcnow()
+    values = [{
+        **listing.dict(),
+        **locations[listing.pickup_location],
+        "owner_id": owner_id,
+        "status": ListingStatus.AVAILABLE,
+        "created_at": now,
+        "updated_at": now,
+    } for _, listing in chunk]
+
+    try:
+        if db.bind.dialect.name == "postgresql":
+            # RETURNING doesn't keep VALUES order, so take each row's fields from it
+            created = [dict(row) for row in (await db.execute(
+                insert(FoodListing).values(values).returning(*_CREATED_COLUMNS)
+            )).mappings()]
+        else:
+            # No multi-row RETURNING elsewhere (e.g. SQLite in tests)
+            created = [
+                {**row, "id": (await db.execute(insert(FoodListing).values(**row))).inserted_primary_key[0]}
+                for row in values
+            ]
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        print(f"Error importing listings: {str(e)}")
+        result["errors"].extend({"row": row, "errors": ["Could not be saved"]} for row, _ in chunk)
+        return
+
+    result["created"] += len(created)
+    result["listing_ids"].extend(row["id"] for row in created)
+
+    # Core inserts skip the session hooks that keep these in step
+    recommendation_cache.listings_changed((row["latitude"], row["longitude"]) for row in created)
+    for row in created:
+        expiry_scheduler.schedule(row["id"], row["expiration_date"])
+    if on_commit:
+        await on_commit(created)
@@ -0,0 +1,321 @@
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Queries at least this slow are sampled with their SQL
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=float)
+SLOW_QUERY_SAMPLES = config('SLOW_QUERY_SAMPLES', default=50, cast=int)
+# Bearer token Prometheus must present to scrape /metrics; empty leaves it open
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+UNMATCHED_ROUTE = "<unmatched>"  # one label for every 404, so bogus paths can't blow up cardinality
+SLOW_QUERY_SQL_LENGTH = 1000
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Observing is a bisect and two integer adds. Nothing is locked: requests
+    are recorded on the event loop, and a count lost to a worker-thread race
+    only skews a rate slightly.
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.bounds[-1]
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        buckets, total = [], 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets.append((f"{bound:g}", total))
+        buckets.append(("+Inf", total + self.counts[-1]))
+        return buckets
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_time", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = 0.0
+        self.statuses: Dict[int, int] = {}
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+    __slots__ = ("queries", "db_time", "path")
+
+    def __init__(self, path: Optional[str] = None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.path = path
+
+class SlowQuery(NamedTuple):
+    at: datetime
+    duration_ms: float
+    path: Optional[str]  # request path, None outside requests
+    statement: str  # parameters are left out; they may hold personal data
+
+_request: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+@contextmanager
+def request_stats(path: Optional[str] = None) -> Iterator[RequestStats]:
+    """
+    The RequestStats that SQL run by this task (and threads it hands work
+    to) is counted against, on any engine. Joins the one already active,
+    if any, so every middleware sees the same numbers.
+    """
+    stats = _request.get()
+    if stats is not None:
+        yield stats
+        return
+    stats = RequestStats(path)
+    token = _request.set(stats)
+    try:
+        yield stats
+    finally:
+        _request.reset(token)
+
+class MetricsRegistry:
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS, samples: int = SLOW_QUERY_SAMPLES):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.db_queries = Histogram(QUERY_LATENCY_BUCKETS)
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.slow_queries_total = 0
+        self.slow_queries: deque = deque(maxlen=samples)
+        self.started_at = time.time()
+
+    def observe_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.latency.observe(elapsed)
+        metrics.queries.observe(stats.queries)
+        metrics.db_time += stats.db_time
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def observe_query(self, statement: str, elapsed: float, request: Optional[RequestStats] = None):
+        self.db_queries.observe(elapsed)
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries_total += 1
+            self.slow_queries.append(SlowQuery(
+                datetime.utcnow(), round(elapsed * 1000, 3),
+                request.path if request is not None else None,
+                statement[:SLOW_QUERY_SQL_LENGTH]
+            ))
+
+    def summary(self) -> Dict[str, float]:
+        """Headline numbers for the admin dashboard; times are in milliseconds."""
+        latency = Histogram(LATENCY_BUCKETS)
+        queries = errors = 0
+        db_time = 0.0
+        for metrics in list(self.routes.values()):
+            latency.count += metrics.latency.count
+            latency.sum += metrics.latency.sum
+            latency.counts = [a + b for a, b in zip(latency.counts, metrics.latency.counts)]
+            queries += metrics.queries.sum
+            db_time += metrics.db_time
+            errors += sum(count for status, count in metrics.statuses.items() if status >= 500)
+        requests = latency.count
+        return {
+            "requests_total": requests,
+            "average_response_time": latency.sum / requests * 1000 if requests else 0.0,
+            "p95_response_time": latency.quantile(0.95) * 1000,
+            "error_rate": errors / requests if requests else 0.0,
+            "queries_per_request": queries / requests if requests else 0.0,
+            "database_time_per_request": db_time / requests * 1000 if requests else 0.0,
+            "database_latency": (
+                self.db_queries.sum / self.db_queries.count * 1000 if self.db_queries.count else 0.0
+            ),
+            "database_p95_latency": self.db_queries.quantile(0.95) * 1000,
+            "slow_queries_total": self.slow_queries_total,
+        }
+
+    def route_summaries(self, limit: int = 20) -> List[Dict]:
+        """The busiest routes with their latency and query profile."""
+        rows = []
+        for (method, route), metrics in list(self.routes.items()):
+            count = metrics.latency.count
+            rows.append({
+                "method": method,
+                "route": route,
+                "requests": count,
+                "average_ms": metrics.latency.sum / count * 1000 if count else 0.0,
+                "p95_ms": metrics.latency.quantile(0.95) * 1000,
+                "queries_per_request": metrics.queries.sum / count if count else 0.0,
+                "db_ms_per_request": metrics.db_time / count * 1000 if count else 0.0,
+            })
+        rows.sort(key=lambda row: row["requests"], reverse=True)
+        return rows[:limit]
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        routes = list(self.routes.items())
+
+        lines.append("# HELP http_request_duration_seconds Request latency by route")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), metrics in routes:
+            _histogram_lines(lines, "http_request_duration_seconds", _labels(method, route), metrics.latency)
+
+        lines.append("# HELP http_request_queries SQL statements run per request by route")
+        lines.append("# TYPE http_request_queries histogram")
+        for (method, route), metrics in routes:
+            _histogram_lines(lines, "http_request_queries", _labels(method, route), metrics.queries)
+
+        lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements by route")
+        lines.append("# TYPE http_request_db_seconds_total counter")
+        for (method, route), metrics in routes:
+            lines.append(f"http_request_db_seconds_total{{{_labels(method, route)}}} {metrics.db_time:.6f}")
+
+        lines.append("# HELP http_requests_total Requests by route and status code")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route), metrics in routes:
+            for status, count in list(metrics.statuses.items()):
+                lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}')
+
+        lines.append("# HELP db_query_duration_seconds SQL statement latency")
+        lines.append("# TYPE db_query_duration_seconds histogram")
+        _histogram_lines(lines, "db_query_duration_seconds", "", self.db_queries)
+
+        lines.append(f"# HELP db_slow_queries_total Statements slower than {SLOW_QUERY_MS:g}ms")
+        lines.append("# TYPE db_slow_queries_total counter")
+        lines.append(f"db_slow_queries_total {self.slow_queries_total}")
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE sharefoods_{name} gauge")
+            lines.append(f"sharefoods_{name} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        self.routes.clear()
+        self.db_queries = Histogram(QUERY_LATENCY_BUCKETS)
+        self.slow_queries_total = 0
+        self.slow_queries.clear()
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{method}",route="{_escape(route)}"'
+
+def _histogram_lines(lines: List[str], name: str, labels: str, histogram: Histogram):
+    prefix = f"{labels}," if labels else ""
+    for bound, count in histogram.cumulative():
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+
+metrics = MetricsRegistry()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # Counted even with metrics off; query budgets read the same stats
+    request = _request.get()
+    if request is not None:
+        request.queries += 1
+        request.db_time += elapsed
+    if METRICS_ENABLED:
+        metrics.observe_query(statement, elapsed, request)
+
+@event.listens_for(Engine, "handle_error")
+def _failed_query(context):
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def _route_paths(app) -> Dict:
+    paths = {}
+    for route in getattr(app, "routes", ()):
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None and hasattr(route, "path"):
+            paths.setdefault(endpoint, route.path)
+    return paths
+
+class MetricsMiddleware:
+    """
+    Records latency, status and database work per route.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware: it only wraps
+    `send` to see the status code, so it adds no task or stream copying to
+    the request path. Routes are labelled by their path template, never the
+    raw URL.
+    """
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+        self._paths: Dict = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with request_stats(scope["path"]) as stats:
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.registry.observe_request(scope["method"], self._route(scope), status, elapsed, stats)
+
+    def _route(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        path = self._paths.get(endpoint)
+        if path is None:
+            self._paths = _route_paths(scope.get("app"))
+            path = self._paths.setdefault(endpoint, UNMATCHED_ROUTE)
+        return path
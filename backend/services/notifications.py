@@ -1,45 +1,245 @@
-from typing import Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from email.message import EmailMessage
+import asyncio
+import smtplib
 import aiohttp
 from decouple import config
+from sqlalchemy import func, insert, select
+
+from ..models.database import AsyncSessionLocal
+from ..models.notifications import Notification, NotificationType
+from ..models.users import User
+from .cache import TTLCache
 
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_FROM_NUMBER = config('TWILIO_FROM_NUMBER', default='')
+TWILIO_API_URL = "https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
+
+SMTP_HOST = config('SMTP_HOST', default='')
+SMTP_PORT = config('SMTP_PORT', default=587, cast=int)
+SMTP_USERNAME = config('SMTP_USERNAME', default='')
+SMTP_PASSWORD = config('SMTP_PASSWORD', default='')
+SMTP_FROM = config('SMTP_FROM', default='no-reply@sharefoods.org')
+SMTP_USE_TLS = config('SMTP_USE_TLS', default=True, cast=bool)
+
+# Concurrent requests per HTTP provider over the shared keep-alive pool
+NOTIFICATION_HTTP_CONCURRENCY = config('NOTIFICATION_HTTP_CONCURRENCY', default=20, cast=int)
+
+UNREAD_COUNT_CACHE_SIZE = config('UNREAD_COUNT_CACHE_SIZE', default=50000, cast=int)
+# Bounds how stale a count can be when another worker changed it
+UNREAD_COUNT_TTL = config('UNREAD_COUNT_TTL', default=60, cast=float)
+
+class OutgoingNotification(NamedTuple):
+    user_id: int
+    message: str
+    method: str = "app"
+    type: NotificationType = NotificationType.SYSTEM
+    title: Optional[str] = None
+    data: Optional[dict] = None
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Process-wide HTTP session so provider calls reuse keep-alive connections."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=NOTIFICATION_HTTP_CONCURRENCY, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=15)
+        )
+    return _http_session
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+class UnreadCounter:
+    """
+    Cached per-user unread notification counts.
+
+    Counts are loaded from the partial unread index on a miss and then
+    adjusted in place on insert/read events, so polling clients rarely
+    reach the database.
+    """
+    def __init__(self, maxsize: int = UNREAD_COUNT_CACHE_SIZE, ttl: float = UNREAD_COUNT_TTL):
+        self._counts = TTLCache(maxsize, ttl)
+
+    async def get(self, db, user_id: int) -> int:
+        count = self._counts.get(user_id)
+        if count is None:
+            result = await db.execute(select(func.count(Notification.id)).where(
+                Notification.recipient_id == user_id,
+                Notification.read == False
+            ))
+            count = result.scalar()
+            self._counts.set(user_id, count)
+        return count
+
+    def adjust(self, user_id: int, delta: int):
+        """
+        Apply a change to a cached count; uncached users are loaded on demand.
+
+        The entry keeps its original expiry, so counts that drift (e.g. from
+        writes outside these events) are still reloaded after the TTL.
+        """
+        count = self._counts.get(user_id)
+        if count is not None:
+            self._counts.replace(user_id, max(0, count + delta))
+
+    def set(self, user_id: int, count: int):
+        self._counts.set(user_id, count)
+
+    def invalidate(self, user_id: int):
+        self._counts.pop(user_id)
+
+unread_counter = UnreadCounter()
 
 async def send_notification(user_id: int, message: str, method: str = "app") -> bool:
     """
     Send a notification to a user through their preferred notification method.
-    
+
     Args:
         user_id: The ID of the user to notify
         message: The notification message
         method: The notification method (app, sms, email)
-        
+
     Returns:
         bool: True if notification was sent successfully, False otherwise
     """
-    if method == "sms":
-        return await send_sms_notification(user_id, message)
-    elif method == "email":
-        return await send_email_notification(user_id, message)
-    else:
-        return await send_app_notification(user_id, message)
-
-async def send_sms_notification(user_id: int, message: str) -> bool:
-    """Send SMS notification using Twilio."""
+    return (await send_notifications([(user_id, message, method)]))[0]
+
+async def send_notifications(notifications: Iterable[tuple]) -> List[bool]:
+    """
+    Send many notifications, grouped by channel.
+
+    Args:
+        notifications: (user_id, message, method) tuples, optionally followed by
+            type, title and data as in OutgoingNotification
+
+    Returns:
+        List[bool]: Delivery result for each notification, in input order
+    """
+    items = [OutgoingNotification(*n) for n in notifications]
+    results = [False] * len(items)
+    by_method: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        by_method.setdefault(item.method, []).append(index)
+
+    senders = {"sms": send_sms_notifications, "email": send_email_notifications}
+
+    async def send_group(method: str, indexes: List[int]):
+        sender = senders.get(method, send_app_notifications)
+        try:
+            sent = await sender([items[i] for i in indexes])
+        except Exception as e:
+            print(f"Error sending {method} notifications: {str(e)}")
+            sent = [False] * len(indexes)
+        for i, ok in zip(indexes, sent):
+            results[i] = ok
+
+    await asyncio.gather(*(send_group(method, indexes) for method, indexes in by_method.items()))
+    return results
+
+async def send_sms_notifications(items: List[OutgoingNotification]) -> List[bool]:
+    """Send SMS through Twilio over the shared HTTP session."""
     if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_FROM_NUMBER]):
         print("Twilio credentials not configured")
-        return False
-        
-    # TODO: Implement Twilio SMS integration
-    return True
-
-async def send_email_notification(user_id: int, message: str) -> bool:
-    """Send email notification."""
-    # TODO: Implement email notification system
-    return True
-
-async def send_app_notification(user_id: int, message: str) -> bool:
-    """Send in-app notification."""
-    # TODO: Implement in-app notification system (e.g., WebSocket, Firebase)
-    return True
\ No newline at end of file
+        return [False] * len(items)
+
+    numbers = await _contact_details(User.contact_number, {item.user_id for item in items})
+    session = get_http_session()
+    url = TWILIO_API_URL.format(sid=TWILIO_ACCOUNT_SID)
+    auth = aiohttp.BasicAuth(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    semaphore = asyncio.Semaphore(NOTIFICATION_HTTP_CONCURRENCY)
+
+    async def send(item: OutgoingNotification) -> bool:
+        to = numbers.get(item.user_id)
+        if not to:
+            return False
+        async with semaphore:
+            try:
+                async with session.post(url, auth=auth, data={
+                    "To": to, "From": TWILIO_FROM_NUMBER, "Body": item.message
+                }) as response:
+                    return response.status < 300
+            except aiohttp.ClientError:
+                return False
+
+    return list(await asyncio.gather(*(send(item) for item in items)))
+
+async def send_email_notifications(items: List[OutgoingNotification]) -> List[bool]:
+    """Send emails over a single SMTP connection for the whole batch."""
+    if not SMTP_HOST:
+        print("SMTP server not configured")
+        return [False] * len(items)
+
+    addresses = await _contact_details(User.email, {item.user_id for item in items})
+    messages = []
+    for item in items:
+        to = addresses.get(item.user_id)
+        if not to:
+            messages.append(None)
+            continue
+        email = EmailMessage()
+        email["From"] = SMTP_FROM
+        email["To"] = to
+        email["Subject"] = item.title or "ShareFoods notification"
+        email.set_content(item.message)
+        messages.append(email)
+
+    return await asyncio.get_running_loop().run_in_executor(None, _deliver_emails, messages)
+
+def _deliver_emails(messages: List[Optional[EmailMessage]]) -> List[bool]:
+    results = []
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+        if SMTP_USE_TLS:
+            smtp.starttls()
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        for message in messages:
+            if message is None:
+                results.append(False)
+                continue
+            try:
+                smtp.send_message(message)
+                results.append(True)
+            except smtplib.SMTPException:
+                results.append(False)
+    return results
+
+async def send_app_notifications(items: List[OutgoingNotification]) -> List[bool]:
+    """Store in-app notifications with one bulk insert, then push them to connected clients."""
+    from ..routers.websockets import manager
+
+    rows = [{
+        "recipient_id": item.user_id,
+        "type": item.type,
+        "title": item.title or "",
+        "message": item.message,
+        "data": item.data,
+        "read": False,
+    } for item in items]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Notification), rows)
+        await db.commit()
+
+    for item in items:
+        unread_counter.adjust(item.user_id, 1)
+
+    for item in items:
+        await manager.send_personal_message({
+            "type": "notification",
+            "notification_type": item.type.value,
+            "title": item.title,
+            "content": item.message
+        }, user_id=item.user_id)
+    return [True] * len(items)
+
+async def _contact_details(column, user_ids) -> Dict[int, str]:
+    """Look up one contact column for many users in a single query."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User.id, column).where(User.id.in_(user_ids)))
+        return {user_id: value for user_id, value in result.all() if value}
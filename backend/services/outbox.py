@@ -0,0 +1,255 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from decouple import config
+from sqlalchemy import select, update
+
+from ..models.database import AsyncSessionLocal
+from ..models.notifications import NotificationOutbox, NotificationType, OutboxStatus
+from .notifications import send_notifications
+
+# Turn off on API processes when dispatch runs in dedicated workers
+OUTBOX_DISPATCHER_ENABLED = config('OUTBOX_DISPATCHER_ENABLED', default=True, cast=bool)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=100, cast=int)
+OUTBOX_POLL_INTERVAL = config('OUTBOX_POLL_INTERVAL', default=1.0, cast=float)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_BACKOFF_BASE = config('OUTBOX_BACKOFF_BASE', default=5.0, cast=float)
+OUTBOX_BACKOFF_MAX = config('OUTBOX_BACKOFF_MAX', default=3600.0, cast=float)
+# How long a claimed row is hidden from other dispatchers while it's being sent
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=120, cast=int)
+# Sends per second per external channel; channels not listed (e.g. app) are unlimited
+OUTBOX_RATE_LIMITS = config('OUTBOX_RATE_LIMITS', default='sms:1,email:10')
+
+def enqueue_notification(
+    db,
+    recipient_id: int,
+    message: str,
+    method: str = "app",
+    type: NotificationType = NotificationType.SYSTEM,
+    title: Optional[str] = None,
+    data: Optional[dict] = None
+) -> NotificationOutbox:
+    """
+    Queue a notification in the caller's session.
+
+    Nothing is sent here: the row commits (or rolls back) with the caller's
+    transaction and the OutboxDispatcher delivers it afterwards. Works with
+    both Session and AsyncSession.
+    """
+    entry = NotificationOutbox(
+        recipient_id=recipient_id,
+        method=method,
+        type=type,
+        title=title,
+        message=message,
+        data=data,
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        available_at=datetime.utcnow()
+    )
+    db.add(entry)
+    return entry
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        method, _, rate = part.partition(":")
+        limits[method.strip()] = float(rate)
+    return limits
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter after the given number of failed attempts."""
+    return random.uniform(0, min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, with bursts up to `rate`."""
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, count: int = 1):
+        """Wait for `count` tokens; count must not exceed capacity."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= count:
+                    self._tokens -= count
+                    return
+                await asyncio.sleep((count - self._tokens) / self.rate)
+
+class OutboxDispatcher:
+    """
+    Delivers outbox rows in the background.
+
+    Rows are dispatched in lanes: every rate-limited channel has its own,
+    and the unlimited channels (e.g. app) share one. Each lane polls on its
+    own, leasing its due rows (SELECT ... FOR UPDATE SKIP LOCKED on
+    Postgres, so several workers can run side by side), so an SMS backlog
+    never delays in-app notifications. Rows are sent as one batch per
+    channel under per-channel rate limits, then marked sent, scheduled for a
+    retry with backoff, or dead-lettered after OUTBOX_MAX_ATTEMPTS.
+    Rate-limited channels lease no more rows than they can send well inside
+    OUTBOX_LEASE_SECONDS.
+    """
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        rate_limits: Optional[Dict[str, float]] = None
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        limits = parse_rate_limits(OUTBOX_RATE_LIMITS) if rate_limits is None else rate_limits
+        self.limiters = {method: RateLimiter(rate) for method, rate in limits.items() if rate > 0}
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+
+    async def run(self):
+        await asyncio.gather(*(self._run_lane(lane) for lane in self.lanes()))
+
+    async def _run_lane(self, lane: Optional[str]):
+        limit = self._lease_limit(lane)
+        while True:
+            try:
+                delivered = await self.dispatch_lane(lane)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error dispatching notifications: {str(e)}")
+                delivered = 0
+            if delivered < limit:
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    def lanes(self) -> List[Optional[str]]:
+        """None for the unlimited channels, then each rate-limited channel."""
+        return [None, *self.limiters]
+
+    async def dispatch_once(self) -> int:
+        """Lease and deliver one batch in every lane. Returns the number of rows processed."""
+        return sum(await asyncio.gather(*(self.dispatch_lane(lane) for lane in self.lanes())))
+
+    async def dispatch_lane(self, lane: Optional[str]) -> int:
+        """Lease and deliver one batch of a lane. Returns the number of rows processed."""
+        entries = await self._lease_batch(lane)
+        if not entries:
+            return 0
+
+        by_method: Dict[str, List[NotificationOutbox]] = {}
+        for entry in entries:
+            by_method.setdefault(entry.method, []).append(entry)
+        await asyncio.gather(*(
+            self._dispatch_channel(method, group) for method, group in by_method.items()
+        ))
+        return len(entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "outbox_sent": self.sent,
+            "outbox_failed": self.failed,
+            "outbox_dead": self.dead,
+        }
+
+    def channel_limit(self, method: str) -> Optional[int]:
+        """
+        Most rows of a rate-limited channel to lease at once: as many as it
+        can send in half a lease, so they're recorded before the lease runs
+        out and another dispatcher picks them up again.
+        """
+        limiter = self.limiters.get(method)
+        if limiter is None:
+            return None
+        return max(1, int(limiter.rate * OUTBOX_LEASE_SECONDS / 2))
+
+    def _lease_limit(self, lane: Optional[str]) -> int:
+        return self.batch_size if lane is None else self.channel_limit(lane)
+
+    async def _dispatch_channel(self, method: str, entries: List[NotificationOutbox]):
+        await self._record(await self._send_channel(method, entries))
+
+    async def _lease_batch(self, lane: Optional[str]) -> List[NotificationOutbox]:
+        now = datetime.utcnow()
+        query = select(NotificationOutbox).where(
+            NotificationOutbox.status == OutboxStatus.PENDING,
+            NotificationOutbox.available_at <= now
+        )
+        if lane is not None:
+            query = query.where(NotificationOutbox.method == lane)
+        elif self.limiters:
+            query = query.where(NotificationOutbox.method.notin_(list(self.limiters)))
+        async with self.session_factory() as db:
+            result = await db.execute(
+                query.order_by(
+                    NotificationOutbox.available_at, NotificationOutbox.id
+                ).limit(self._lease_limit(lane)).with_for_update(skip_locked=True)
+            )
+            entries = list(result.scalars())
+            if not entries:
+                return []
+            # Hide leased rows from other dispatchers; a crash mid-send just
+            # means they become due again when the lease runs out
+            lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            for entry in entries:
+                entry.attempts += 1
+                entry.available_at = lease_until
+            await db.commit()
+            return entries
+
+    async def _send_channel(self, method: str, entries: List[NotificationOutbox]):
+        """
+        Deliver one channel's rows, in chunks no larger than its rate allows.
+
+        Returns (entry, error) pairs where error is None on success.
+        """
+        limiter = self.limiters.get(method)
+        chunk_size = max(1, int(limiter.capacity)) if limiter else len(entries)
+        results = []
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start:start + chunk_size]
+            if limiter:
+                await limiter.acquire(len(chunk))
+            try:
+                sent = await send_notifications([
+                    (e.recipient_id, e.message, e.method, e.type, e.title, e.data) for e in chunk
+                ])
+                errors = [None if ok else "Provider reported failure" for ok in sent]
+            except Exception as e:
+                errors = [str(e)] * len(chunk)
+            results.extend(zip(chunk, errors))
+        return results
+
+    async def _record(self, results):
+        now = datetime.utcnow()
+        sent_ids = [entry.id for entry, error in results if error is None]
+        async with self.session_factory() as db:
+            if sent_ids:
+                await db.execute(
+                    update(NotificationOutbox).where(
+                        NotificationOutbox.id.in_(sent_ids)
+                    ).values(status=OutboxStatus.SENT, sent_at=now, last_error=None)
+                )
+            for entry, error in results:
+                if error is None:
+                    continue
+                values = {"last_error": error[:500]}
+                if entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    values["status"] = OutboxStatus.DEAD
+                    self.dead += 1
+                else:
+                    values["available_at"] = now + timedelta(seconds=backoff_seconds(entry.attempts))
+                    self.failed += 1
+                await db.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id == entry.id).values(**values)
+                )
+            await db.commit()
+        self.sent += len(sent_ids)
+
+outbox_dispatcher = OutboxDispatcher()
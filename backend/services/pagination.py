@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+from decouple import config
+
+DEFAULT_PAGE_SIZE = config('DEFAULT_PAGE_SIZE', default=100, cast=int)
+MAX_PAGE_SIZE = config('MAX_PAGE_SIZE', default=500, cast=int)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams:
+    """
+    Keyset pagination parameters shared by every list endpoint.
+
+    Clients pass back the opaque `cursor` from the previous page's
+    X-Next-Cursor response header; the header is absent on the last page.
+    """
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Encode the position of a row as an opaque, URL-safe token."""
+    if isinstance(sort_value, datetime):
+        payload = {"d": sort_value.isoformat(), "i": row_id}
+    else:
+        payload = {"v": sort_value, "i": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Decode a token produced by encode_cursor, rejecting anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value = datetime.fromisoformat(payload["d"]) if "d" in payload else payload["v"]
+        return sort_value, int(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def paginate(query, page: PageParams, sort_column, id_column, descending: bool = True):
+    """
+    Apply keyset pagination over (sort_column, id_column) to a query.
+
+    Works on both ORM `Query` and Core `select()` objects. One extra row is
+    fetched so `finish_page` can tell whether another page exists; seeking
+    on the indexed tuple keeps deep pages as cheap as the first.
+    """
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor)
+        position = tuple_(sort_column, id_column)
+        query = query.filter(
+            position < (sort_value, row_id) if descending else position > (sort_value, row_id)
+        )
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    return query.limit(page.limit + 1)
+
+def finish_page(
+    rows: List[Any], page: PageParams, response: Response, sort_attr: str = "created_at"
+) -> List[Any]:
+    """Trim the look-ahead row and publish the next cursor, if any."""
+    if len(rows) <= page.limit:
+        return rows
+
+    rows = rows[:page.limit]
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
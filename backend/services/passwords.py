@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from decouple import config
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=os.cpu_count() or 2, cast=int)
+PASSWORD_HASH_MAX_QUEUE = config('PASSWORD_HASH_MAX_QUEUE', default=64, cast=int)
+
+# Hashes below the configured cost are flagged by needs_update and upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a fixed-size thread pool.
+
+    bcrypt releases the GIL, so throughput scales with the number of
+    workers. At most `max_queue` calls may wait behind busy workers; beyond
+    that callers get a 503 instead of piling up unbounded latency.
+    """
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_wait = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also return a fresh hash if the stored one is outdated."""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "password_hash_pending": self._pending,
+            "password_hash_completed": self.completed,
+            "password_hash_rejected": self.rejected,
+            "password_hash_avg_ms": self.total_time / self.completed * 1000 if self.completed else 0.0,
+            "password_hash_max_wait_ms": self.max_wait * 1000,
+        }
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Authentication service busy, please retry",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, submitted, func, *args
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _timed(self, submitted: float, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.completed += 1
+                self.total_time += finished - started
+                self.max_wait = max(self.max_wait, started - submitted)
+
+password_hasher = PasswordHasher(pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
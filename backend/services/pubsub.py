@@ -0,0 +1,179 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Set
+
+from decouple import config
+
+# "memory" keeps delivery inside this process; "redis" fans out across workers and nodes
+WS_BACKPLANE = config('WS_BACKPLANE', default='memory')
+WS_BACKPLANE_TICK = config('WS_BACKPLANE_TICK', default=0.01, cast=float)
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379')
+REDIS_CHANNEL_PREFIX = config('REDIS_CHANNEL_PREFIX', default='sharefoods:ws:')
+
+BROADCAST_CHANNEL = "broadcast"
+
+# A published item is [frame, excluded_user_id]; a batch is a list of items
+Handler = Callable[[str, List[list]], None]
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def topic_channel(topic: str) -> str:
+    return f"topic:{topic}"
+
+class Backplane(ABC):
+    """
+    Pub/sub transport between the ConnectionManagers of every worker.
+
+    Messages published during one tick are batched per channel and sent as
+    a single payload. Each worker subscribes only to the channels it has
+    local sockets for (plus the broadcast channel) and hands received
+    batches to its handler for local delivery.
+    """
+    def __init__(self, tick: float = WS_BACKPLANE_TICK):
+        self.tick = tick
+        self.handler: Optional[Handler] = None
+        self.published = 0
+        self.batches = 0
+        self._pending: Dict[str, List[list]] = {}
+        self._flush_scheduled = False
+        # The loop only holds weak references to tasks; keep flushes alive until done
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def stop(self):
+        await self.flush()
+        self.handler = None
+
+    @property
+    def started(self) -> bool:
+        return self.handler is not None
+
+    def publish(self, channel: str, frame: str, exclude_user: Optional[int] = None):
+        self._pending.setdefault(channel, []).append([frame, exclude_user])
+        self.published += 1
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_later(self.tick, self._start_flush)
+
+    def _start_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        for channel, items in pending.items():
+            self.batches += 1
+            try:
+                await self._send(channel, items)
+            except Exception as e:
+                print(f"Error publishing to {channel}: {str(e)}")
+
+    @abstractmethod
+    async def subscribe(self, channel: str):
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str):
+        ...
+
+    @abstractmethod
+    async def _send(self, channel: str, items: List[list]):
+        ...
+
+    def _deliver(self, channel: str, items: List[list]):
+        if self.handler:
+            self.handler(channel, items)
+
+class InMemoryBackplane(Backplane):
+    """
+    Process-local backplane. Instances created with the same hub behave
+    like separate workers sharing a broker, which is what tests use.
+    """
+    def __init__(self, tick: float = WS_BACKPLANE_TICK, hub: Optional[Dict[str, Set["InMemoryBackplane"]]] = None):
+        super().__init__(tick)
+        self.hub = {} if hub is None else hub
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        await self.subscribe(BROADCAST_CHANNEL)
+
+    async def stop(self):
+        await super().stop()
+        for subscribers in self.hub.values():
+            subscribers.discard(self)
+
+    async def subscribe(self, channel: str):
+        self.hub.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, channel: str):
+        subscribers = self.hub.get(channel)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.hub[channel]
+
+    async def _send(self, channel: str, items: List[list]):
+        for backplane in list(self.hub.get(channel, ())):
+            backplane._deliver(channel, items)
+
+class RedisBackplane(Backplane):
+    """Backplane over Redis PUBLISH/SUBSCRIBE, one Redis channel per backplane channel."""
+    def __init__(self, url: str = REDIS_URL, tick: float = WS_BACKPLANE_TICK, prefix: str = REDIS_CHANNEL_PREFIX):
+        super().__init__(tick)
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler):
+        import redis.asyncio as aioredis
+
+        await super().start(handler)
+        self._redis = aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        await self.subscribe(BROADCAST_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        await super().stop()
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.close()
+        if self._redis:
+            await self._redis.close()
+
+    async def subscribe(self, channel: str):
+        await self._pubsub.subscribe(self.prefix + channel)
+
+    async def unsubscribe(self, channel: str):
+        await self._pubsub.unsubscribe(self.prefix + channel)
+
+    async def _send(self, channel: str, items: List[list]):
+        await self._redis.publish(self.prefix + channel, json.dumps(items))
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = message["channel"].decode()[len(self.prefix):]
+                    self._deliver(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error reading from Redis backplane: {str(e)}")
+                await asyncio.sleep(1)
+
+def create_backplane(kind: str = WS_BACKPLANE) -> Backplane:
+    if kind == "redis":
+        return RedisBackplane()
+    return InMemoryBackplane()
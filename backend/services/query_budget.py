@@ -0,0 +1,72 @@
+from typing import Callable, Iterator
+
+from decouple import config
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+from .metrics import RequestStats, request_stats
+
+# "off", "log" to report endpoints over budget, or "raise" (tests) to fail them
+QUERY_BUDGET_MODE = config('QUERY_BUDGET_MODE', default='off')
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+def count_queries() -> Iterator[RequestStats]:
+    """Count SQL statements run by this task (and threads it hands work to), on any engine."""
+    return request_stats()
+
+def query_budget(limit: int) -> Callable:
+    """
+    Declare how many queries an endpoint may run, authentication included.
+
+    List endpoints should load relationships with selectinload so their
+    budget holds whatever the page size.
+    """
+    def decorate(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorate
+
+class QueryBudgetMiddleware:
+    """
+    Checks the queries behind each request against the endpoint's budget.
+
+    A plain ASGI middleware: it reads the count from the RequestStats that
+    MetricsMiddleware already keeps, and checks it when the response starts,
+    so queries a streaming body runs later aren't counted.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or QUERY_BUDGET_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                limit = getattr(scope.get("endpoint"), "query_budget", None)
+                count = stats.queries
+                if limit is not None and count > limit:
+                    detail = f"{scope['method']} {scope['path']} ran {count} queries (budget {limit})"
+                    if QUERY_BUDGET_MODE == "raise":
+                        replaced = True
+                        response = JSONResponse(
+                            status_code=500,
+                            content={"detail": f"Query budget exceeded: {detail}"},
+                            headers={QUERY_COUNT_HEADER: str(count)}
+                        )
+                        await response(scope, receive, send)
+                        return
+                    print(f"Query budget exceeded: {detail}")
+                if QUERY_BUDGET_MODE == "raise":
+                    MutableHeaders(scope=message).append(QUERY_COUNT_HEADER, str(count))
+            await send(message)
+
+        with request_stats(scope["path"]) as stats:
+            await self.app(scope, receive, send_wrapper)
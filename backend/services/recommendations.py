@@ -0,0 +1,160 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import geo
+from .cache import TTLCache
+from ..models.listings import FoodListing, ListingStatus
+
+RECOMMENDATION_CACHE_SIZE = config('RECOMMENDATION_CACHE_SIZE', default=10000, cast=int)
+RECOMMENDATION_CACHE_TTL = config('RECOMMENDATION_CACHE_TTL', default=300, cast=float)
+RECOMMENDATION_DEPTH = config('RECOMMENDATION_DEPTH', default=50, cast=int)
+RECOMMENDATION_RADIUS_KM = config('RECOMMENDATION_RADIUS_KM', default=50.0, cast=float)
+
+CELL_PRECISION = 4  # ~20-40km cells, matching RECOMMENDATION_RADIUS_KM
+
+class RecommendationCache:
+    """
+    Per-user cache of ranked recommendation listing ids.
+
+    Each entry keeps the top RECOMMENDATION_DEPTH ids (deeper than a single
+    response) so it can be patched in place: a listing that stops being
+    available is simply dropped from the entries that contain it. A new or
+    changed listing only invalidates users whose location cell is within
+    reach of it.
+    """
+    def __init__(self, maxsize: int = RECOMMENDATION_CACHE_SIZE, ttl: float = RECOMMENDATION_CACHE_TTL):
+        self._entries = TTLCache(maxsize, ttl, on_evict=self._unindex)
+        self._by_listing: Dict[int, Set[int]] = {}
+        self._by_cell: Dict[Optional[str], Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, k: int) -> Optional[List[int]]:
+        """Top-k cached ids for a user, or None if a recompute is needed."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        _, listing_ids, exhaustive = entry
+        with self._lock:
+            if len(listing_ids) < k and not exhaustive:
+                # Patched below the page size; recompute rather than under-serve
+                return None
+            return listing_ids[:k]
+
+    def put(self, user_id: int, cell: Optional[str], listing_ids: List[int]):
+        exhaustive = len(listing_ids) < RECOMMENDATION_DEPTH
+        self._entries.set(user_id, (cell, list(listing_ids), exhaustive))
+        with self._lock:
+            self._by_cell.setdefault(cell, set()).add(user_id)
+            for listing_id in listing_ids:
+                self._by_listing.setdefault(listing_id, set()).add(user_id)
+
+    def invalidate_user(self, user_id: int):
+        self._entries.pop(user_id)
+
+    def listing_removed(self, listing_id: int):
+        """Patch out a listing that can no longer be recommended."""
+        with self._lock:
+            user_ids = self._by_listing.pop(listing_id, set())
+        for user_id in user_ids:
+            # Looked up outside the lock: an expired entry's on_evict takes it
+            entry = self._entries.get(user_id)
+            if entry is None:
+                continue
+            with self._lock:
+                if listing_id in entry[1]:
+                    entry[1].remove(listing_id)
+
+    def listing_changed(self, latitude: Optional[float], longitude: Optional[float]):
+        """Invalidate users near a new or changed listing."""
+        self.listings_changed([(latitude, longitude)])
+
+    def listings_changed(self, locations: Iterable[Tuple[Optional[float], Optional[float]]]):
+        """Invalidate users near any of many listings in a single pass."""
+        locations = set(locations)
+        if not locations:
+            return
+        cells = set()
+        for latitude, longitude in locations:
+            # Unlocated listings have no geohash, so only unlocated users can see them
+            if latitude is not None and longitude is not None:
+                cells.update(geo.covering_cells(latitude, longitude, RECOMMENDATION_RADIUS_KM))
+        affected = {None}  # unlocated users see every listing
+        if cells:
+            affected.update(self._cells_near(list(cells)))
+        with self._lock:
+            user_ids = set().union(*(self._by_cell.get(cell, ()) for cell in affected))
+        for user_id in user_ids:
+            self._entries.pop(user_id)
+
+    @property
+    def hit_rate(self) -> float:
+        return self._entries.hit_rate
+
+    def clear(self):
+        self._entries.clear()
+
+    def _cells_near(self, prefixes: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            known = list(self._by_cell)
+        return [
+            cell for cell in known
+            if cell and any(cell.startswith(p) or p.startswith(cell) for p in prefixes)
+        ]
+
+    def _unindex(self, user_id: int, entry: Tuple[Optional[str], List[int], bool]):
+        cell, listing_ids, _ = entry
+        with self._lock:
+            users = self._by_cell.get(cell)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_cell[cell]
+            for listing_id in listing_ids:
+                users = self._by_listing.get(listing_id)
+                if users is not None:
+                    users.discard(user_id)
+                    if not users:
+                        del self._by_listing[listing_id]
+
+def user_cell(location: Optional[str]) -> Optional[str]:
+    """Coarse geohash cell used to group cached users by location."""
+    coords = geo.geocode(location) if location else None
+    return geo.encode_geohash(*coords, precision=CELL_PRECISION) if coords else None
+
+recommendation_cache = RecommendationCache()
+
+# Keep the cache in step with every committed FoodListing write, whichever
+# router (listings, claims, trades, admin) made it.
+
+@event.listens_for(Session, "after_flush")
+def _collect_listing_changes(session, flush_context):
+    changes = session.info.setdefault("listing_changes", [])
+    for obj in session.deleted:
+        if isinstance(obj, FoodListing):
+            changes.append(("removed", obj.id, None, None))
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, FoodListing):
+            continue
+        if obj.status not in (None, ListingStatus.AVAILABLE):
+            changes.append(("removed", obj.id, None, None))
+        else:
+            changes.append(("changed", obj.id, obj.latitude, obj.longitude))
+
+@event.listens_for(Session, "after_commit")
+def _apply_listing_changes(session):
+    changed = []
+    for kind, listing_id, latitude, longitude in session.info.pop("listing_changes", []):
+        if kind == "removed":
+            recommendation_cache.listing_removed(listing_id)
+        else:
+            changed.append((latitude, longitude))
+    if changed:
+        recommendation_cache.listings_changed(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_listing_changes(session):
+    session.info.pop("listing_changes", None)
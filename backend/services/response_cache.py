@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import math
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from decouple import config
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .pagination import NEXT_CURSOR_HEADER
+from .pubsub import REDIS_URL
+from ..models.listings import FoodListing
+
+# "memory" caches per worker and is only correct with a single worker: a write
+# bumps the generation in the worker that made it, so the others keep serving
+# the old feed for up to LISTING_CACHE_TTL. Run several workers with "redis",
+# which shares the generation (and a body tier) across all of them.
+LISTING_CACHE_BACKEND = config('LISTING_CACHE_BACKEND', default='memory')
+LISTING_CACHE_SIZE = config('LISTING_CACHE_SIZE', default=512, cast=int)
+# Also bounds how stale a worker can be about writes made outside the ORM session
+LISTING_CACHE_TTL = config('LISTING_CACHE_TTL', default=60, cast=float)
+LISTING_CACHE_PREFIX = config('LISTING_CACHE_PREFIX', default='sharefoods:listings:')
+
+CACHE_CONTROL = "no-cache"  # clients may store feeds but must revalidate with the ETag
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: float
+    next_cursor: Optional[str]
+
+    def respond(self, request: Request) -> Response:
+        """The cached body, or 304 Not Modified if the client already has it."""
+        headers = {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+        if self.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if _not_modified(request, self.etag, self.last_modified):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def cache_key(**params) -> str:
+    """Canonical form of a set of query parameters; None values are dropped."""
+    return urlencode(sorted(
+        (name, getattr(value, "value", value)) for name, value in params.items() if value is not None
+    ))
+
+def _next_modified_at(previous: float) -> float:
+    # Last-Modified has one-second resolution, so every generation gets a
+    # later whole second; otherwise a write in the same second as the last
+    # one would leave If-Modified-Since answering 304 for the stale body
+    return float(max(math.ceil(time.time()), int(previous) + 1))
+
+# The same as _next_modified_at, atomically across workers
+_SHARED_BUMP_SCRIPT = """
+redis.call('HINCRBY', KEYS[1], 'generation', 1)
+local previous = tonumber(redis.call('HGET', KEYS[1], 'modified_at') or '0')
+redis.call('HSET', KEYS[1], 'modified_at', math.max(tonumber(ARGV[1]), math.floor(previous) + 1))
+"""
+
+class ResponseCache:
+    """
+    Cache of serialized responses, invalidated by generation.
+
+    Every committed write to the underlying table bumps the generation, and
+    entries are keyed by the generation they were built in, so a write
+    retires every cached response at once without tracking which ones it
+    affects. A response built while a write commits is stored under the
+    old generation and never served.
+
+    With the "memory" backend only the worker that made a write sees the
+    bump, so it suits single-worker deployments only. With the "redis"
+    backend the generation and the bodies also live in Redis: a write in one
+    worker retires the entries of all of them, and a body built by one
+    worker is served by the rest. Redis errors degrade to the per-worker
+    cache.
+    """
+    def __init__(
+        self,
+        name: str,
+        backend: str = LISTING_CACHE_BACKEND,
+        maxsize: int = LISTING_CACHE_SIZE,
+        ttl: float = LISTING_CACHE_TTL
+    ):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.generation = 0
+        self.modified_at = time.time()
+        self.shared_hits = 0
+        self._entries = TTLCache(maxsize, ttl)
+        self._redis = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending = set()
+
+    async def lookup(self, key: str) -> Tuple[Optional[CachedResponse], Tuple[int, float]]:
+        """
+        The cached response for `key`, if any, and the generation to store a fresh one under.
+
+        Returns:
+            Tuple: (CachedResponse or None, (generation, modified_at))
+        """
+        generation = await self._current_generation()
+        entry = self._entries.get((generation[0], key))
+        if entry is None and self._redis is not None:
+            entry = await self._shared_get(generation[0], key)
+            if entry is not None:
+                self.shared_hits += 1
+                self._entries.set((generation[0], key), entry)
+        return entry, generation
+
+    async def store(self, generation: Tuple[int, float], key: str, body: bytes, next_cursor: Optional[str]) -> CachedResponse:
+        entry = CachedResponse(
+            body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', generation[1], next_cursor
+        )
+        if self._redis is not None:
+            await self._shared_set(generation[0], key, entry)
+        if self.backend != "redis" and generation[0] != self.generation:
+            # Built from data a write has since replaced
+            return entry
+        self._entries.set((generation[0], key), entry)
+        return entry
+
+    def bump(self):
+        """Retire every cached response; called after a committed write."""
+        self.generation += 1
+        self.modified_at = _next_modified_at(self.modified_at)
+        self._entries.clear()
+        if self.backend == "redis":
+            self._schedule(self._shared_bump())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            f"{self.name}_cache_entries": len(self._entries),
+            f"{self.name}_cache_hit_rate": self._entries.hit_rate,
+            f"{self.name}_cache_shared_hits": self.shared_hits,
+            f"{self.name}_cache_generation": self.generation,
+        }
+
+    async def _current_generation(self) -> Tuple[int, float]:
+        if self.backend != "redis":
+            return self.generation, self.modified_at
+        try:
+            client = await self._client()
+            generation, modified_at = await client.hmget(self._key("generation"), "generation", "modified_at")
+            return int(generation or 0), float(modified_at or self.modified_at)
+        except Exception as e:
+            print(f"Error reading {self.name} cache generation: {str(e)}")
+            self._redis = None
+            return self.generation, self.modified_at
+
+    async def _client(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(REDIS_URL)
+            self._loop = asyncio.get_running_loop()
+        return self._redis
+
+    def _key(self, suffix: str) -> str:
+        return f"{LISTING_CACHE_PREFIX}{self.name}:{suffix}"
+
+    async def _shared_get(self, generation: int, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = await self._redis.get(self._key(f"{generation}:{key}"))
+        except Exception as e:
+            print(f"Error reading {self.name} cache: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        fields = json.loads(raw)
+        return CachedResponse(
+            fields["body"].encode(), fields["etag"], fields["last_modified"], fields["next_cursor"]
+        )
+
+    async def _shared_set(self, generation: int, key: str, entry: CachedResponse):
+        payload = json.dumps({**entry._asdict(), "body": entry.body.decode()})
+        try:
+            await self._redis.set(self._key(f"{generation}:{key}"), payload, ex=int(self.ttl) or 1)
+        except Exception as e:
+            print(f"Error writing {self.name} cache: {str(e)}")
+
+    async def _shared_bump(self):
+        try:
+            client = await self._client()
+            await client.eval(_SHARED_BUMP_SCRIPT, 1, self._key("generation"), math.ceil(time.time()))
+        except Exception as e:
+            print(f"Error bumping {self.name} cache generation: {str(e)}")
+
+    def _schedule(self, coroutine):
+        # Session hooks are synchronous and may run in a worker thread
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(coroutine)
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        elif self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        else:
+            coroutine.close()
+
+listing_feed_cache = ResponseCache("listing_feed")
+
+# Bump the generation after every committed FoodListing write, including
+# Core UPDATE/INSERT/DELETE statements that bypass the unit of work.
+
+@event.listens_for(Session, "after_flush")
+def _collect_listing_writes(session, flush_context):
+    if any(isinstance(obj, FoodListing) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["listing_feed_stale"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_listing_statements(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) == FoodListing.__tablename__:
+        orm_execute_state.session.info["listing_feed_stale"] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_listing_feed(session):
+    if session.info.pop("listing_feed_stale", False):
+        listing_feed_cache.bump()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_listing_writes(session):
+    session.info.pop("listing_feed_stale", None)
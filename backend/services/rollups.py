@@ -0,0 +1,215 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from decouple import config
+from sqlalchemy import event, func, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.analytics import ImpactMetric, ImpactMetricRollup, MetricType, RollupGranularity
+from ..models.database import SessionLocal
+
+# "incremental": rollups are upserted as each ImpactMetric row is inserted.
+# "batch": inserts are left alone and compact_rollups() runs periodically.
+IMPACT_ROLLUP_MODE = config('IMPACT_ROLLUP_MODE', default='incremental')
+IMPACT_ROLLUP_COMPACT_INTERVAL = config('IMPACT_ROLLUP_COMPACT_INTERVAL', default=3600, cast=int)
+
+_BUCKET_SIZES = {
+    RollupGranularity.HOUR: timedelta(hours=1),
+    RollupGranularity.DAY: timedelta(days=1),
+}
+
+# SQLite has no date_trunc; strftime yields the same bucket starts as text
+_SQLITE_BUCKET_FORMATS = {
+    RollupGranularity.HOUR: "%Y-%m-%d %H:00:00",
+    RollupGranularity.DAY: "%Y-%m-%d 00:00:00",
+}
+
+def bucket_start(timestamp: datetime, granularity: RollupGranularity) -> datetime:
+    """Start of the hour or day bucket containing a timestamp."""
+    if granularity == RollupGranularity.DAY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def _ceil_bucket(timestamp: datetime, granularity: RollupGranularity) -> datetime:
+    start = bucket_start(timestamp, granularity)
+    return start if start == timestamp else start + _BUCKET_SIZES[granularity]
+
+def _bucket_expr(dialect_name: str, granularity: RollupGranularity):
+    """SQL expression for the start of each ImpactMetric's bucket."""
+    if dialect_name == "sqlite":
+        return func.strftime(_SQLITE_BUCKET_FORMATS[granularity], ImpactMetric.timestamp)
+    return func.date_trunc(granularity.value, ImpactMetric.timestamp)
+
+def _upsert(dialect_name: str, values: dict, replace: bool = False):
+    """INSERT ... ON CONFLICT on the bucket key, adding to (or replacing) the totals."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    table = ImpactMetricRollup.__table__
+    stmt = insert(table).values(**values)
+    if replace:
+        updates = {"total": stmt.excluded.total, "count": stmt.excluded.count}
+    else:
+        updates = {
+            "total": table.c.total + stmt.excluded.total,
+            "count": table.c.count + stmt.excluded.count,
+        }
+    return stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", "metric_type", "user_id"],
+        set_=updates
+    )
+
+@event.listens_for(ImpactMetric, "after_insert")
+def _rollup_inserted_metric(mapper, connection, metric: ImpactMetric):
+    """Fold a newly inserted metric into its hour and day buckets, in the same transaction."""
+    if IMPACT_ROLLUP_MODE != "incremental" or metric.value is None:
+        return
+    timestamp = metric.timestamp or datetime.utcnow()
+    for granularity in RollupGranularity:
+        connection.execute(_upsert(connection.dialect.name, {
+            "granularity": granularity,
+            "bucket_start": bucket_start(timestamp, granularity),
+            "metric_type": metric.metric_type,
+            "user_id": metric.user_id or 0,
+            "total": metric.value,
+            "count": 1,
+        }))
+
+def compact_rollups(db: Session, since: datetime) -> int:
+    """
+    Rebuild every hour and day bucket from `since` onwards from raw rows.
+
+    Safe to re-run: buckets are replaced, not added to. Used in batch mode,
+    to backfill existing metrics (`since=datetime.min`) and to repair
+    rollups after back-filled or deleted metrics.
+
+    Returns:
+        int: Number of buckets written
+    """
+    since = bucket_start(since, RollupGranularity.DAY)
+    dialect_name = db.bind.dialect.name
+    written = 0
+    for granularity in RollupGranularity:
+        bucket = _bucket_expr(dialect_name, granularity)
+        rows = db.query(
+            bucket, ImpactMetric.metric_type, func.coalesce(ImpactMetric.user_id, 0),
+            func.sum(ImpactMetric.value), func.count(ImpactMetric.id)
+        ).filter(
+            ImpactMetric.timestamp >= since
+        ).group_by(bucket, ImpactMetric.metric_type, func.coalesce(ImpactMetric.user_id, 0)).all()
+
+        for start, metric_type, user_id, total, count in rows:
+            if isinstance(start, str):
+                start = datetime.fromisoformat(start)
+            db.execute(_upsert(dialect_name, {
+                "granularity": granularity,
+                "bucket_start": start,
+                "metric_type": metric_type,
+                "user_id": user_id,
+                "total": total or 0,
+                "count": count,
+            }, replace=True))
+            written += 1
+    db.commit()
+    return written
+
+async def run_compaction_loop():
+    """Periodically compact the last two days of rollups (batch mode)."""
+    while True:
+        await asyncio.sleep(IMPACT_ROLLUP_COMPACT_INTERVAL)
+        db = SessionLocal()
+        try:
+            since = datetime.utcnow() - timedelta(days=2)
+            await asyncio.get_running_loop().run_in_executor(None, compact_rollups, db, since)
+        except Exception as e:
+            print(f"Error compacting impact rollups: {str(e)}")
+        finally:
+            db.close()
+
+def sum_impact_metrics(
+    db: Session, start_date: datetime, end_date: datetime, user_id: Optional[int] = None
+) -> Dict[MetricType, float]:
+    """
+    Total each metric type over [start_date, end_date] in one query.
+
+    Whole days come from daily buckets, whole hours at either edge from
+    hourly buckets, and only the partial hours at the very edges are read
+    from raw ImpactMetric rows, so cost tracks the number of days in the
+    range rather than the number of events.
+
+    In batch mode rollups stop at the last compaction; rows after it are
+    read raw.
+    """
+    first_hour = _ceil_bucket(start_date, RollupGranularity.HOUR)
+    last_hour = bucket_start(end_date, RollupGranularity.HOUR)
+    if IMPACT_ROLLUP_MODE == "batch":
+        last_hour = min(last_hour, _compacted_until(db))
+    if first_hour >= last_hour:
+        # Range never covers a whole hour; just read raw rows
+        parts = [_raw_part(start_date, end_date, user_id, inclusive=True)]
+    else:
+        first_day = _ceil_bucket(first_hour, RollupGranularity.DAY)
+        last_day = bucket_start(last_hour, RollupGranularity.DAY)
+        parts = [_raw_part(start_date, first_hour, user_id)]
+        if first_day < last_day:
+            parts += [
+                _rollup_part(RollupGranularity.HOUR, first_hour, first_day, user_id),
+                _rollup_part(RollupGranularity.DAY, first_day, last_day, user_id),
+                _rollup_part(RollupGranularity.HOUR, last_day, last_hour, user_id),
+            ]
+        else:
+            parts.append(_rollup_part(RollupGranularity.HOUR, first_hour, last_hour, user_id))
+        parts.append(_raw_part(last_hour, end_date, user_id, inclusive=True))
+
+    combined = union_all(*parts).subquery()
+    return dict(db.query(
+        combined.c.metric_type, func.sum(combined.c.value)
+    ).group_by(combined.c.metric_type).all())
+
+def _compacted_until(db: Session) -> datetime:
+    """
+    Start of the newest hourly bucket, which the last compaction may have
+    written part-way through; every bucket before it is complete.
+    """
+    latest = db.query(func.max(ImpactMetricRollup.bucket_start)).filter(
+        ImpactMetricRollup.granularity == RollupGranularity.HOUR
+    ).scalar()
+    return latest or datetime.min
+
+def _rollup_part(granularity: RollupGranularity, start: datetime, end: datetime, user_id: Optional[int]):
+    stmt = select(
+        ImpactMetricRollup.metric_type.label("metric_type"),
+        ImpactMetricRollup.total.label("value")
+    ).where(
+        ImpactMetricRollup.granularity == granularity,
+        ImpactMetricRollup.bucket_start >= start,
+        ImpactMetricRollup.bucket_start < end
+    )
+    if user_id is not None:
+        stmt = stmt.where(ImpactMetricRollup.user_id == user_id)
+    return stmt
+
+def _raw_part(start: datetime, end: datetime, user_id: Optional[int], inclusive: bool = False):
+    upper = ImpactMetric.timestamp <= end if inclusive else ImpactMetric.timestamp < end
+    stmt = select(
+        ImpactMetric.metric_type.label("metric_type"),
+        ImpactMetric.value.label("value")
+    ).where(ImpactMetric.timestamp >= start, upper)
+    if user_id is not None:
+        stmt = stmt.where(ImpactMetric.user_id == user_id)
+    return stmt
+
+if __name__ == "__main__":
+    # One-off backfill, e.g. after enabling rollups on a database with history:
+    #   python -m backend.services.rollups [YYYY-MM-DD]
+    import sys
+
+    # Register every mapper, as importing the app would
+    from ..models import claims, listings, notifications, storefronts, tasks, trades, users  # noqa: F401
+
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else datetime.min
+    db = SessionLocal()
+    try:
+        print(f"Wrote {compact_rollups(db, since)} impact rollup buckets since {since}")
+    finally:
+        db.close()
@@ -0,0 +1,264 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from decouple import config
+
+from . import geo
+
+ROUTE_SPEED_KMH = config('ROUTE_SPEED_KMH', default=30.0, cast=float)
+ROUTE_SERVICE_MINUTES = config('ROUTE_SERVICE_MINUTES', default=5.0, cast=float)
+ROUTE_TIME_BUDGET = config('ROUTE_TIME_BUDGET', default=0.8, cast=float)
+# Cost of one minute late, in km of driving
+ROUTE_LATE_PENALTY = config('ROUTE_LATE_PENALTY', default=10.0, cast=float)
+
+PICKUP = "pickup"
+DELIVERY = "delivery"
+
+class Stop(NamedTuple):
+    latitude: float
+    longitude: float
+    kind: str = PICKUP
+    load: float = 1.0
+    ready_minute: float = 0.0  # earliest service, minutes after route start
+    due_minute: float = float("inf")  # latest service start
+    service_minutes: float = ROUTE_SERVICE_MINUTES
+    pickup_index: int = -1  # for a delivery, index of the pickup it depends on
+
+class RoutePlan(NamedTuple):
+    order: List[int]  # stop indices in visiting order
+    arrival_minutes: List[float]  # service start per visited stop
+    distance_km: float
+    late_minutes: float
+    unrouted: List[int]  # stops that don't fit the vehicle on this trip
+
+class RouteSolver:
+    """
+    Single-vehicle pickup-and-delivery route solver.
+
+    Builds a haversine distance matrix in one vectorized pass, seeds a route
+    with a nearest-feasible-neighbour construction and improves it with
+    2-opt and Or-opt moves until no move helps or the time budget runs out.
+    Deliveries always follow their pickup and the load never exceeds the
+    capacity; time windows are soft, with lateness priced at
+    ROUTE_LATE_PENALTY km per minute, so a plan is always returned. Stops
+    that can't be fitted in without breaking the capacity (a load bigger
+    than the vehicle, or pickups nothing unloads) are left out as
+    `unrouted`, for another trip.
+    """
+    def __init__(
+        self,
+        stops: List[Stop],
+        start: Optional[Tuple[float, float]] = None,
+        capacity: Optional[float] = None,
+        speed_kmh: float = ROUTE_SPEED_KMH,
+        time_budget: float = ROUTE_TIME_BUDGET
+    ):
+        self.stops = stops
+        self.capacity = float("inf") if capacity is None else capacity
+        self.time_budget = time_budget
+        n = len(stops)
+        # Node n is the start and n + 1 a free end, so routes are open paths
+        self.start_node, self.end_node = n, n + 1
+        lat = np.array([s.latitude for s in stops] + [start[0] if start else 0.0], dtype=float)
+        lon = np.array([s.longitude for s in stops] + [start[1] if start else 0.0], dtype=float)
+        dist = np.zeros((n + 2, n + 2))
+        dist[:n + 1, :n + 1] = geo.haversine_km_array(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        if not start:
+            dist[n, :] = dist[:, n] = 0.0
+        dist[n + 1, :] = dist[:, n + 1] = 0.0
+        self.dist = dist
+        self._dist = dist.tolist()
+        self._minutes_per_km = 60.0 / speed_kmh
+        self._ready = np.array([s.ready_minute for s in stops], dtype=float)
+        self._due = np.array([s.due_minute for s in stops], dtype=float)
+        self._service = np.array([s.service_minutes for s in stops], dtype=float)
+        self._signed_load = np.array([s.load if s.kind == PICKUP else -s.load for s in stops], dtype=float)
+        paired = [i for i, s in enumerate(stops) if s.kind == DELIVERY and s.pickup_index >= 0]
+        self._deliveries = np.array(paired, dtype=int)
+        self._pickups = np.array([stops[i].pickup_index for i in paired], dtype=int)
+        # With time windows a longer route can still be cheaper, so moves
+        # can't be filtered on distance gain alone
+        self._timed = bool((self._ready > 0).any() or np.isfinite(self._due).any())
+
+    def solve(self) -> RoutePlan:
+        if not self.stops:
+            return RoutePlan([], [], 0.0, 0.0, [])
+        deadline = time.perf_counter() + self.time_budget
+        route = self._construct()
+        cost = self._cost(route)
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for move in (self._two_opt, self._or_opt):
+                new_route, new_cost = move(route, cost, deadline)
+                if new_cost < cost - 1e-9:
+                    route, cost, improved = new_route, new_cost, True
+        return self._plan(route)
+
+    def _construct(self) -> List[int]:
+        """Nearest feasible neighbour: go to the stop that can be served soonest.
+
+        "Soonest" counts driving, waiting for the window to open and, heavily,
+        arriving after it closes. Stops out of capacity's reach are left out.
+        """
+        n = len(self.stops)
+        kinds = np.array([s.kind == DELIVERY for s in self.stops])
+        pickup_index = np.array([s.pickup_index for s in self.stops])
+        loads = np.array([s.load if s.kind == PICKUP else -s.load for s in self.stops], dtype=float)
+        visited = np.zeros(n, dtype=bool)
+        route = [self.start_node]
+        current, load, clock = self.start_node, 0.0, 0.0
+        for _ in range(n):
+            released = ~kinds | (pickup_index < 0) | visited[np.maximum(pickup_index, 0)]
+            candidates = ~visited & released & (load + loads <= self.capacity)
+            if not candidates.any():
+                # Every released delivery is done, so the load can only grow:
+                # nothing left fits on this trip
+                break
+            starts = np.maximum(clock + self.dist[current, :n] * self._minutes_per_km, self._ready)
+            late = np.maximum(starts - self._due, 0.0)
+            current = int(np.argmin(np.where(candidates, starts - clock + ROUTE_LATE_PENALTY * late, np.inf)))
+            visited[current] = True
+            load += loads[current]
+            clock = starts[current] + self._service[current]
+            route.append(current)
+        route.append(self.end_node)
+        return route
+
+    def _cost(self, route: List[int]) -> float:
+        """Distance plus lateness penalty; inf if precedence or capacity is violated.
+
+        Fully vectorized: service start times follow
+        clock[k] = max(clock[k-1] + service[k-1] + travel[k], ready[k]),
+        which is a running maximum over prefix sums.
+        """
+        nodes = np.asarray(route)
+        inner = nodes[1:-1]
+        if (np.cumsum(self._signed_load[inner]) > self.capacity).any():
+            return float("inf")
+        if len(self._deliveries):
+            position = np.empty(len(self.stops), dtype=int)
+            position[inner] = np.arange(len(inner))
+            if (position[self._pickups] > position[self._deliveries]).any():
+                return float("inf")
+
+        legs = self.dist[nodes[:-2], inner]
+        elapsed = np.cumsum(legs * self._minutes_per_km + np.concatenate(([0.0], self._service[inner][:-1])))
+        clock = elapsed + np.maximum.accumulate(np.maximum(self._ready[inner] - elapsed, 0.0))
+        late = np.maximum(clock - self._due[inner], 0.0).sum()
+        return float(legs.sum() + ROUTE_LATE_PENALTY * late)
+
+    def _two_opt(self, route: List[int], cost: float, deadline: float):
+        """One pass reversing route[i+1..j] wherever the two swapped edges are shorter."""
+        dist, nodes = self.dist, np.array(route)
+        last = len(route) - 1
+        for i in range(0, last - 2):
+            if time.perf_counter() > deadline:
+                break
+            a, b = nodes[i], nodes[i + 1]
+            c, d = nodes[i + 2:last], nodes[i + 3:last + 1]
+            gains = dist[a, b] + dist[c, d] - dist[a, c] - dist[b, d]
+            for offset in np.argsort(-gains)[:3]:
+                if gains[offset] <= 1e-9 and not self._timed:
+                    break
+                j = i + 2 + int(offset)
+                candidate = route[:i + 1] + route[i + 1:j + 1][::-1] + route[j + 1:]
+                candidate_cost = self._cost(candidate)
+                if candidate_cost < cost - 1e-9:
+                    route, cost, nodes = candidate, candidate_cost, np.array(candidate)
+                    break
+        return route, cost
+
+    def _or_opt(self, route: List[int], cost: float, deadline: float):
+        """One pass moving runs of 1-3 stops to the gap where they add the least distance."""
+        dist, nodes = self.dist, np.array(route)
+        last = len(route) - 1
+        for length in (1, 2, 3):
+            for i in range(1, last - length + 1):
+                if time.perf_counter() > deadline:
+                    return route, cost
+                first, tail = nodes[i], nodes[i + length - 1]
+                before, after = nodes[i - 1], nodes[i + length]
+                removed = dist[before, first] + dist[tail, after] - dist[before, after]
+                # Insert between nodes[k] and nodes[k + 1], outside the run itself
+                k = np.arange(last)
+                k = k[(k < i - 1) | (k > i + length - 1)]
+                added = dist[nodes[k], first] + dist[tail, nodes[k + 1]] - dist[nodes[k], nodes[k + 1]]
+                gains = removed - added
+                for offset in np.argsort(-gains)[:3]:
+                    if gains[offset] <= 1e-9 and not self._timed:
+                        break
+                    gap = int(k[offset])
+                    segment = route[i:i + length]
+                    rest = route[:i] + route[i + length:]
+                    insert_at = gap + 1 if gap < i else gap + 1 - length
+                    candidate = rest[:insert_at] + segment + rest[insert_at:]
+                    candidate_cost = self._cost(candidate)
+                    if candidate_cost < cost - 1e-9:
+                        route, cost, nodes = candidate, candidate_cost, np.array(candidate)
+                        break
+        return route, cost
+
+    def _plan(self, route: List[int]) -> RoutePlan:
+        order = route[1:-1]
+        routed = set(order)
+        unrouted = [i for i in range(len(self.stops)) if i not in routed]
+        arrivals, clock, km, late, prev = [], 0.0, 0.0, 0.0, route[0]
+        for node in order:
+            stop = self.stops[node]
+            leg = self._dist[prev][node]
+            km += leg
+            clock = max(clock + leg * self._minutes_per_km, stop.ready_minute)
+            late += max(0.0, clock - stop.due_minute)
+            arrivals.append(clock)
+            clock += stop.service_minutes
+            prev = node
+        return RoutePlan(order, arrivals, km, late, unrouted)
+
+def solve_route(
+    stops: List[Stop],
+    start: Optional[Tuple[float, float]] = None,
+    capacity: Optional[float] = None
+) -> RoutePlan:
+    return RouteSolver(stops, start, capacity).solve()
+
+def _solve_problem(problem: Dict) -> RoutePlan:
+    return solve_route(problem["stops"], problem.get("start"), problem.get("capacity"))
+
+# Worker processes are expensive to start, so pools live as long as the process
+_pools: Dict[Optional[int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _pool(processes: Optional[int]) -> ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(processes)
+        if pool is None:
+            pool = _pools[processes] = ProcessPoolExecutor(max_workers=processes)
+        return pool
+
+def solve_regions(problems: List[Dict], processes: Optional[int] = None) -> List[RoutePlan]:
+    """
+    Solve independent regional problems in parallel on a shared process pool.
+
+    Args:
+        problems: Dicts with "stops" and optional "start" and "capacity"
+        processes: Pool size; defaults to the CPU count
+
+    Returns:
+        List[RoutePlan]: One plan per problem, in input order
+    """
+    if len(problems) <= 1:
+        return [_solve_problem(problem) for problem in problems]
+    pool = _pool(processes)
+    try:
+        return list(pool.map(_solve_problem, problems))
+    except BrokenProcessPool:
+        # A worker died; the next call starts a fresh pool
+        with _pools_lock:
+            if _pools.get(processes) is pool:
+                del _pools[processes]
+        raise
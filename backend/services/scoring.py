@@ -0,0 +1,89 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+DEFAULT_WEIGHTS = {
+    "distance": 0.4,
+    "freshness": 0.25,
+    "category": 0.15,
+    "priority": 0.1,
+    "capacity": 0.1,
+}
+
+class ScoringEngine:
+    """
+    Vectorized candidate scoring.
+
+    Every feature is passed as a 1-D array with one entry per candidate and
+    the whole batch is scored in a single pass; NaN marks an unknown value
+    and scores as neutral (0.5) for that feature. Candidates that have
+    already expired score -inf so they never make the top-k.
+    """
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        distance_scale_km: float = 10.0,
+        freshness_horizon_hours: float = 72.0
+    ):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.distance_scale_km = distance_scale_km
+        self.freshness_horizon_hours = freshness_horizon_hours
+
+    def score(
+        self,
+        distance_km: Optional[np.ndarray] = None,
+        hours_to_expiry: Optional[np.ndarray] = None,
+        category_affinity: Optional[np.ndarray] = None,
+        priority: Optional[np.ndarray] = None,
+        capacity: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Score a batch of candidates.
+
+        Args:
+            distance_km: Distance from the requester; closer is better
+            hours_to_expiry: Time left before expiry/schedule; sooner is more urgent
+            category_affinity: Preference for the candidate's category, 0-1
+            priority: Task priority, 1 (low) to 5 (high)
+            capacity: Fraction of the need the candidate can cover, 0-1
+
+        Returns:
+            np.ndarray: One score per candidate, higher is better
+        """
+        features = {
+            "distance": None if distance_km is None
+                else np.exp(-np.asarray(distance_km, dtype=float) / self.distance_scale_km),
+            "freshness": None if hours_to_expiry is None
+                else 1.0 - np.clip(
+                    np.asarray(hours_to_expiry, dtype=float) / self.freshness_horizon_hours, 0.0, 1.0
+                ),
+            "category": None if category_affinity is None
+                else np.clip(np.asarray(category_affinity, dtype=float), 0.0, 1.0),
+            "priority": None if priority is None
+                else np.clip((np.asarray(priority, dtype=float) - 1.0) / 4.0, 0.0, 1.0),
+            "capacity": None if capacity is None
+                else np.clip(np.asarray(capacity, dtype=float), 0.0, 1.0),
+        }
+
+        scores = None
+        for name, values in features.items():
+            if values is None:
+                continue
+            contribution = self.weights[name] * np.nan_to_num(values, nan=0.5)
+            scores = contribution if scores is None else scores + contribution
+
+        if scores is None:
+            return np.zeros(0)
+        if hours_to_expiry is not None:
+            scores = np.where(np.asarray(hours_to_expiry, dtype=float) <= 0, -np.inf, scores)
+        return scores
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k best finite scores, best first, without a full sort."""
+        valid = np.flatnonzero(np.isfinite(scores))
+        if k <= 0 or valid.size == 0:
+            return valid[:0]
+        if valid.size > k:
+            valid = valid[np.argpartition(-scores[valid], k - 1)[:k]]
+        return valid[np.argsort(-scores[valid], kind="stable")]
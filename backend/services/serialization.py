@@ -0,0 +1,97 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import inspect, select
+
+from .pagination import NEXT_CURSOR_HEADER
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """JSON-encode plain data (dicts, lists, datetimes, enums) the way FastAPI would."""
+    if orjson is not None:
+        # Naive datetimes stay offset-free, matching isoformat()
+        return orjson.dumps(content)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for already-serializable data; encodes with orjson when installed."""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def page_response(items: List[Dict], response: Response) -> FastJSONResponse:
+    """Return a page built by `RowSerializer`, keeping the X-Next-Cursor that `finish_page` set."""
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return FastJSONResponse(items, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+def _column_fields(schema: Type[BaseModel], model) -> List[str]:
+    columns = set(inspect(model).columns.keys())
+    return [name for name in schema.__fields__ if name in columns]
+
+class RowSerializer:
+    """
+    Builds response dicts for a schema from a select of just its columns.
+
+    List endpoints use this instead of loading ORM objects and validating
+    them through an orm_mode schema one attribute at a time: the rows come
+    from our own database, so they're trusted as they are. Nested schemas
+    (e.g. `listing=(ListingSummary, Claim.listing)`) are filled from an
+    outer join in the same query.
+
+    Selected columns are labelled by field name, so rows also work with
+    `finish_page` and anything else that reads fields as attributes.
+    Columns are resolved on first use, once every model is mapped.
+    """
+    def __init__(self, schema: Type[BaseModel], model, **nested: Tuple[Type[BaseModel], Any]):
+        self.schema = schema
+        self.model = model
+        self.nested_schemas = nested
+        self.fields: Optional[List[str]] = None
+
+    def _prepare(self):
+        self.columns = []
+        self.nested = []
+        for name, (nested_schema, relationship) in self.nested_schemas.items():
+            target = relationship.property.mapper.class_
+            fields = _column_fields(nested_schema, target)
+            self.nested.append((name, relationship, fields, fields.index("id")))
+            self.columns.extend(getattr(target, field).label(f"{name}__{field}") for field in fields)
+        fields = _column_fields(self.schema, self.model)
+        self.columns[:0] = [getattr(self.model, name).label(name) for name in fields]
+        # Schema fields with no column (e.g. distance_km) take their defaults
+        self.defaults = {
+            name: field.default for name, field in self.schema.__fields__.items()
+            if name not in fields and name not in self.nested_schemas
+        }
+        self.fields = fields
+
+    def select(self):
+        if self.fields is None:
+            self._prepare()
+        query = select(*self.columns).select_from(self.model)
+        for _, relationship, _, _ in self.nested:
+            query = query.outerjoin(relationship)
+        return query
+
+    def dict(self, row) -> Dict:
+        item = dict(zip(self.fields, row))
+        if self.defaults:
+            item.update(self.defaults)
+        offset = len(self.fields)
+        for name, _, fields, id_index in self.nested:
+            values = row[offset:offset + len(fields)]
+            offset += len(fields)
+            item[name] = dict(zip(fields, values)) if values[id_index] is not None else None
+        return item
+
+    def dicts(self, rows) -> List[Dict]:
+        return [self.dict(row) for row in rows]
@@ -0,0 +1,109 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Point the app at a throwaway SQLite database before anything imports it
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="sharefoods-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+os.environ.setdefault("OUTBOX_DISPATCHER_ENABLED", "False")
+os.environ.setdefault("EXPIRY_SCHEDULER_ENABLED", "False")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient
+
+from ..main import app
+from ..models.database import Base, engine, SessionLocal
+from ..models.listings import FoodListing, FoodCategory
+from ..models.users import User, UserType
+from ..routers import auth
+from ..services import geo
+from ..services.notifications import unread_counter
+from ..services.passwords import pwd_context
+from ..services.recommendations import recommendation_cache
+from ..services.response_cache import listing_feed_cache
+
+def _reset_caches():
+    auth._user_cache.clear()
+    auth._user_subjects.clear()
+    auth._revoked_users.clear()
+    geo._geocode_cache.clear()
+    recommendation_cache.clear()
+    unread_counter._counts.clear()
+    listing_feed_cache.bump()
+
+@pytest.fixture
+def test_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _reset_caches()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def test_client(test_db):
+    with TestClient(app) as client:
+        yield client
+
+def _create_user(db, username: str, user_type: UserType) -> User:
+    user = User(
+        email=f"{username}@example.com",
+        username=username,
+        hashed_password=pwd_context.hash("password"),
+        full_name=username.title(),
+        location="40.71,-74.00",
+        contact_number="555-0100",
+        user_type=user_type,
+        is_active=True
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def _token(user: User) -> str:
+    return auth.create_access_token(
+        {"sub": user.username, "uid": user.id, "type": user.user_type.value}
+    )
+
+@pytest.fixture
+def test_user(test_db) -> User:
+    return _create_user(test_db, "donor", UserType.DONOR)
+
+@pytest.fixture
+def other_user(test_db) -> User:
+    return _create_user(test_db, "recipient", UserType.RECIPIENT)
+
+@pytest.fixture
+def test_user_token(test_user) -> str:
+    return _token(test_user)
+
+@pytest.fixture
+def other_user_token(other_user) -> str:
+    return _token(other_user)
+
+@pytest.fixture
+def test_listing(test_db, test_user) -> FoodListing:
+    listing = FoodListing(
+        title="Bread",
+        description="Day-old loaves",
+        category=FoodCategory.BAKERY,
+        quantity=1,
+        quantity_unit="loaf",
+        expiration_date=datetime.utcnow() + timedelta(days=2),
+        pickup_location="40.71,-74.00",
+        latitude=40.71,
+        longitude=-74.00,
+        pickup_instructions="Front desk",
+        is_donation=True,
+        owner_id=test_user.id
+    )
+    test_db.add(listing)
+    test_db.commit()
+    test_db.refresh(listing)
+    return listing
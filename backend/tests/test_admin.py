@@ -0,0 +1,114 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from ..models.listings import FoodListing, FoodCategory, ListingStatus
+from ..models.tasks import VolunteerTask, TaskStatus, TaskType
+from ..models.users import User, UserType
+from ..routers.auth import create_access_token
+from ..services.passwords import pwd_context
+
+def _admin_headers(test_db: Session, user: User) -> dict:
+    user.user_type = UserType.ADMIN
+    test_db.commit()
+    token = create_access_token({"sub": user.username, "uid": user.id, "type": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+def _seed(test_db: Session, owner: User):
+    now = datetime.utcnow()
+    test_db.add(User(
+        email="old@example.com",
+        username="old-volunteer",
+        hashed_password=pwd_context.hash("password"),
+        user_type=UserType.VOLUNTEER,
+        is_active=True,
+        created_at=now - timedelta(days=60),
+        updated_at=now - timedelta(days=10)
+    ))
+    for quantity, status, is_donation in [
+        (5, ListingStatus.COMPLETED, True),
+        (7, ListingStatus.COMPLETED, True),
+        (3, ListingStatus.COMPLETED, False),
+        (2, ListingStatus.CLAIMED, True),
+        (4, ListingStatus.AVAILABLE, True),
+    ]:
+        test_db.add(FoodListing(
+            title="Stats",
+            description="Stats test",
+            category=FoodCategory.PRODUCE,
+            quantity=quantity,
+            quantity_unit="kg",
+            expiration_date=now + timedelta(days=1),
+            pickup_location="40.71,-74.00",
+            pickup_instructions="Door",
+            is_donation=is_donation,
+            status=status,
+            owner_id=owner.id
+        ))
+    for status in (TaskStatus.COMPLETED, TaskStatus.COMPLETED, TaskStatus.PENDING):
+        test_db.add(VolunteerTask(
+            task_type=TaskType.DELIVERY, title="Deliver", location="40.71,-74.00",
+            scheduled_time=now, estimated_duration=30, status=status
+        ))
+    test_db.commit()
+
+def _per_query_totals(db: Session) -> dict:
+    """The figures as the original one-query-per-number implementation counted them."""
+    now = datetime.utcnow()
+    def active_since(threshold):
+        return db.query(func.count(User.id)).filter(User.updated_at >= threshold).scalar()
+    return {
+        "total_users": db.query(func.count(User.id)).scalar(),
+        "user_types": {
+            user_type.value: db.query(func.count(User.id)).filter(User.user_type == user_type).scalar()
+            for user_type in UserType
+        },
+        "new_users_30d": db.query(func.count(User.id)).filter(
+            User.created_at >= now - timedelta(days=30)
+        ).scalar(),
+        "active_users": {
+            "24h": active_since(now - timedelta(hours=24)),
+            "7d": active_since(now - timedelta(days=7)),
+            "30d": active_since(now - timedelta(days=30)),
+        },
+        "total_listings": db.query(func.count(FoodListing.id)).scalar(),
+        "active_listings": db.query(func.count(FoodListing.id)).filter(
+            FoodListing.status == ListingStatus.AVAILABLE
+        ).scalar(),
+        "total_donations": db.query(func.sum(FoodListing.quantity)).filter(
+            FoodListing.is_donation == True,
+            FoodListing.status == ListingStatus.COMPLETED
+        ).scalar() or 0,
+        "total_deliveries": db.query(func.count(VolunteerTask.id)).filter(
+            VolunteerTask.status == TaskStatus.COMPLETED
+        ).scalar(),
+    }
+
+def test_stats_match_the_per_query_counts(
+    test_db: Session, test_client: TestClient, test_user: User, other_user: User
+):
+    headers = _admin_headers(test_db, test_user)
+    _seed(test_db, test_user)
+    expected = _per_query_totals(test_db)
+
+    users = test_client.get("/admin/users/stats", headers=headers)
+    assert users.status_code == 200
+    users = users.json()
+    assert {name: users[name] for name in ("total_users", "user_types", "new_users_30d", "active_users")} == {
+        name: expected[name] for name in ("total_users", "user_types", "new_users_30d", "active_users")
+    }
+    assert users["total_users"] == 3
+    assert users["new_users_30d"] == 2
+    assert users["active_users"] == {"24h": 2, "7d": 2, "30d": 3}
+    assert users["user_types"][UserType.VOLUNTEER.value] == 1
+
+    system = test_client.get("/admin/system/stats", headers=headers)
+    assert system.status_code == 200
+    system = system.json()
+    assert system["total_users"] == expected["total_users"]
+    assert system["active_users_24h"] == expected["active_users"]["24h"]
+    for name in ("total_listings", "active_listings", "total_donations", "total_deliveries"):
+        assert system[name] == expected[name]
+    assert (system["total_listings"], system["active_listings"]) == (5, 1)
+    assert (system["total_donations"], system["total_deliveries"]) == (12, 2)
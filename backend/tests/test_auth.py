@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from ..models.users import User, UserType
+from ..routers import auth
+from ..routers.auth import create_access_token
+
+def test_admin_routes_recheck_the_database(test_db: Session, test_client: TestClient, test_user: User):
+    test_user.user_type = UserType.ADMIN
+    test_db.commit()
+    token = create_access_token({"sub": test_user.username, "uid": test_user.id, "type": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert test_client.get("/admin/users/stats", headers=headers).status_code != 403
+
+    # Demoted by another worker: this process never saw a revoke_user call
+    test_user.user_type = UserType.DONOR
+    test_db.commit()
+    assert test_client.get("/admin/users/stats", headers=headers).status_code == 403
+
+    test_user.user_type = UserType.ADMIN
+    test_user.is_active = False
+    test_db.commit()
+    assert test_client.get("/admin/users/stats", headers=headers).status_code == 400
+
+def test_user_subjects_are_bounded_by_the_user_cache(monkeypatch, test_db: Session, test_user: User):
+    monkeypatch.setattr(auth, "_user_cache", auth.TTLCache(1, 60, on_evict=auth._forget_subject))
+    auth.get_current_user(create_access_token({"sub": test_user.username}), test_db)
+    assert auth._user_subjects == {test_user.id: test_user.username}
+
+    auth._user_cache.set("someone-else", User(id=-1))
+    assert test_user.id not in auth._user_subjects
@@ -0,0 +1,23 @@
+from ..services import cache
+from ..services.cache import TTLCache
+from ..services.notifications import UnreadCounter
+
+def test_adjusting_unread_counts_keeps_their_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    counter = UnreadCounter(maxsize=10, ttl=60)
+    counter.set(7, 3)
+
+    now[0] += 50
+    counter.adjust(7, 1)
+    assert counter._counts.get(7) == 4
+
+    # Still expires 60s after it was loaded, however often it's adjusted
+    now[0] += 20
+    counter.adjust(7, 1)
+    assert counter._counts.get(7) is None
+
+def test_replace_ignores_missing_keys():
+    entries = TTLCache(10, 60)
+    assert not entries.replace("missing", 1)
+    assert "missing" not in entries
@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from ..models.listings import FoodListing, ListingStatus
+
+def _claim(test_client: TestClient, token: str, listing_id: int, **fields):
+    return test_client.post(
+        "/claims/",
+        json={
+            "listing_id": listing_id,
+            "pickup_time": (datetime.utcnow() + timedelta(hours=2)).isoformat(),
+            **fields
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+def test_partial_claims_never_over_allocate(
+    test_db: Session, test_client: TestClient, test_user_token: str, other_user_token: str, test_listing: FoodListing
+):
+    test_listing.quantity = 10
+    test_db.commit()
+
+    assert _claim(test_client, other_user_token, test_listing.id, quantity=6).json()["status"] == "pending"
+    waitlisted = _claim(test_client, other_user_token, test_listing.id, quantity=6).json()
+    assert waitlisted["status"] == "waitlisted"
+    assert _claim(test_client, other_user_token, test_listing.id, quantity=6, waitlist=False).status_code == 409
+    rest = _claim(test_client, other_user_token, test_listing.id).json()
+    assert rest["quantity"] == 4
+
+    test_db.refresh(test_listing)
+    assert test_listing.claimed_quantity == 10
+    assert test_listing.status == ListingStatus.CLAIMED
+
+def test_cancelling_promotes_the_waitlist(
+    test_db: Session, test_client: TestClient, test_user_token: str, other_user_token: str, test_listing: FoodListing
+):
+    first = _claim(test_client, other_user_token, test_listing.id).json()
+    waiting = _claim(test_client, other_user_token, test_listing.id).json()
+    assert waiting["status"] == "waitlisted"
+
+    response = test_client.put(
+        f"/claims/{first['id']}",
+        json={"status": "cancelled"},
+        headers={"Authorization": f"Bearer {other_user_token}"}
+    )
+    assert response.status_code == 200
+
+    claims = test_client.get("/claims/", headers={"Authorization": f"Bearer {other_user_token}"}).json()
+    assert {claim["id"]: claim["status"] for claim in claims}[waiting["id"]] == "pending"
+
+def test_waitlisted_claim_can_only_be_cancelled(
+    test_db: Session, test_client: TestClient, test_user_token: str, other_user_token: str, test_listing: FoodListing
+):
+    _claim(test_client, other_user_token, test_listing.id)
+    waiting = _claim(test_client, other_user_token, test_listing.id).json()
+    assert waiting["status"] == "waitlisted"
+
+    for status in ("pending", "approved", "rejected"):
+        response = test_client.put(
+            f"/claims/{waiting['id']}",
+            json={"status": status},
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        assert response.status_code == 400
+
+    response = test_client.put(
+        f"/claims/{waiting['id']}",
+        json={"status": "cancelled"},
+        headers={"Authorization": f"Bearer {other_user_token}"}
+    )
+    assert response.status_code == 200
+    test_db.refresh(test_listing)
+    assert test_listing.claimed_quantity == test_listing.quantity
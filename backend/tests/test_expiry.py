@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from ..models.listings import FoodListing, ListingStatus
+from ..services import expiry
+from ..services.expiry import ExpiryScheduler, EXPIRY_RETRY_DELAY
+
+def test_offset_expirations_are_scheduled_as_naive_utc():
+    scheduler = ExpiryScheduler()
+    scheduler._horizon_end = datetime.utcnow() + timedelta(hours=1)
+    due = datetime.now(timezone(timedelta(hours=2))) + timedelta(minutes=5)
+
+    scheduler.schedule(1, due)
+    assert scheduler._scheduled[1] == due.astimezone(timezone.utc).replace(tzinfo=None)
+
+def test_listings_skipped_as_locked_are_retried(monkeypatch, test_db: Session, test_listing: FoodListing):
+    now = datetime.utcnow()
+    test_listing.expiration_date = now - timedelta(minutes=1)
+    test_db.commit()
+    scheduler = ExpiryScheduler()
+    scheduler._horizon_end = now
+    scheduler.schedule(test_listing.id, test_listing.expiration_date)
+
+    async def locked_elsewhere(db, listing_ids, now):
+        return []
+    monkeypatch.setattr(expiry, "expire_listings", locked_elsewhere)
+    assert asyncio.run(scheduler.expire_due(now)) == 0
+    retry_at = now + timedelta(seconds=EXPIRY_RETRY_DELAY)
+    assert scheduler._heap[0] == (retry_at, test_listing.id)
+
+    monkeypatch.undo()
+    assert asyncio.run(scheduler.expire_due(retry_at)) == 1
+    test_db.refresh(test_listing)
+    assert test_listing.status == ListingStatus.EXPIRED
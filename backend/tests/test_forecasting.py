@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from ..services import forecasting
+from ..services.forecasting import SeasonalDemandModel, get_demand_model, reset_demand_model
+from ..models.listings import FoodCategory
+
+MONDAY_6PM = datetime(2024, 1, 1, 18)
+
+def _weekly_events(cell, category, weeks, amount=1.0):
+    return [(MONDAY_6PM - timedelta(weeks=w), cell, category, amount) for w in range(weeks)]
+
+def test_busy_slot_predicts_its_weekly_mean():
+    model = SeasonalDemandModel.fit(_weekly_events("dr5r", FoodCategory.PRODUCE, 52, amount=3.0), weeks=52)
+    assert abs(model.predict("dr5r", "produce", MONDAY_6PM) - 3.0) < 0.3
+    assert model.predict("dr5r", "produce", MONDAY_6PM + timedelta(hours=3)) < 0.1
+
+def test_sparse_cell_borrows_the_pooled_weekly_profile():
+    events = _weekly_events("dr5r", FoodCategory.BAKERY, 52) + [
+        # One event at a different hour in a quiet cell
+        (MONDAY_6PM + timedelta(hours=2), "9q8y", FoodCategory.BAKERY, 1.0)
+    ]
+    model = SeasonalDemandModel.fit(events, weeks=52)
+    assert model.predict("9q8y", "bakery", MONDAY_6PM) > 0
+
+def test_batch_prediction_and_round_trip(tmp_path):
+    model = SeasonalDemandModel.fit(_weekly_events("dr5r", FoodCategory.DAIRY, 10), weeks=10)
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = SeasonalDemandModel.load(path)
+
+    queries = (["dr5r", "unknown", "dr5r"], ["dairy", "dairy", "not-a-category"], [MONDAY_6PM] * 3)
+    assert loaded.predict_batch(*queries).tolist() == model.predict_batch(*queries).tolist()
+    assert loaded.predict_batch(*queries)[2] == 0.0
+
+def test_missing_model_is_not_reloaded_until_reset(monkeypatch, tmp_path):
+    path = str(tmp_path / "model.npz")
+    monkeypatch.setattr(forecasting, "FORECAST_MODEL_PATH", path)
+    reset_demand_model()
+    loads = []
+    original_load = SeasonalDemandModel.load.__func__
+    monkeypatch.setattr(SeasonalDemandModel, "load", classmethod(
+        lambda cls, path: loads.append(path) or original_load(cls, path)
+    ))
+
+    assert get_demand_model() is None
+    assert get_demand_model() is None
+    assert len(loads) == 1
+
+    SeasonalDemandModel.fit(_weekly_events("dr5r", FoodCategory.DAIRY, 4), weeks=4).save(path)
+    reset_demand_model()
+    assert isinstance(get_demand_model(), SeasonalDemandModel)
+    reset_demand_model()
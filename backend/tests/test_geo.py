@@ -0,0 +1,33 @@
+import requests
+
+from ..services import geo
+
+class _Response:
+    def __init__(self, results):
+        self.results = results
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.results
+
+def test_geocode_retries_after_a_failed_request(monkeypatch):
+    calls = []
+
+    def fake_get(url, params, timeout):
+        calls.append(params["q"])
+        if len(calls) == 1:
+            raise requests.ConnectionError("geocoder down")
+        return _Response([{"lat": "40.71", "lon": "-74.00"}])
+
+    monkeypatch.setattr(geo, "GEOCODER_URL", "http://geocoder.test/search")
+    monkeypatch.setattr(geo.requests, "get", fake_get)
+    geo._geocode_cache.clear()
+
+    assert geo.geocode("1 Main St") is None
+    assert geo.geocode("1 Main St") is None  # the failure is remembered briefly
+    geo._geocode_cache.set("1 Main St", None, ttl=0)  # ...until GEOCODER_FAILURE_TTL passes
+    assert geo.geocode("1 Main St") == (40.71, -74.0)
+    assert geo.geocode("1 Main St") == (40.71, -74.0)
+    assert len(calls) == 2
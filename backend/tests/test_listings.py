@@ -0,0 +1,287 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import time
+
+from ..models.listings import FoodListing, FoodCategory, ListingStatus
+from ..models.users import User, UserType
+from ..schemas.listings import ListingCreate, ListingUpdate
+from ..services import geo, listing_import
+from ..main import app
+
+def test_create_listing(test_db: Session, test_client: TestClient, test_user_token: str):
+    # Create test listing data
+    listing_data = {
+        "title": "Fresh Vegetables",
+        "description": "Assorted fresh vegetables",
+        "category": FoodCategory.PRODUCE,
+        "quantity": 10,
+        "quantity_unit": "kg",
+        "expiration_date": (datetime.utcnow() + timedelta(days=7)).isoformat(),
+        "pickup_location": "123 Test St",
+        "pickup_instructions": "Back door",
+        "is_donation": True
+    }
+    
+    response = test_client.post(
+        "/listings/",
+        json=listing_data,
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["title"] == listing_data["title"]
+    assert data["owner_id"] is not None
+    assert data["status"] == ListingStatus.AVAILABLE
+
+def test_get_listings(test_db: Session, test_client: TestClient):
+    response = test_client.get("/listings/")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+def test_get_listings_cursor_pagination(test_db: Session, test_client: TestClient, test_listing: FoodListing):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = test_client.get("/listings/", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 1
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert test_listing.id in seen
+    assert len(seen) == len(set(seen))
+
+def test_get_listings_page_size_limit(test_db: Session, test_client: TestClient):
+    assert test_client.get("/listings/?limit=100000").status_code == 422
+    assert test_client.get("/listings/?cursor=not-a-cursor").status_code == 400
+
+def test_get_listings_near(test_db: Session, test_client: TestClient, test_user_token: str):
+    for title, location in [("Far", "40.90,-74.00"), ("Near", "40.71,-74.00")]:
+        test_client.post(
+            "/listings/",
+            json={
+                "title": title,
+                "description": "Geo test",
+                "category": FoodCategory.BAKERY,
+                "quantity": 1,
+                "quantity_unit": "kg",
+                "expiration_date": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+                "pickup_location": location,
+                "pickup_instructions": "Front desk"
+            },
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+
+    response = test_client.get("/listings/?near=40.70,-74.00&radius_km=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["title"] for item in data] == ["Near"]
+    assert data[0]["distance_km"] < 5
+
+    response = test_client.get("/listings/?near=40.70,-74.00&radius_km=50")
+    distances = [item["distance_km"] for item in response.json()]
+    assert distances == sorted(distances)
+
+def test_get_listings_near_pages_by_distance(test_db: Session, test_client: TestClient, test_user: User):
+    for i in range(5):
+        test_db.add(FoodListing(
+            title=f"Listing {i}",
+            description="Geo test",
+            category=FoodCategory.BAKERY,
+            quantity=1,
+            quantity_unit="kg",
+            expiration_date=datetime.utcnow() + timedelta(days=1),
+            pickup_location=f"{40.70 + 0.01 * i},-74.00",
+            latitude=40.70 + 0.01 * i,
+            longitude=-74.00,
+            geohash=geo.encode_geohash(40.70 + 0.01 * i, -74.00),
+            pickup_instructions="Front desk",
+            owner_id=test_user.id
+        ))
+    test_db.commit()
+
+    titles, cursor = [], None
+    while True:
+        url = "/listings/?near=40.70,-74.00&radius_km=50&limit=2"
+        response = test_client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        titles.extend(item["title"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert titles == [f"Listing {i}" for i in range(5)]
+
+def test_get_listings_near_invalid(test_db: Session, test_client: TestClient):
+    response = test_client.get("/listings/?near=somewhere")
+    assert response.status_code == 400
+
+def test_update_listing(test_db: Session, test_client: TestClient, test_user_token: str, test_listing: FoodListing):
+    update_data = {
+        "title": "Updated Title",
+        "description": "Updated description"
+    }
+    
+    response = test_client.put(
+        f"/listings/{test_listing.id}",
+        json=update_data,
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["title"] == update_data["title"]
+    assert data["description"] == update_data["description"]
+
+def test_delete_listing(test_db: Session, test_client: TestClient, test_user_token: str, test_listing: FoodListing):
+    response = test_client.delete(
+        f"/listings/{test_listing.id}",
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+    assert response.status_code == 204
+    
+    # Verify listing is deleted
+    listing = test_db.query(FoodListing).filter(FoodListing.id == test_listing.id).first()
+    assert listing is None
+
+def test_unauthorized_update(test_db: Session, test_client: TestClient, other_user_token: str, test_listing: FoodListing):
+    update_data = {"title": "Unauthorized Update"}
+    
+    response = test_client.put(
+        f"/listings/{test_listing.id}",
+        json=update_data,
+        headers={"Authorization": f"Bearer {other_user_token}"}
+    )
+    
+    assert response.status_code == 403
+
+def test_get_recommendations(test_db: Session, test_client: TestClient, test_user_token: str):
+    response = test_client.get(
+        "/listings/recommendations",
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+    
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+def test_create_listings_batch_reports_row_errors(test_db: Session, test_client: TestClient, test_user_token: str):
+    row = {
+        "title": "Surplus bread",
+        "description": "Day-old loaves",
+        "category": FoodCategory.BAKERY,
+        "quantity": 20,
+        "quantity_unit": "loaves",
+        "expiration_date": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        "pickup_location": "40.71,-74.00",
+        "pickup_instructions": "Loading dock"
+    }
+    response = test_client.post(
+        "/listings/batch",
+        json=[row, {**row, "quantity": "lots"}, row],
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert [error["row"] for error in data["errors"]] == [1]
+    assert test_db.query(FoodListing).filter(FoodListing.id.in_(data["listing_ids"])).count() == 2
+
+def test_import_listings_csv(test_db: Session, test_client: TestClient, test_user_token: str):
+    expiration = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    body = (
+        "title,description,category,quantity,quantity_unit,expiration_date,pickup_location,pickup_instructions\n"
+        f'Apples,"Crisp,\nred",produce,5,kg,{expiration},"40.71,-74.00",Door\n'
+        f"Milk,Whole,dairy,unknown,l,{expiration},40.71,Door\n"
+    )
+    response = test_client.post(
+        "/listings/import",
+        data=body,
+        headers={"Authorization": f"Bearer {test_user_token}", "Content-Type": "text/csv"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 1
+    assert data["errors"][0]["row"] == 4
+
+def test_import_geocodes_with_bounded_concurrency_and_a_deadline(
+    monkeypatch, test_db: Session, test_client: TestClient, test_user_token: str
+):
+    running, peak = [0], [0]
+    def location_fields(address):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(1.0 if address == "Slow St" else 0.05)
+        running[0] -= 1
+        return {"latitude": 40.71, "longitude": -74.00, "geohash": geo.encode_geohash(40.71, -74.00)}
+
+    monkeypatch.setattr(geo, "location_fields", location_fields)
+    monkeypatch.setattr(listing_import, "LISTING_IMPORT_GEOCODE_CONCURRENCY", 2)
+    monkeypatch.setattr(listing_import, "LISTING_IMPORT_GEOCODE_TIMEOUT", 0.5)
+    row = {
+        "title": "Surplus bread",
+        "description": "Day-old loaves",
+        "category": FoodCategory.BAKERY,
+        "quantity": 20,
+        "quantity_unit": "loaves",
+        "expiration_date": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        "pickup_instructions": "Loading dock"
+    }
+    addresses = ["Slow St", "1 Main St", "2 Main St", "3 Main St"]
+    response = test_client.post(
+        "/listings/batch",
+        json=[{**row, "pickup_location": address} for address in addresses],
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 4
+    assert peak[0] <= 2
+    located = dict(test_db.query(FoodListing.pickup_location, FoodListing.latitude))
+    # The slow address missed the deadline and is saved without coordinates
+    assert located == {"Slow St": None, "1 Main St": 40.71, "2 Main St": 40.71, "3 Main St": 40.71}
+
+def test_get_listings_conditional_get(test_db: Session, test_client: TestClient, test_user_token: str, test_listing: FoodListing):
+    response = test_client.get("/listings/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = test_client.get("/listings/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = test_client.get("/listings/", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert response.status_code == 304
+
+    # Any listing write invalidates the cached feed
+    test_client.put(
+        f"/listings/{test_listing.id}",
+        json={"title": "Renamed"},
+        headers={"Authorization": f"Bearer {test_user_token}"}
+    )
+    response = test_client.get("/listings/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert any(listing["title"] == "Renamed" for listing in response.json())
+
+def test_get_listings_last_modified_changes_on_every_write(test_db: Session, test_client: TestClient, test_user_token: str, test_listing: FoodListing):
+    last_modified = test_client.get("/listings/").headers["Last-Modified"]
+    # Writes in the same second still move Last-Modified on
+    for title in ("First", "Second"):
+        test_client.put(
+            f"/listings/{test_listing.id}",
+            json={"title": title},
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        response = test_client.get("/listings/", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 200
+        assert response.json()[0]["title"] == title
+        last_modified = response.headers["Last-Modified"]
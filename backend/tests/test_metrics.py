@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from ..services.metrics import Histogram, MetricsMiddleware, MetricsRegistry, UNMATCHED_ROUTE, metrics
+
+def test_histogram_buckets_and_quantile():
+    histogram = Histogram((1, 2, 5))
+    for value in (0.5, 1.5, 1.5, 4, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.cumulative()[-1] == ("+Inf", 5)
+    assert 1 < histogram.quantile(0.5) <= 2
+
+def test_middleware_labels_routes_by_template_and_counts_queries(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, "slow_query_seconds", 0)  # queries are sampled by the global registry
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+            connection.execute(text("select 2"))
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    assert client.get("/nowhere").status_code == 404
+
+    route = registry.routes[("GET", "/items/{item_id}")]
+    assert route.latency.count == 3
+    assert route.queries.sum == 6
+    assert route.statuses == {200: 3}
+    assert registry.routes[("GET", UNMATCHED_ROUTE)].statuses == {404: 1}
+    assert metrics.slow_queries[-1].path == "/items/3"
+
+    exposition = registry.render_prometheus()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 3' in exposition
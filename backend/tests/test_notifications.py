@@ -0,0 +1,94 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from ..models.notifications import Notification, NotificationType
+from ..models.users import User
+
+def _notify(test_db: Session, user: User, count: int, read: bool = False):
+    start = datetime.utcnow() - timedelta(minutes=count)
+    notifications = [
+        Notification(
+            type=NotificationType.SYSTEM,
+            title=f"Notice {i}",
+            message="Pickup ready",
+            recipient_id=user.id,
+            read=read,
+            created_at=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+    test_db.add_all(notifications)
+    test_db.commit()
+    return [notification.id for notification in notifications]
+
+def _get(test_client: TestClient, token: str, url: str):
+    return test_client.get(url, headers={"Authorization": f"Bearer {token}"})
+
+def test_since_id_returns_only_newer_notifications_oldest_first(
+    test_db: Session, test_client: TestClient, test_user: User, test_user_token: str, other_user: User
+):
+    ids = _notify(test_db, test_user, 4)
+    _notify(test_db, other_user, 2)
+
+    response = _get(test_client, test_user_token, "/notifications/")
+    assert [item["id"] for item in response.json()] == ids[::-1]
+    assert response.headers["X-Unread-Count"] == "4"
+
+    response = _get(test_client, test_user_token, f"/notifications/?since_id={ids[1]}")
+    assert [item["id"] for item in response.json()] == ids[2:]
+    assert response.headers["X-Unread-Count"] == "4"
+    assert _get(test_client, test_user_token, f"/notifications/?since_id={ids[-1]}").json() == []
+
+def test_unread_only_skips_read_notifications(
+    test_db: Session, test_client: TestClient, test_user: User, test_user_token: str
+):
+    _notify(test_db, test_user, 2, read=True)
+    unread = _notify(test_db, test_user, 3)
+
+    response = _get(test_client, test_user_token, "/notifications/?unread_only=true")
+    assert sorted(item["id"] for item in response.json()) == unread
+    assert response.headers["X-Unread-Count"] == "3"
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 3}
+
+def test_mark_read_up_to_id_then_all(
+    test_db: Session, test_client: TestClient, test_user: User, test_user_token: str
+):
+    ids = _notify(test_db, test_user, 5)
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 5}
+
+    response = test_client.post(f"/notifications/read?up_to_id={ids[2]}", headers=headers)
+    assert response.json() == {"updated": 3}
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 2}
+    unread = _get(test_client, test_user_token, "/notifications/?unread_only=true").json()
+    assert sorted(item["id"] for item in unread) == ids[3:]
+
+    response = test_client.post("/notifications/read", headers=headers)
+    assert response.json() == {"updated": 2}
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 0}
+    assert test_client.post("/notifications/read", headers=headers).json() == {"updated": 0}
+
+def test_unread_count_follows_single_reads_and_deletes(
+    test_db: Session, test_client: TestClient, test_user: User, test_user_token: str, other_user_token: str
+):
+    read_id, = _notify(test_db, test_user, 1, read=True)
+    first, second, third = _notify(test_db, test_user, 3)
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 3}
+
+    response = test_client.post(f"/notifications/{first}/read", headers=headers)
+    assert response.json()["read"] is True
+    # Reading it again doesn't count twice
+    test_client.post(f"/notifications/{first}/read", headers=headers)
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 2}
+
+    assert test_client.delete(f"/notifications/{second}", headers=headers).status_code == 204
+    assert test_client.delete(f"/notifications/{read_id}", headers=headers).status_code == 204
+    assert _get(test_client, test_user_token, "/notifications/unread-count").json() == {"unread": 1}
+
+    # Someone else's notification is neither readable nor deletable
+    other = {"Authorization": f"Bearer {other_user_token}"}
+    assert test_client.post(f"/notifications/{third}/read", headers=other).status_code == 404
+    assert test_client.delete(f"/notifications/{third}", headers=other).status_code == 404
+    assert _get(test_client, test_user_token, "/notifications/").headers["X-Unread-Count"] == "1"
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from ..models.notifications import NotificationOutbox, OutboxStatus
+from ..models.users import User
+from ..services import outbox
+from ..services.outbox import OutboxDispatcher, enqueue_notification
+
+def test_slow_channels_lease_what_they_can_send_and_record_independently(
+    monkeypatch, test_db: Session, test_user: User
+):
+    for method in ("sms", "sms", "sms", "app", "app"):
+        enqueue_notification(test_db, test_user.id, "Pickup ready", method=method)
+    test_db.commit()
+
+    recorded = []
+    async def send_notifications(notifications):
+        methods = {notification[2] for notification in notifications}
+        if "sms" in methods:
+            # The app channel is already recorded while SMS is still sending
+            await asyncio.sleep(0.05)
+            recorded.append(test_db.query(NotificationOutbox).filter(
+                NotificationOutbox.method == "app", NotificationOutbox.status == OutboxStatus.SENT
+            ).count())
+        return [True] * len(notifications)
+
+    monkeypatch.setattr(outbox, "send_notifications", send_notifications)
+    monkeypatch.setattr(outbox, "OUTBOX_LEASE_SECONDS", 2)
+    dispatcher = OutboxDispatcher(rate_limits={"sms": 1})
+
+    assert dispatcher.channel_limit("sms") == 1
+    assert asyncio.run(dispatcher.dispatch_once()) == 3
+    assert recorded == [2]
+    # The two SMS over the limit weren't leased and are still due
+    assert test_db.query(NotificationOutbox).filter(NotificationOutbox.status == OutboxStatus.PENDING).count() == 2
+
+def test_sms_backlog_does_not_hold_up_other_channels(monkeypatch, test_db: Session, test_user: User):
+    for _ in range(10):
+        enqueue_notification(test_db, test_user.id, "Pickup ready", method="sms")
+    enqueue_notification(test_db, test_user.id, "Pickup ready", method="app")
+    test_db.commit()
+
+    sms_released = asyncio.Event()
+    async def send_notifications(notifications):
+        if notifications[0][2] == "sms":
+            await sms_released.wait()
+        return [True] * len(notifications)
+
+    monkeypatch.setattr(outbox, "send_notifications", send_notifications)
+    dispatcher = OutboxDispatcher(batch_size=5, rate_limits={"sms": 1})
+
+    def app_status():
+        test_db.expire_all()
+        return test_db.query(NotificationOutbox).filter(NotificationOutbox.method == "app").one().status
+
+    async def scenario():
+        running = asyncio.create_task(dispatcher.run())
+        try:
+            for _ in range(100):
+                if app_status() == OutboxStatus.SENT:
+                    break
+                await asyncio.sleep(0.01)
+            return app_status()
+        finally:
+            running.cancel()
+            sms_released.set()
+
+    # Sent on the first poll even though the SMS lane is still stuck sending
+    assert asyncio.run(scenario()) == OutboxStatus.SENT
+
+def test_failed_sends_back_off_then_dead_letter(monkeypatch, test_db: Session, test_user: User):
+    entry = enqueue_notification(test_db, test_user.id, "Pickup ready", method="sms")
+    test_db.commit()
+
+    async def send_notifications(notifications):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(outbox, "send_notifications", send_notifications)
+    monkeypatch.setattr(outbox, "backoff_seconds", lambda attempts: 60 * attempts)
+    dispatcher = OutboxDispatcher(rate_limits={})
+
+    before = datetime.utcnow()
+    assert asyncio.run(dispatcher.dispatch_once()) == 1
+    test_db.refresh(entry)
+    assert entry.status == OutboxStatus.PENDING
+    assert entry.attempts == 1
+    assert entry.last_error == "provider down"
+    assert before + timedelta(seconds=59) <= entry.available_at <= datetime.utcnow() + timedelta(seconds=60)
+    # Not due again until the backoff has passed
+    assert asyncio.run(dispatcher.dispatch_once()) == 0
+
+    entry.attempts = outbox.OUTBOX_MAX_ATTEMPTS - 1
+    entry.available_at = datetime.utcnow()
+    test_db.commit()
+    assert asyncio.run(dispatcher.dispatch_once()) == 1
+    test_db.refresh(entry)
+    assert entry.status == OutboxStatus.DEAD
+    assert entry.attempts == outbox.OUTBOX_MAX_ATTEMPTS
+    assert (dispatcher.failed, dispatcher.dead) == (1, 1)
+
+def test_rows_leased_by_a_crashed_dispatcher_are_leased_again(test_db: Session, test_user: User):
+    entry = enqueue_notification(test_db, test_user.id, "Pickup ready")
+    test_db.commit()
+    dispatcher = OutboxDispatcher(rate_limits={})
+
+    # Leased but never recorded, as if the process died mid-send
+    assert len(asyncio.run(dispatcher._lease_batch(None))) == 1
+    assert asyncio.run(dispatcher._lease_batch(None)) == []
+
+    # ...until the lease runs out
+    test_db.refresh(entry)
+    entry.available_at = datetime.utcnow()
+    test_db.commit()
+    assert [e.id for e in asyncio.run(dispatcher._lease_batch(None))] == [entry.id]
+    test_db.refresh(entry)
+    assert entry.attempts == 2
+    assert entry.status == OutboxStatus.PENDING
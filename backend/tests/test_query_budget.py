@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from ..models.listings import FoodListing
+from ..services import query_budget
+from ..services.query_budget import count_queries, QueryBudgetMiddleware, QUERY_COUNT_HEADER
+
+def test_count_queries_counts_statements():
+    engine = create_engine("sqlite://")
+    with count_queries() as counter:
+        with engine.connect() as connection:
+            for _ in range(3):
+                connection.execute(text("select 1"))
+    assert counter.queries == 3
+
+def test_claim_list_query_count_is_independent_of_page_size(
+    monkeypatch, test_db: Session, test_client: TestClient, other_user_token: str, test_listing: FoodListing
+):
+    monkeypatch.setattr(query_budget, "QUERY_BUDGET_MODE", "raise")
+    headers = {"Authorization": f"Bearer {other_user_token}"}
+    for _ in range(5):
+        test_client.post("/claims/", json={
+            "listing_id": test_listing.id,
+            "pickup_time": (datetime.utcnow() + timedelta(hours=2)).isoformat()
+        }, headers=headers)
+
+    # Warm the user cache so both pages see the same auth cost
+    test_client.get("/claims/", headers=headers)
+    counts = []
+    for limit in (1, 5):
+        response = test_client.get("/claims/", params={"limit": limit}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()[0]["listing"]["id"] == test_listing.id
+        counts.append(int(response.headers[QUERY_COUNT_HEADER]))
+    assert counts[0] == counts[1]
+
+def test_over_budget_endpoint_fails_in_raise_mode(monkeypatch):
+    monkeypatch.setattr(query_budget, "QUERY_BUDGET_MODE", "raise")
+    engine = create_engine("sqlite://")
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware)
+
+    @app.get("/items")
+    @query_budget.query_budget(1)
+    def read_items():
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+            connection.execute(text("select 2"))
+        return []
+
+    response = TestClient(app).get("/items")
+    assert response.status_code == 500
+    assert response.headers[QUERY_COUNT_HEADER] == "2"
@@ -0,0 +1,22 @@
+from ..services import geo
+from ..services.recommendations import RecommendationCache, CELL_PRECISION
+
+NEW_YORK = geo.encode_geohash(40.71, -74.00, precision=CELL_PRECISION)
+
+def test_unlocated_listing_only_invalidates_unlocated_users():
+    cache = RecommendationCache()
+    cache.put(1, NEW_YORK, [10, 11])
+    cache.put(2, None, [10, 12])
+
+    cache.listing_changed(None, None)
+    assert cache.get(1, 2) == [10, 11]
+    assert cache.get(2, 2) is None
+
+    cache.listing_changed(40.72, -74.01)
+    assert cache.get(1, 2) is None
+
+def test_removed_listing_is_patched_out_of_entries():
+    cache = RecommendationCache()
+    cache.put(1, NEW_YORK, [10, 11, 12])
+    cache.listing_removed(11)
+    assert cache.get(1, 2) == [10, 12]
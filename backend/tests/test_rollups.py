@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from ..models.analytics import ImpactMetric, ImpactMetricRollup, MetricType, RollupGranularity
+from ..services import rollups
+from ..services.rollups import compact_rollups, sum_impact_metrics
+
+def _metrics(db: Session, *timestamps: datetime):
+    db.add_all([
+        ImpactMetric(metric_type=MetricType.FOOD_RESCUED, value=1.0, timestamp=timestamp)
+        for timestamp in timestamps
+    ])
+    db.commit()
+
+def test_backfill_then_raw_tail_in_batch_mode(monkeypatch, test_db: Session):
+    monkeypatch.setattr(rollups, "IMPACT_ROLLUP_MODE", "batch")
+    now = datetime.utcnow()
+    _metrics(test_db, now - timedelta(days=30), now - timedelta(days=3, minutes=10), now - timedelta(hours=5))
+
+    assert compact_rollups(test_db, datetime.min) > 0
+    days = test_db.query(ImpactMetricRollup).filter(ImpactMetricRollup.granularity == RollupGranularity.DAY)
+    assert sum(rollup.total for rollup in days) == 3
+
+    # Written after the last compaction, so only the raw tail can count it
+    _metrics(test_db, now - timedelta(minutes=90))
+    totals = sum_impact_metrics(test_db, now - timedelta(days=60), now)
+    assert totals[MetricType.FOOD_RESCUED] == 4
@@ -0,0 +1,54 @@
+import numpy as np
+
+from ..services.routing import Stop, RouteSolver, solve_route, PICKUP, DELIVERY
+
+def _random_pairs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    stops = []
+    for pair in range(count):
+        stops.append(Stop(40.7 + rng.random() * 0.2, -74.0 + rng.random() * 0.2, PICKUP))
+        stops.append(Stop(
+            40.7 + rng.random() * 0.2, -74.0 + rng.random() * 0.2, DELIVERY, pickup_index=2 * pair
+        ))
+    return stops
+
+def test_deliveries_follow_their_pickups_within_capacity():
+    stops = _random_pairs(40)
+    plan = solve_route(stops, capacity=3)
+
+    assert sorted(plan.order) == list(range(len(stops)))
+    position = {stop: i for i, stop in enumerate(plan.order)}
+    load = 0
+    for index in plan.order:
+        if stops[index].kind == DELIVERY:
+            assert position[stops[index].pickup_index] < position[index]
+            load -= 1
+        else:
+            load += 1
+        assert load <= 3
+
+def test_improvement_never_worse_than_construction():
+    solver = RouteSolver(_random_pairs(100, seed=1), time_budget=0.5)
+    constructed = solver._cost(solver._construct())
+    assert solver.solve().distance_km <= constructed
+
+def test_time_windows_are_respected_when_possible():
+    # The later stop is nearer the start, so pure distance would visit it first
+    stops = [
+        Stop(40.80, -74.0, ready_minute=0, due_minute=30),
+        Stop(40.71, -74.0, ready_minute=240, due_minute=300),
+    ]
+    plan = solve_route(stops, start=(40.70, -74.0))
+    assert plan.order == [0, 1]
+    assert plan.late_minutes == 0
+
+def test_stops_that_cannot_fit_are_left_unrouted():
+    stops = _random_pairs(5, seed=2)
+    stops[4] = stops[4]._replace(load=5)
+    stops[5] = stops[5]._replace(load=5)
+    solver = RouteSolver(stops, capacity=3)
+    plan = solver.solve()
+
+    assert plan.unrouted == [4, 5]
+    assert sorted(plan.order) == [0, 1, 2, 3, 6, 7, 8, 9]
+    assert np.isfinite(plan.distance_km)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from ..services.scoring import ScoringEngine
+
+def test_top_k_matches_full_sort():
+    engine = ScoringEngine()
+    rng = np.random.default_rng(0)
+    scores = engine.score(
+        distance_km=rng.random(1000) * 50,
+        hours_to_expiry=rng.random(1000) * 100 + 1,
+        category_affinity=rng.random(1000)
+    )
+
+    top = engine.top_k(scores, 10)
+    assert list(top) == list(np.argsort(-scores, kind="stable")[:10])
+
+def test_closer_candidates_score_higher():
+    engine = ScoringEngine()
+    scores = engine.score(distance_km=np.array([20.0, 1.0, 5.0]))
+    assert list(engine.top_k(scores, 3)) == [1, 2, 0]
+
+def test_expired_candidates_are_excluded():
+    engine = ScoringEngine()
+    scores = engine.score(
+        distance_km=np.array([1.0, 2.0]),
+        hours_to_expiry=np.array([-1.0, 10.0])
+    )
+    assert list(engine.top_k(scores, 5)) == [1]
+
+def test_unknown_values_are_neutral():
+    engine = ScoringEngine()
+    scores = engine.score(category_affinity=np.array([np.nan, 0.0, 1.0]))
+    assert scores[2] > scores[0] > scores[1]
@@ -0,0 +1,29 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from ..models.claims import Claim
+from ..models.listings import FoodListing
+from ..schemas.claims import ClaimResponse
+from ..schemas.listings import ListingResponse, ListingSummary
+from ..services.serialization import RowSerializer, dumps
+
+def test_row_serializer_matches_orm_mode(test_db: Session, test_listing: FoodListing):
+    serializer = RowSerializer(ListingResponse, FoodListing)
+    rows = test_db.execute(serializer.select().where(FoodListing.id == test_listing.id)).all()
+
+    expected = jsonable_encoder([ListingResponse.from_orm(test_listing)])
+    assert json.loads(dumps(serializer.dicts(rows))) == expected
+
+def test_row_serializer_fills_nested_schemas(test_db: Session, test_listing: FoodListing):
+    claim = Claim(listing_id=test_listing.id, claimer_id=test_listing.owner_id, pickup_time=datetime.utcnow())
+    test_db.add(claim)
+    test_db.commit()
+
+    serializer = RowSerializer(ClaimResponse, Claim, listing=(ListingSummary, Claim.listing))
+    item = serializer.dict(test_db.execute(serializer.select().where(Claim.id == claim.id)).one())
+
+    assert item["id"] == claim.id
+    assert item["listing"] == ListingSummary.from_orm(test_listing).dict()
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketDisconnect
+
+from ..models.users import User
+from ..routers.websockets import ConnectionManager
+from ..services.pubsub import InMemoryBackplane
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        pass
+
+def _workers(count):
+    hub = {}
+    return [ConnectionManager(backplane=InMemoryBackplane(tick=0, hub=hub)) for _ in range(count)]
+
+def test_personal_message_reaches_other_worker():
+    async def run():
+        sender, receiver = _workers(2)
+        socket = FakeWebSocket()
+        await receiver.connect(socket, user_id=7)
+
+        await sender.send_personal_message({"type": "notification", "content": "hi"}, user_id=7)
+        await asyncio.sleep(0.01)
+        return socket.sent
+
+    assert asyncio.run(run()) == ['{"type": "notification", "content": "hi"}']
+
+def test_broadcast_skips_excluded_user_on_every_worker():
+    async def run():
+        first, second = _workers(2)
+        sockets = {user_id: FakeWebSocket() for user_id in (1, 2, 3)}
+        await first.connect(sockets[1], user_id=1)
+        await second.connect(sockets[2], user_id=2)
+        await second.connect(sockets[3], user_id=3)
+
+        await first.broadcast("hello", exclude_user=2)
+        await asyncio.sleep(0.01)
+        return {user_id: socket.sent for user_id, socket in sockets.items()}
+
+    assert asyncio.run(run()) == {1: ["hello"], 2: [], 3: ["hello"]}
+
+def test_topic_messages_reach_only_subscribers():
+    async def run():
+        first, second = _workers(2)
+        subscriber, other = FakeWebSocket(), FakeWebSocket()
+        connection = await first.connect(subscriber, user_id=1)
+        await second.connect(other, user_id=2)
+        await first.subscribe(connection, "listing:5:claims")
+
+        await second.publish("listing:5:claims", "claimed")
+        await asyncio.sleep(0.01)
+        first.unsubscribe(connection, "listing:5:claims")
+        await second.publish("listing:5:claims", "cancelled")
+        await asyncio.sleep(0.01)
+        return subscriber.sent, other.sent
+
+    assert asyncio.run(run()) == (["claimed"], [])
+
+def test_socket_identity_comes_from_the_token(
+    test_db: Session, test_client: TestClient, test_user: User, test_user_token: str, other_user: User
+):
+    for url in ("/ws", "/ws?token=not-a-token", f"/ws/{other_user.id}?token={test_user_token}"):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with test_client.websocket_connect(url) as socket:
+                socket.receive_text()
+        assert closed.value.code == 1008
+
+    with test_client.websocket_connect(f"/ws?token={test_user_token}") as socket:
+        socket.send_json({"type": "subscribe", "topic": "trade:1"})
+        assert socket.receive_json()["type"] == "error"
+        socket.send_json({"type": "subscribe", "topic": "listing:1:claims"})
+        assert socket.receive_json() == {"type": "subscribed", "topic": "listing:1:claims"}
+
+def test_bad_and_client_notification_messages_get_error_frames(
+    test_db: Session, test_client: TestClient, test_user_token: str, other_user: User
+):
+    with test_client.websocket_connect(f"/ws?token={test_user_token}") as socket:
+        socket.send_text("not json")
+        assert socket.receive_json()["type"] == "error"
+        socket.send_json(["subscribe"])
+        assert socket.receive_json()["type"] == "error"
+        socket.send_json({"topic": "listing:1:claims"})
+        assert socket.receive_json()["type"] == "error"
+        socket.send_json({"type": "chat", "topic": "trade:1"})
+        assert socket.receive_json()["type"] == "error"
+        # Clients can't push notifications to other users
+        socket.send_json({"type": "notification", "content": "Spoofed", "recipient_id": other_user.id})
+        assert socket.receive_json()["type"] == "error"
+        # The connection is still usable afterwards
+        socket.send_json({"type": "subscribe", "topic": "listing:1:claims"})
+        assert socket.receive_json() == {"type": "subscribed", "topic": "listing:1:claims"}